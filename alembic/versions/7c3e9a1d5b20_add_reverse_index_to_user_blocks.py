@@ -0,0 +1,30 @@
+"""add_reverse_index_to_user_blocks
+
+Revision ID: 7c3e9a1d5b20
+Revises: 45fdb1941a8b
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3e9a1d5b20"
+down_revision: str | None = "45fdb1941a8b"
+branch_labels: str | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    """Index user_blocks by the blocked user."""
+    # The unique (blocker_id, blocked_id) index only serves lookups by blocker
+    op.create_index(
+        "ix_user_blocks_blocked_blocker",
+        "user_blocks",
+        ["blocked_id", "blocker_id"],
+    )
+
+
+def downgrade() -> None:
+    """Remove the index by the blocked user."""
+    op.drop_index("ix_user_blocks_blocked_blocker", table_name="user_blocks")
@@ -0,0 +1,202 @@
+"""
+Throughput and latency matrix of the chat repository backends.
+
+Every backend runs the same workloads:
+
+- ``write_burst``: messages saved back to back into one conversation;
+- ``deep_history``: pages of 50 read at random depths of a long conversation;
+- ``small_conversations``: many conversations of a few messages, each
+  written and then read back.
+
+``inmem`` is ``ChatRepositoryInMemory``, ``redis-inmem`` is
+``ChatRepositoryDB`` over the in-memory Redis substitute (the storage logic
+without the network) and ``redis`` the same repository against a real server
+given with ``--redis-url`` (a disposable database, it is flushed). Add a new
+storage engine to ``BACKENDS`` to compare it with the same numbers.
+
+Usage:
+    python -m benchmarks.chat_repository [--messages 5000]
+        [--redis-url redis://localhost:6379/15] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+
+from src.chat.inmem_redis import InMemoryRedis
+from src.chat.repositories.abs.chat import AbstractChatRepository
+from src.chat.repositories.db.chat import ChatRepositoryDB
+from src.chat.repositories.inmem.chat import ChatRepositoryInMemory
+
+PAGE_SIZE = 50
+MESSAGE = "x" * 100
+
+
+async def _inmem_repository(url: str | None) -> AbstractChatRepository:
+    """Plain in-memory repository."""
+    return ChatRepositoryInMemory()
+
+
+async def _redis_inmem_repository(url: str | None) -> AbstractChatRepository:
+    """Redis repository over the in-memory Redis substitute."""
+    return ChatRepositoryDB("redis://unused", redis_client=InMemoryRedis())
+
+
+async def _redis_repository(url: str | None) -> AbstractChatRepository:
+    """Repository on a real, flushed Redis database."""
+    client = redis.from_url(url, decode_responses=True)
+    await client.flushdb()
+    return ChatRepositoryDB(url, redis_client=client)
+
+
+# Фабрики пустых хранилищ: имя -> корутина, создающая репозиторий
+BACKENDS: dict[str, Callable[[str | None], Awaitable[AbstractChatRepository]]] = {
+    "inmem": _inmem_repository,
+    "redis-inmem": _redis_inmem_repository,
+    "redis": _redis_repository,
+}
+
+
+class Timer:
+    """Latency samples of one workload."""
+
+    def __init__(self):
+        self.samples: list[float] = []
+
+    async def time(self, operation: Awaitable) -> object:
+        """Await an operation and record how long it took."""
+        start = time.perf_counter()
+        result = await operation
+        self.samples.append(time.perf_counter() - start)
+        return result
+
+    def summary(self) -> dict[str, float]:
+        """Get throughput and latency percentiles in microseconds."""
+        ordered = sorted(self.samples)
+        total = sum(ordered)
+
+        def at(fraction: float) -> float:
+            return round(
+                ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1e6, 1
+            )
+
+        return {
+            "ops": len(ordered),
+            "ops_per_s": round(len(ordered) / total) if total else 0,
+            "p50_us": at(0.5),
+            "p95_us": at(0.95),
+            "p99_us": at(0.99),
+        }
+
+
+async def write_burst(repo: AbstractChatRepository, messages: int) -> Timer:
+    """Save messages back to back into one conversation."""
+    timer = Timer()
+    for _ in range(messages):
+        await timer.time(repo.save_message(1, 2, MESSAGE))
+    return timer
+
+
+async def deep_history(repo: AbstractChatRepository, messages: int) -> Timer:
+    """Read pages at random depths of a conversation of ``messages``."""
+    for _ in range(messages):
+        await repo.save_message(3, 4, MESSAGE)
+    rng = random.Random(0)
+    timer = Timer()
+    for _ in range(min(messages, 1000)):
+        before = rng.randint(PAGE_SIZE + 1, messages + 1)
+        await timer.time(repo.get_history(3, 4, limit=PAGE_SIZE, before=before))
+    return timer
+
+
+async def small_conversations(repo: AbstractChatRepository, messages: int) -> Timer:
+    """Write five messages to each of many conversations, then read each back."""
+    conversations = max(1, messages // 5)
+    timer = Timer()
+    for index in range(conversations):
+        user1, user2 = 1000 + 2 * index, 1001 + 2 * index
+        for _ in range(5):
+            await timer.time(repo.save_message(user1, user2, MESSAGE))
+        await timer.time(repo.get_history(user2, user1))
+    return timer
+
+
+WORKLOADS = {
+    "write_burst": write_burst,
+    "deep_history": deep_history,
+    "small_conversations": small_conversations,
+}
+
+
+async def run_matrix(
+    backends: list[str], messages: int, redis_url: str | None
+) -> dict[str, dict[str, dict]]:
+    """
+    Run every workload on every backend, each on fresh storage.
+
+    Args:
+        backends: Backend names from ``BACKENDS``
+        messages: Size of each workload in messages
+        redis_url: URL of the real Redis for the ``redis`` backend
+
+    Returns:
+        Summaries per backend and workload
+    """
+    results = {}
+    for backend in backends:
+        results[backend] = {}
+        for name, workload in WORKLOADS.items():
+            repo = await BACKENDS[backend](redis_url)
+            try:
+                timer = await workload(repo, messages)
+            finally:
+                await repo.close()
+            results[backend][name] = timer.summary()
+    return results
+
+
+def print_matrix(results: dict[str, dict[str, dict]]) -> None:
+    """Print one row per backend and workload."""
+    print(
+        f"{'backend':<14}{'workload':<22}{'ops/s':>10}"
+        f"{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}"
+    )
+    for backend, workloads in results.items():
+        for name, summary in workloads.items():
+            print(
+                f"{backend:<14}{name:<22}{summary['ops_per_s']:>10}"
+                f"{summary['p50_us']:>10}{summary['p95_us']:>10}{summary['p99_us']:>10}"
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=list(BACKENDS),
+        help="Backends to run (default: all available)",
+    )
+    parser.add_argument("--redis-url", help="Real Redis for the redis backend")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    backends = args.backends or [
+        name for name in BACKENDS if name != "redis" or args.redis_url
+    ]
+    results = await run_matrix(backends, args.messages, args.redis_url)
+
+    print_matrix(results)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"messages": args.messages, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark the HTTP middleware stack.
+
+Compares the former ``BaseHTTPMiddleware`` based ``NoCacheMiddleware`` with
+the current pure ASGI stack by driving the application in-process (no
+network), so the numbers reflect framework and middleware overhead only.
+
+Usage:
+    ENV=test python -m benchmarks.http_middleware [--requests 3000] [--concurrency 20]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("ENV", "test")
+
+import httpx  # noqa: E402
+from fastapi import Request  # noqa: E402
+from starlette.middleware import Middleware  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.middleware.cors import CORSMiddleware  # noqa: E402
+
+from src.main import app  # noqa: E402
+
+PATHS = ["/ping", "/users/login"]
+
+
+class LegacyNoCacheMiddleware(BaseHTTPMiddleware):
+    """The middleware used before the pure ASGI stack, kept for comparison."""
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
+        return response
+
+
+def use_middleware(stack: list[Middleware]) -> None:
+    """Rebuild the application with another middleware stack."""
+    app.user_middleware = stack
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def measure(path: str, requests: int, concurrency: int) -> float:
+    """
+    Send requests to a path and return the achieved requests per second.
+
+    Args:
+        path: Request path
+        requests: Total number of requests
+        concurrency: Number of concurrent requests
+
+    Returns:
+        Requests per second
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        # Warm up templates and routing caches
+        for _ in range(50):
+            await client.get(path)
+
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    current = list(app.user_middleware)
+    legacy = [
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(LegacyNoCacheMiddleware),
+    ]
+
+    results = {}
+    for name, stack in (("before", legacy), ("after", current)):
+        use_middleware(stack)
+        for path in PATHS:
+            results[(name, path)] = await measure(path, args.requests, args.concurrency)
+    use_middleware(current)
+
+    print(f"{'path':<16}{'before req/s':>14}{'after req/s':>14}{'change':>10}")
+    for path in PATHS:
+        before, after = results[("before", path)], results[("after", path)]
+        print(f"{path:<16}{before:>14.0f}{after:>14.0f}{after / before - 1:>+10.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,369 @@
+"""
+End-to-end WebSocket load generator for chat capacity planning.
+
+Registers synthetic users through the API, opens WebSocket sessions to
+``/ws/chat`` in pairs of users chatting with each other, sends messages at a
+fixed rate per session and measures how long each message takes to reach the
+recipient's sessions (delivery) and to be acknowledged to the sender (ack).
+
+Without ``--url`` a server is started locally in a subprocess. ``--env test``
+uses the in-memory Redis and user repository stand-ins, ``--env prod`` the
+PostgreSQL and Redis from ``DATABASE_URL``/``REDIS_URL`` (migrations applied).
+
+Usage:
+    python -m benchmarks.ws_load [--users 50] [--sockets 100] [--rate 2]
+        [--duration 10] [--url http://127.0.0.1:8000] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+PASSWORD = "loadtest-password"
+
+
+@dataclass
+class LoadStats:
+    """Counters and latency samples collected during a run."""
+
+    sent: int = 0
+    acked: int = 0
+    delivered: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    ack_latency: list[float] = field(default_factory=list)
+    delivery_latency: list[float] = field(default_factory=list)
+    # Send time per client_id, shared by all sessions of the run
+    sent_at: dict[str, float] = field(default_factory=dict)
+
+    def record_frame(self, user_id: int, data: dict) -> None:
+        """Account one event received by a session of a user."""
+        now = time.perf_counter()
+        if data.get("type") == "batch":
+            for event in data.get("events", []):
+                self.record_frame(user_id, event)
+            return
+
+        started = self.sent_at.get(data.get("client_id"))
+        if data.get("type") == "message" and data.get("to") == user_id:
+            self.delivered += 1
+            if started is not None:
+                self.delivery_latency.append(now - started)
+        elif data.get("type") == "ack":
+            self.acked += 1
+            if started is not None:
+                self.ack_latency.append(now - started)
+        elif data.get("type") == "error":
+            error = data.get("error", "unknown")
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """
+    Get a percentile of latency samples by the nearest-rank method.
+
+    Args:
+        samples: Latencies in seconds
+        fraction: Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        Latency in milliseconds, 0 without samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index] * 1000
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, env: str) -> subprocess.Popen:
+    """
+    Start the application server in a subprocess.
+
+    Args:
+        port: Port to listen on
+        env: ``test`` for in-memory stand-ins or ``prod`` for PostgreSQL/Redis
+
+    Returns:
+        Server process
+    """
+    server_env = {
+        **os.environ,
+        "ENV": env,
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "RELOAD": "false",
+        "LOG_LEVEL": "WARNING",
+        "SESSION_COOKIE_SECURE": "false",
+        # Лимиты защищают от клиентов, а здесь измеряется пропускная способность
+        "WS_RATE_LIMIT_PER_SECOND": "100000",
+        "WS_RATE_LIMIT_BURST": "100000",
+        "MAX_CONNECTIONS_PER_USER": "1000",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.server"],
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    """Poll ``/ready`` until the server accepts traffic."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError("Server did not become ready")
+        await asyncio.sleep(0.1)
+
+
+async def register_users(
+    client: httpx.AsyncClient, count: int, concurrency: int = 20
+) -> list[tuple[int, httpx.Cookies]]:
+    """
+    Register and log in synthetic users.
+
+    Args:
+        client: HTTP client bound to the server
+        count: Number of users
+        concurrency: Number of concurrent registrations
+
+    Returns:
+        User ids with their session cookies
+    """
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def register(index: int) -> tuple[int, httpx.Cookies]:
+        username = f"load_{run_id}_{index}"
+        async with semaphore:
+            response = await client.post(
+                "/api/v1/users/register",
+                json={
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "password": PASSWORD,
+                },
+            )
+            response.raise_for_status()
+            login = await client.post(
+                "/api/v1/users/login",
+                json={"username": username, "password": PASSWORD},
+            )
+            login.raise_for_status()
+        return response.json()["id"], login.cookies
+
+    return await asyncio.gather(*(register(i) for i in range(count)))
+
+
+async def run_session(
+    ws_url: str,
+    user_id: int,
+    partner_id: int,
+    cookies: httpx.Cookies,
+    rate: float,
+    stop: asyncio.Event,
+    stats: LoadStats,
+) -> None:
+    """
+    Send messages to the partner at a fixed rate and record received events.
+
+    Args:
+        ws_url: Base WebSocket URL of the server
+        user_id: ID of the user owning the session
+        partner_id: ID of the user messages are sent to
+        cookies: Session cookies of the user
+        rate: Messages per second, 0 only listens
+        stop: Set when the run is over
+        stats: Statistics of the run
+    """
+    cookie_header = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    url = f"{ws_url}/ws/chat?user_id={user_id}&other_user={partner_id}"
+    try:
+        async with connect(
+            url, additional_headers={"Cookie": cookie_header}, open_timeout=30
+        ) as websocket:
+            reader = asyncio.create_task(_read_events(websocket, user_id, stats))
+            await _send_messages(websocket, rate, stop, stats)
+            # Let the last messages arrive before closing
+            await asyncio.sleep(1)
+            reader.cancel()
+    except (OSError, ConnectionClosed, TimeoutError) as e:
+        error = f"connection: {type(e).__name__}"
+        stats.errors[error] = stats.errors.get(error, 0) + 1
+
+
+async def _send_messages(
+    websocket: ClientConnection, rate: float, stop: asyncio.Event, stats: LoadStats
+) -> None:
+    """Send messages on a fixed schedule until the run stops."""
+    if rate <= 0:
+        await stop.wait()
+        return
+    interval = 1 / rate
+    next_send = time.perf_counter()
+    while not stop.is_set():
+        client_id = uuid.uuid4().hex
+        stats.sent_at[client_id] = time.perf_counter()
+        await websocket.send(
+            json.dumps({"message": f"load {client_id}", "client_id": client_id})
+        )
+        stats.sent += 1
+        # A fixed schedule keeps the offered load independent of latency
+        next_send += interval
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+
+async def _read_events(
+    websocket: ClientConnection, user_id: int, stats: LoadStats
+) -> None:
+    """Record every event received by a session."""
+    async for frame in websocket:
+        stats.record_frame(user_id, json.loads(frame))
+
+
+async def run_load(
+    base_url: str,
+    users: int,
+    sockets: int,
+    rate: float,
+    duration: float,
+) -> dict:
+    """
+    Run a load test against a server.
+
+    Args:
+        base_url: HTTP URL of the server
+        users: Number of synthetic users, paired into conversations
+        sockets: Number of WebSocket sessions spread over the users
+        rate: Messages per second per session
+        duration: Length of the sending phase in seconds
+
+    Returns:
+        Summary of throughput and latency percentiles
+    """
+    users += users % 2
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        await wait_until_ready(client)
+        accounts = await register_users(client, users)
+
+    ws_url = base_url.replace("http", "ws", 1)
+    stats = LoadStats()
+    stop = asyncio.Event()
+    sessions = []
+    for index in range(sockets):
+        user_index = index % users
+        user_id, cookies = accounts[user_index]
+        partner_id = accounts[user_index ^ 1][0]
+        sessions.append(
+            run_session(ws_url, user_id, partner_id, cookies, rate, stop, stats)
+        )
+
+    tasks = [asyncio.create_task(session) for session in sessions]
+    start = time.perf_counter()
+    await asyncio.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*tasks)
+
+    return {
+        "users": users,
+        "sockets": sockets,
+        "rate_per_socket": rate,
+        "duration_s": round(elapsed, 2),
+        "sent": stats.sent,
+        "acked": stats.acked,
+        "delivered": stats.delivered,
+        "errors": stats.errors,
+        "sent_per_s": round(stats.sent / elapsed, 1),
+        "delivered_per_s": round(stats.delivered / elapsed, 1),
+        "delivery_ms": _latency_summary(stats.delivery_latency),
+        "ack_ms": _latency_summary(stats.ack_latency),
+    }
+
+
+def _latency_summary(samples: list[float]) -> dict[str, float]:
+    """Get p50/p95/p99 of latency samples in milliseconds."""
+    return {
+        name: round(percentile(samples, fraction), 2)
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+    }
+
+
+def print_report(result: dict) -> None:
+    """Print a human readable summary of a run."""
+    print(
+        f"{result['users']} users, {result['sockets']} sockets, "
+        f"{result['rate_per_socket']} msg/s per socket, {result['duration_s']} s"
+    )
+    print(
+        f"sent {result['sent']} ({result['sent_per_s']}/s), "
+        f"acked {result['acked']}, "
+        f"delivered {result['delivered']} ({result['delivered_per_s']}/s)"
+    )
+    for name in ("delivery_ms", "ack_ms"):
+        latency = result[name]
+        print(
+            f"{name:<12} p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}"
+            f"  p99 {latency['p99']:>8.2f}"
+        )
+    if result["errors"]:
+        print(f"errors: {result['errors']}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sockets", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=2.0, help="msg/s per socket")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--url", help="Existing server, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--env", choices=("test", "prod"), default="test")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(port, args.env)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        result = await run_load(
+            base_url, args.users, args.sockets, args.rate, args.duration
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,226 @@
+"""
+Microbenchmarks of the ChatWebSocketService hot path.
+
+Each case runs in-process against fake WebSocket objects, the in-memory Redis
+substitute and the in-memory user repository, so results are repeatable and
+independent of the network. Results are written as JSON; pass a previous
+results file to ``--compare`` to see the change per case and fail on
+regressions.
+
+Usage:
+    python -m benchmarks.ws_service [--output results.json]
+        [--compare baseline.json] [--threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+
+from src.chat.inmem_redis import InMemoryRedis
+from src.chat.ws_service import ChatWebSocketService
+from src.users.repositories.inmem.user import UserRepositoryInMemory
+from src.users.schemas import UserCreate
+from src.users.services import UserService
+
+
+class NullWebSocket:
+    """WebSocket stand-in that accepts and discards frames."""
+
+    async def send_text(self, data: str) -> None:
+        pass
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        pass
+
+
+async def create_service(sessions_per_user: int = 1) -> ChatWebSocketService:
+    """
+    Create a service with users 1 and 2 connected.
+
+    Args:
+        sessions_per_user: Number of sessions of each user
+
+    Returns:
+        Service backed by in-memory Redis and user repository
+    """
+    user_service = UserService(UserRepositoryInMemory())
+    for name in ("alice", "bob"):
+        user_service.register(
+            UserCreate(username=name, email=f"{name}@example.com", password="secret")
+        )
+    service = ChatWebSocketService(
+        redis_client=InMemoryRedis(), user_service=user_service
+    )
+    service.max_connections_per_user = sessions_per_user
+    for user_id in (1, 2):
+        for _ in range(sessions_per_user):
+            await service.connect(user_id, NullWebSocket())
+    # Прямая запись без окна объединения: измеряется сам сервис, не таймеры
+    for sessions in service.active_connections.values():
+        for outbox in sessions.values():
+            outbox.flush_window = 0
+    return service
+
+
+async def measure(
+    operation: Callable[[], Awaitable[object]], iterations: int, repeats: int
+) -> dict[str, float]:
+    """
+    Time an operation in several rounds.
+
+    Args:
+        operation: Coroutine function to run
+        iterations: Calls per round
+        repeats: Number of rounds
+
+    Returns:
+        Median and best time per call in microseconds over the rounds
+    """
+    for _ in range(min(iterations, 100)):
+        await operation()
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation()
+        rounds.append((time.perf_counter() - start) / iterations * 1e6)
+    return {
+        "median_us": round(statistics.median(rounds), 3),
+        "min_us": round(min(rounds), 3),
+    }
+
+
+async def run_benchmarks(iterations: int, repeats: int) -> dict[str, dict]:
+    """
+    Run all benchmark cases.
+
+    Args:
+        iterations: Calls per round
+        repeats: Number of rounds per case
+
+    Returns:
+        Timings per case name
+    """
+    results = {}
+
+    service = await create_service()
+    results["send_personal_message"] = await measure(
+        lambda: service.send_personal_message("hello", 2, 1, client_id="c1"),
+        iterations,
+        repeats,
+    )
+
+    payload = json.dumps(service._create_message_data("hello", 2, 1, "c1"))
+    for sessions in (1, 10, 100):
+        fanout = await create_service(sessions)
+        results[f"broadcast_message[{sessions} sessions/user]"] = await measure(
+            lambda svc=fanout: svc._broadcast_message(payload, 2, 1),
+            iterations,
+            repeats,
+        )
+
+    history = await create_service()
+    for index in range(1000):
+        await history.send_personal_message(f"message {index}", 2, 1)
+    results["get_history[50 of 1000]"] = await measure(
+        lambda: history.get_history(1, 2, limit=50), iterations, repeats
+    )
+    results["get_messages_after[10 of 1000]"] = await measure(
+        lambda: history.get_messages_after(1, 2, after_seq=990),
+        iterations,
+        repeats,
+    )
+
+    async def encode() -> str:
+        return json.dumps(service._create_message_data("hello", 2, 1, "c1"))
+
+    results["encode_message"] = await measure(encode, iterations, repeats)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    Print the change of every case against a baseline.
+
+    Args:
+        results: Current results
+        baseline: Results of an earlier run
+        threshold: Relative slowdown counted as a regression. The best round
+            is compared, it is the least affected by other load on the machine
+
+    Returns:
+        True if no case regressed beyond the threshold
+    """
+    ok = True
+    print(f"\n{'case (min)':<40}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for name, timing in results["cases"].items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            print(f"{name:<40}{'-':>14}{timing['min_us']:>14.2f}{'new':>10}")
+            continue
+        change = timing["min_us"] / before["min_us"] - 1
+        regressed = change > threshold
+        ok = ok and not regressed
+        print(
+            f"{name:<40}{before['min_us']:>14.2f}{timing['min_us']:>14.2f}"
+            f"{change:>+10.1%}{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+
+def _git_revision() -> str | None:
+    """Get the current commit hash, if run from a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # Per-message INFO logs would only measure the log pipeline
+    logging.disable(logging.INFO)
+
+    results = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "repeats": args.repeats,
+        "cases": await run_benchmarks(args.iterations, args.repeats),
+    }
+
+    print(f"{'case':<40}{'median us':>12}{'min us':>12}")
+    for name, timing in results["cases"].items():
+        print(f"{name:<40}{timing['median_us']:>12.2f}{timing['min_us']:>12.2f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
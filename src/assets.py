@@ -0,0 +1,207 @@
+"""
+Static asset pipeline: content-hashed, precompressed copies of ``src/static``.
+
+Run ``python -m src.assets`` at build time. It writes fingerprinted files such
+as ``dist/css/main.3f2a9c1b0d.css`` next to ``.gz`` (and ``.br`` when the
+optional ``brotli`` package is installed) variants, plus a manifest that maps
+source paths to fingerprinted ones. Without a build the templates fall back to
+the plain file URLs.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import shutil
+import stat
+from pathlib import Path
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always built
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+DIST_DIR_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+STATIC_URL = "/static/"
+
+# Только текстовые ресурсы заметно выигрывают от сжатия
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+MIN_COMPRESS_SIZE = 256
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_FINGERPRINT = re.compile(rf"^{DIST_DIR_NAME}/.+\.[0-9a-f]{{10}}\.[^./]+$")
+
+_manifest: dict[str, str] | None = None
+
+
+def build_assets(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    """
+    Fingerprint and precompress all files under the static directory.
+
+    Args:
+        static_dir: Directory with source assets
+
+    Returns:
+        Manifest mapping source paths to fingerprinted paths, both relative
+        to ``static_dir``
+    """
+    dist_dir = static_dir / DIST_DIR_NAME
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or dist_dir in source.parents:
+            continue
+        relative = source.relative_to(static_dir).as_posix()
+        content = source.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()[:10]
+        target = dist_dir / Path(relative).with_suffix(f".{digest}{source.suffix}")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+
+        if source.suffix in COMPRESSIBLE_SUFFIXES and len(content) >= MIN_COMPRESS_SIZE:
+            # mtime=0 keeps the output reproducible between builds
+            target.with_name(target.name + ".gz").write_bytes(
+                gzip.compress(content, compresslevel=9, mtime=0)
+            )
+            if brotli is not None:
+                target.with_name(target.name + ".br").write_bytes(
+                    brotli.compress(content, quality=11)
+                )
+
+        manifest[relative] = target.relative_to(static_dir).as_posix()
+
+    (dist_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True)
+    )
+    return manifest
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> dict[str, str]:
+    """
+    Read the manifest written by ``build_assets``.
+
+    Args:
+        static_dir: Directory with source assets
+
+    Returns:
+        Manifest, empty if assets were not built
+    """
+    try:
+        return json.loads((static_dir / DIST_DIR_NAME / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """
+    Get the URL of a static asset, fingerprinted when assets are built.
+
+    Args:
+        path: Path relative to ``src/static``, e.g. ``css/main.css``
+
+    Returns:
+        URL under ``/static/``
+    """
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return STATIC_URL + _manifest.get(path, path)
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """
+    Get the content codings an ``Accept-Encoding`` header allows.
+
+    Codings with ``q=0`` are refused. A ``*`` with a non-zero weight allows
+    the known codings that are not listed explicitly.
+
+    Args:
+        header: Value of the ``Accept-Encoding`` request header
+
+    Returns:
+        Lowercase names of the allowed codings among ``br`` and ``gzip``
+    """
+    weights = {}
+    for item in header.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    return {coding for coding in ("br", "gzip") if weights.get(coding, wildcard) > 0}
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Static files that prefer precompressed variants of fingerprinted assets.
+
+    A ``.br`` or ``.gz`` file next to the requested one is served with the
+    matching ``Content-Encoding`` when the client accepts it. Fingerprinted
+    files never change, so they are cached as ``immutable`` for a year.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not _FINGERPRINT.match(path):
+            return await super().get_response(path, scope)
+
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Response | None:
+        """Serve the best precompressed variant the client accepts, if any."""
+        if scope["method"] not in ("GET", "HEAD"):
+            return None
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + suffix
+            )
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+            response = self.file_response(full_path, stat_result, scope)
+            if response.status_code == 200:
+                # FileResponse guesses the type from the .gz/.br name
+                response.headers["Content-Type"] = self.media_type_for(path)
+                response.headers["Content-Encoding"] = encoding
+            return response
+        return None
+
+    @staticmethod
+    def media_type_for(path: str) -> str:
+        """Guess the content type of the uncompressed asset."""
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type.endswith("javascript"):
+            media_type += "; charset=utf-8"
+        return media_type
+
+
+if __name__ == "__main__":
+    built = build_assets()
+    print(f"Built {len(built)} assets into {STATIC_DIR / DIST_DIR_NAME}")
+    print(f"Brotli: {'yes' if brotli is not None else 'no (pip install brotli)'}")
@@ -0,0 +1,178 @@
+"""Per-message deflate tuning for chat WebSocket connections."""
+
+import time
+
+from websockets.extensions.base import Extension
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, Frame, Opcode
+
+from src.config import settings
+from src.metrics import Counter, register_collector
+
+
+class CompressionStats:
+    """Bandwidth and CPU counters for outbound frame compression."""
+
+    def __init__(self):
+        """Initialize all counters to zero."""
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        self.frames_compressed = 0
+        self.frames_skipped = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.bytes_skipped = 0
+        self.cpu_seconds = 0.0
+
+    def snapshot(self) -> dict[str, int | float]:
+        """
+        Get current counter values.
+
+        Returns:
+            Dictionary with counters and the achieved compression ratio
+        """
+        return {
+            "frames_compressed": self.frames_compressed,
+            "frames_skipped": self.frames_skipped,
+            "bytes_before_compression": self.bytes_before,
+            "bytes_after_compression": self.bytes_after,
+            "bytes_sent_uncompressed": self.bytes_skipped,
+            "compression_ratio": (
+                round(self.bytes_after / self.bytes_before, 4)
+                if self.bytes_before
+                else None
+            ),
+            "compression_cpu_seconds": round(self.cpu_seconds, 6),
+        }
+
+
+compression_stats = CompressionStats()
+
+
+def _collect_compression_metrics() -> None:
+    """Copy compression counters into the metrics registry before a scrape."""
+    COMPRESSION_FRAMES.labels("compressed").set(compression_stats.frames_compressed)
+    COMPRESSION_FRAMES.labels("skipped").set(compression_stats.frames_skipped)
+    COMPRESSION_BYTES.labels("before").set(compression_stats.bytes_before)
+    COMPRESSION_BYTES.labels("after").set(compression_stats.bytes_after)
+    COMPRESSION_BYTES.labels("uncompressed").set(compression_stats.bytes_skipped)
+    COMPRESSION_CPU_SECONDS.labels().set(compression_stats.cpu_seconds)
+
+
+COMPRESSION_FRAMES = Counter(
+    "chat_ws_compression_frames_total",
+    "Outbound WebSocket messages by compression result.",
+    ("result",),
+)
+COMPRESSION_BYTES = Counter(
+    "chat_ws_compression_bytes_total",
+    "Outbound WebSocket payload bytes before and after compression.",
+    ("stage",),
+)
+COMPRESSION_CPU_SECONDS = Counter(
+    "chat_ws_compression_cpu_seconds_total",
+    "CPU time spent compressing outbound WebSocket messages.",
+)
+register_collector(_collect_compression_metrics)
+
+
+class ThresholdPerMessageDeflate(Extension):
+    """
+    Per-message deflate that leaves small messages uncompressed.
+
+    RFC 7692 allows uncompressed messages on a compressed connection (RSV1 is
+    left unset), so frames below the threshold skip zlib entirely while the
+    shared compression context stays untouched.
+    """
+
+    def __init__(self, extension: Extension, min_size: int, stats: CompressionStats):
+        """
+        Wrap a negotiated permessage-deflate extension.
+
+        Args:
+            extension: Negotiated ``PerMessageDeflate`` instance
+            min_size: Minimum payload size in bytes that gets compressed
+            stats: Counters to update
+        """
+        self.name = extension.name
+        self.extension = extension
+        self.min_size = min_size
+        self.stats = stats
+        self._skipping = False
+
+    def decode(self, frame: Frame, *, max_size: int | None = None) -> Frame:
+        """Decode an incoming frame."""
+        return self.extension.decode(frame, max_size=max_size)
+
+    def encode(self, frame: Frame) -> Frame:
+        """Compress an outgoing frame if its message is large enough."""
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+
+        if frame.opcode is not Opcode.CONT:
+            self._skipping = len(frame.data) < self.min_size
+        if self._skipping:
+            self.stats.frames_skipped += 1
+            self.stats.bytes_skipped += len(frame.data)
+            return frame
+
+        started = time.process_time()
+        encoded = self.extension.encode(frame)
+        self.stats.cpu_seconds += time.process_time() - started
+        self.stats.frames_compressed += 1
+        self.stats.bytes_before += len(frame.data)
+        self.stats.bytes_after += len(encoded.data)
+        return encoded
+
+
+class ThresholdPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """Server-side factory producing ``ThresholdPerMessageDeflate`` extensions."""
+
+    def __init__(self, min_size: int, stats: CompressionStats, **kwargs):
+        """
+        Configure the factory.
+
+        Args:
+            min_size: Minimum payload size in bytes that gets compressed
+            stats: Counters to update
+            **kwargs: Arguments for ``ServerPerMessageDeflateFactory``
+        """
+        super().__init__(**kwargs)
+        self.min_size = min_size
+        self.stats = stats
+
+    def process_request_params(self, params, accepted_extensions):
+        """Negotiate permessage-deflate and wrap the resulting extension."""
+        response_params, extension = super().process_request_params(
+            params, accepted_extensions
+        )
+        return response_params, ThresholdPerMessageDeflate(
+            extension, self.min_size, self.stats
+        )
+
+
+def build_compression_extensions() -> list[ServerPerMessageDeflateFactory]:
+    """
+    Build server extension factories from settings.
+
+    Returns:
+        Extension factories to offer during the handshake, empty when
+        compression is disabled
+    """
+    if not settings.ws_compression_enabled:
+        return []
+
+    no_context_takeover = not settings.ws_compression_context_takeover
+    return [
+        ThresholdPerMessageDeflateFactory(
+            min_size=settings.ws_compression_min_size,
+            stats=compression_stats,
+            server_no_context_takeover=no_context_takeover,
+            client_no_context_takeover=no_context_takeover,
+            server_max_window_bits=settings.ws_compression_window_bits,
+            client_max_window_bits=settings.ws_compression_window_bits,
+            compress_settings={"memLevel": settings.ws_compression_mem_level},
+        )
+    ]
@@ -0,0 +1,206 @@
+"""
+Redis layout of conversation histories, shared by all readers and writers.
+
+A conversation between two users is stored under ``chat:{min}:{max}`` as a
+list of JSON messages, oldest first, next to a few small keys:
+
+- ``:seq`` is the sequence number of the newest message. It is incremented in
+  the same MULTI/EXEC transaction as the RPUSH, so ``seq - list position`` is
+  the same for every message of the list and a ``seq`` maps to an LRANGE
+  index without scanning.
+- ``:cleared`` is the newest sequence number removed by ``clear``.
+- ``:version`` changes on every write and clear, for conditional requests.
+
+All keys share the retention TTL, which every write refreshes, so a
+conversation leaves nothing behind once it expires. A new history does not
+count from 1 but from the current time in milliseconds: it can only start
+after the previous one expired, so its numbers are higher than any number a
+client may still hold as a cursor.
+"""
+
+import json
+import time
+import uuid
+from collections.abc import AsyncIterator
+
+from src.logger import chat_logger
+
+
+def chat_key(user1_id: int, user2_id: int) -> str:
+    """Generate consistent Redis key for chat between two users."""
+    return f"chat:{min(user1_id, user2_id)}:{max(user1_id, user2_id)}"
+
+
+def seq_key(key: str) -> str:
+    """Generate the Redis key holding a conversation's last sequence number."""
+    return f"{key}:seq"
+
+
+def cleared_key(key: str) -> str:
+    """Generate the Redis key holding the last seq removed by a clear."""
+    return f"{key}:cleared"
+
+
+def version_key(key: str) -> str:
+    """Generate the Redis key holding a conversation's version."""
+    return f"{key}:version"
+
+
+def generation_base() -> int:
+    """
+    Get the number a new history starts counting after.
+
+    Histories expire only after ``MESSAGE_RETENTION_MINUTES`` without writes,
+    so numbers stay unique as long as a conversation gets fewer than 1000
+    messages per second.
+    """
+    return int(time.time() * 1000)
+
+
+async def append(redis, key: str, payload: str, ttl_seconds: int) -> int:
+    """
+    Append a message to a conversation and refresh the retention of its keys.
+
+    Args:
+        redis: Async Redis client
+        key: Conversation key from ``chat_key``
+        payload: JSON message as stored
+        ttl_seconds: Retention of the conversation
+
+    Returns:
+        Sequence number of the message
+    """
+    pipe = redis.pipeline(transaction=True)
+    pipe.set(seq_key(key), generation_base(), nx=True, ex=ttl_seconds)
+    pipe.incr(seq_key(key))
+    pipe.rpush(key, payload)
+    pipe.expire(seq_key(key), ttl_seconds)
+    pipe.expire(key, ttl_seconds)
+    pipe.expire(cleared_key(key), ttl_seconds)
+    pipe.set(version_key(key), uuid.uuid4().hex, ex=ttl_seconds)
+    _, seq, *_ = await pipe.execute()
+    return seq
+
+
+async def read_bounds(redis, key: str) -> tuple[int, int, int]:
+    """
+    Read the sequence numbers and length of a stored conversation at once.
+
+    Args:
+        redis: Async Redis client
+        key: Conversation key from ``chat_key``
+
+    Returns:
+        The latest sequence number, the last one removed by ``clear`` and the
+        number of stored messages, which hold the sequence numbers
+        ``latest - length + 1`` to ``latest``
+    """
+    pipe = redis.pipeline(transaction=True)
+    pipe.get(seq_key(key))
+    pipe.get(cleared_key(key))
+    pipe.llen(key)
+    counter, cleared, length = await pipe.execute()
+    # Без счётчика (история записана до его появления) seq равен позиции
+    return max(int(counter or 0), length), int(cleared or 0), length
+
+
+async def read_page(
+    redis,
+    key: str,
+    limit: int,
+    after_seq: int = 0,
+    before: int | None = None,
+) -> tuple[list[dict], int, int]:
+    """
+    Read the last ``limit`` messages newer than ``after_seq`` and older than
+    ``before``.
+
+    Args:
+        redis: Async Redis client
+        key: Conversation key from ``chat_key``
+        limit: Maximum number of messages
+        after_seq: Only return messages with a higher ``seq``; a cursor newer
+            than the history means the history was lost and returns all
+        before: Only return messages with a lower ``seq`` (latest page if None)
+
+    Returns:
+        Parsed messages with ``seq`` set, oldest first, the latest sequence
+        number and the last sequence number removed by ``clear``
+    """
+    latest_seq, cleared_seq, length = await read_bounds(redis, key)
+    if not length:
+        return [], latest_seq, cleared_seq
+
+    if after_seq > latest_seq:
+        after_seq = 0
+    offset = latest_seq - length
+    end = latest_seq if before is None else max(offset, min(latest_seq, before - 1))
+    start = max(after_seq, end - limit, offset)
+    if start >= end:
+        return [], latest_seq, cleared_seq
+
+    # Positive indices keep seq numbers exact even if messages are appended
+    # between the two commands, so a page costs one LRANGE of its own size
+    raw_messages = await redis.lrange(key, start - offset, end - offset - 1)
+    return _parse(raw_messages, start + 1), latest_seq, cleared_seq
+
+
+async def iter_pages(
+    redis, key: str, chunk_size: int = 500
+) -> AsyncIterator[list[dict]]:
+    """
+    Walk a stored conversation in chunks, oldest first.
+
+    Messages saved during the walk are not included, and only one chunk is
+    held in memory at a time.
+
+    Args:
+        redis: Async Redis client
+        key: Conversation key from ``chat_key``
+        chunk_size: Maximum number of messages per chunk
+
+    Yields:
+        Lists of parsed messages with ``seq`` set
+    """
+    latest_seq, _, length = await read_bounds(redis, key)
+    after_seq = latest_seq - length
+    while after_seq < latest_seq:
+        before = min(after_seq + chunk_size, latest_seq) + 1
+        messages, _, _ = await read_page(redis, key, chunk_size, after_seq, before)
+        if messages:
+            yield messages
+        after_seq = before - 1
+
+
+async def clear(redis, key: str, ttl_seconds: int) -> None:
+    """
+    Delete the messages of a conversation but keep numbering them on.
+
+    The removed range is recorded, so replays can tell clients to drop what
+    they have.
+
+    Args:
+        redis: Async Redis client
+        key: Conversation key from ``chat_key``
+        ttl_seconds: Retention of the conversation
+    """
+    pipe = redis.pipeline(transaction=True)
+    pipe.get(seq_key(key))
+    pipe.delete(key, version_key(key))
+    latest_seq, _ = await pipe.execute()
+    if latest_seq is not None:
+        await redis.set(cleared_key(key), latest_seq, ex=ttl_seconds)
+
+
+def _parse(raw_messages: list[str], first_seq: int) -> list[dict]:
+    """Parse stored messages, numbering them from ``first_seq``."""
+    parsed_messages = []
+    for seq, message in enumerate(raw_messages, start=first_seq):
+        try:
+            parsed = json.loads(message)
+        except json.JSONDecodeError as e:
+            chat_logger.warning("Failed to parse message: %s", e)
+            continue
+        parsed["seq"] = seq
+        parsed_messages.append(parsed)
+    return parsed_messages
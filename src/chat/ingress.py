@@ -0,0 +1,338 @@
+"""Ingress guard for inbound WebSocket chat frames."""
+
+import json
+import re
+import time
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.logger import websocket_logger
+
+# Upper bound for client-generated message ids
+MAX_ID_LENGTH = 64
+# Server-assigned message ids are uuid4 hex strings
+SERVER_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Token bucket kept in a Redis hash so that all nodes share one budget per user
+_REDIS_TOKEN_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return allowed
+"""
+
+
+class IngressRejected(Exception):
+    """Raised when an inbound frame is rejected by the ingress guard."""
+
+    def __init__(self, error_type: str, message: str):
+        """
+        Initialize the rejection.
+
+        Args:
+            error_type: Machine-readable error code sent to the client
+            message: Human-readable error description
+        """
+        super().__init__(message)
+        self.error_type = error_type
+        self.message = message
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def consume(self, cost: int = 1) -> bool:
+        """
+        Take tokens from the bucket.
+
+        Args:
+            cost: Number of tokens to take
+
+        Returns:
+            True if enough tokens were available, False if the caller is
+            rate limited (no tokens are taken in that case)
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def is_full(self, now: float) -> bool:
+        """
+        Check whether the bucket has refilled completely.
+
+        A full bucket behaves exactly like a new one, so it can be dropped
+        without giving its owner extra tokens.
+
+        Args:
+            now: Current ``time.monotonic()`` value
+        """
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+class IngressGuard:
+    """
+    Validate inbound chat frames before they reach the chat service.
+
+    Checks run in order: frame size, payload schema, then the per-user rate
+    limit, where every message and every receipt of a batch frame costs one
+    token. A receipt carries at most ``max_batch_size`` message ids.
+    """
+
+    def __init__(
+        self,
+        max_frame_bytes: int = None,
+        max_message_length: int = None,
+        max_batch_size: int = None,
+        rate_per_second: float = None,
+        burst: int = None,
+        redis_url: str | None = None,
+    ):
+        """
+        Initialize the guard.
+
+        Args:
+            max_frame_bytes: Maximum size of a text frame in UTF-8 bytes
+            max_message_length: Maximum length of message text in characters
+            max_batch_size: Maximum number of messages in one batch frame
+            rate_per_second: Sustained messages per second allowed per user
+            burst: Number of messages a user may send at once
+            redis_url: Redis URL to coordinate rate limits across nodes
+                (optional, local buckets are used when not set)
+        """
+        self.max_frame_bytes = max_frame_bytes or settings.ws_max_frame_bytes
+        self.max_message_length = max_message_length or settings.max_message_length
+        self.max_batch_size = max_batch_size or settings.ws_max_batch_size
+        self.rate_per_second = rate_per_second or settings.ws_rate_limit_per_second
+        self.burst = burst or settings.ws_rate_limit_burst
+        self.redis_url = redis_url
+        self.redis: redis.Redis | None = None
+        self._redis_bucket = None
+        self._buckets: dict[int, TokenBucket] = {}
+        # Полные корзины удаляются не чаще, чем корзина успевает наполниться
+        self._prune_interval = self.burst / self.rate_per_second
+        self._next_prune_at = time.monotonic() + self._prune_interval
+        self._logger = websocket_logger
+
+    async def admit(self, user_id: int, frame: dict) -> list[dict]:
+        """
+        Check an inbound ASGI WebSocket frame.
+
+        Args:
+            user_id: ID of the sending user
+            frame: Message received from ``WebSocket.receive()``
+
+        Returns:
+            Normalized events to handle, empty for blank frames that are
+            ignored. Events are ``{"type": "message", "message": str,
+            "client_id": str | None}`` or ``{"type": "receipt", "ids": [str]}``.
+
+        Raises:
+            IngressRejected: If the frame violates size, schema or rate rules
+        """
+        text = frame.get("text")
+        if text is None:
+            raise IngressRejected(
+                "unsupported_frame", "Поддерживаются только текстовые сообщения"
+            )
+
+        self._check_size(text)
+        if not text.strip():
+            return []
+
+        events = self._parse_frame(text)
+        # Квитанции тоже рассылаются по всем сессиям, поэтому платят токенами
+        if events and not await self._consume_tokens(user_id, len(events)):
+            raise IngressRejected(
+                "rate_limited", "Слишком много сообщений, попробуйте позже"
+            )
+        return events
+
+    def forget(self, user_id: int) -> None:
+        """
+        Drop local rate limiter state for a user if it holds no debt.
+
+        A bucket that has not refilled yet is kept, so reconnecting does not
+        restore the burst; it is dropped later by the idle sweep.
+
+        Args:
+            user_id: ID of the user whose last session has closed
+        """
+        bucket = self._buckets.get(user_id)
+        if bucket is not None and bucket.is_full(time.monotonic()):
+            del self._buckets[user_id]
+
+    async def close(self) -> None:
+        """Close the Redis connection of the shared rate limiter, if any."""
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+            self._redis_bucket = None
+
+    def _check_size(self, text: str) -> None:
+        """Reject frames above the byte limit without encoding short ones."""
+        # A character takes at most 4 bytes in UTF-8
+        if len(text) * 4 <= self.max_frame_bytes:
+            return
+        if len(text) > self.max_frame_bytes or (
+            len(text.encode("utf-8")) > self.max_frame_bytes
+        ):
+            raise IngressRejected("frame_too_large", "Сообщение слишком большое")
+
+    async def _consume_tokens(self, user_id: int, cost: int) -> bool:
+        """Take tokens from the user's bucket, shared via Redis when configured."""
+        if self.redis_url:
+            try:
+                return await self._consume_redis_tokens(user_id, cost)
+            except Exception as e:
+                self._logger.warning("Redis rate limiter unavailable: %s", e)
+
+        self._prune_idle_buckets()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_second, self.burst)
+            self._buckets[user_id] = bucket
+        return bucket.consume(cost)
+
+    def _prune_idle_buckets(self) -> None:
+        """Drop buckets that have refilled completely since their last use."""
+        now = time.monotonic()
+        if now < self._next_prune_at:
+            return
+        self._next_prune_at = now + self._prune_interval
+        for user_id in [
+            user_id for user_id, bucket in self._buckets.items() if bucket.is_full(now)
+        ]:
+            del self._buckets[user_id]
+
+    async def _consume_redis_tokens(self, user_id: int, cost: int) -> bool:
+        """Run the token bucket script in Redis."""
+        if self._redis_bucket is None:
+            self.redis = redis.from_url(self.redis_url, decode_responses=True)
+            self._redis_bucket = self.redis.register_script(_REDIS_TOKEN_BUCKET)
+        allowed = await self._redis_bucket(
+            keys=[f"ratelimit:ws:{user_id}"],
+            args=[self.rate_per_second, self.burst, time.time(), cost],
+        )
+        return bool(allowed)
+
+    def _parse_frame(self, text: str) -> list[dict]:
+        """
+        Extract events from a frame.
+
+        Accepted formats are plain text, a single event object and
+        ``{"type": "batch", "messages": [...]}`` where each item is either a
+        string or an event object.
+        """
+        if not text.lstrip().startswith("{"):
+            return [self._message_event(text, None)]
+
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise IngressRejected(
+                "invalid_message", "Некорректный формат сообщения"
+            ) from e
+        if not isinstance(payload, dict):
+            raise IngressRejected("invalid_message", "Некорректный формат сообщения")
+
+        if payload.get("type") != "batch":
+            return [self._parse_event(payload)]
+
+        items = payload.get("messages")
+        if not isinstance(items, list) or not items:
+            raise IngressRejected("invalid_message", "Некорректный формат пакета")
+        if len(items) > self.max_batch_size:
+            raise IngressRejected(
+                "batch_too_large",
+                f"Максимальный размер пакета {self.max_batch_size} сообщений",
+            )
+        return [
+            (
+                self._message_event(item, None)
+                if isinstance(item, str)
+                else self._parse_event(item)
+            )
+            for item in items
+        ]
+
+    def _parse_event(self, payload) -> dict:
+        """Validate a single message or receipt object."""
+        if not isinstance(payload, dict):
+            raise IngressRejected("invalid_message", "Некорректный формат сообщения")
+
+        event_type = payload.get("type", "message")
+        if event_type == "receipt":
+            ids = payload.get("ids")
+            if (
+                not isinstance(ids, list)
+                or not ids
+                or len(ids) > self.max_batch_size
+                or not all(self._is_server_id(i) for i in ids)
+            ):
+                raise IngressRejected("invalid_message", "Некорректное подтверждение")
+            return {"type": "receipt", "ids": ids}
+
+        client_id = payload.get("client_id")
+        if (
+            event_type != "message"
+            or not isinstance(payload.get("message"), str)
+            or not (client_id is None or self._is_valid_id(client_id))
+        ):
+            raise IngressRejected("invalid_message", "Некорректный формат сообщения")
+        return self._message_event(payload["message"], client_id)
+
+    def _message_event(self, message: str, client_id: str | None) -> dict:
+        """Strip message text, check its length and build a message event."""
+        message = message.strip()
+        if not message:
+            raise IngressRejected("invalid_message", "Пустое сообщение")
+        if len(message) > self.max_message_length:
+            raise IngressRejected(
+                "message_too_long",
+                f"Максимальная длина сообщения {self.max_message_length} символов",
+            )
+        return {"type": "message", "message": message, "client_id": client_id}
+
+    @staticmethod
+    def _is_valid_id(value) -> bool:
+        """Check that a client message id is a short string."""
+        return isinstance(value, str) and 0 < len(value) <= MAX_ID_LENGTH
+
+    @staticmethod
+    def _is_server_id(value) -> bool:
+        """Check that a message id has the shape the server assigns."""
+        return isinstance(value, str) and SERVER_ID_PATTERN.fullmatch(value) is not None
@@ -0,0 +1,183 @@
+"""In-process substitute for the Redis commands used by the application."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable
+
+
+class InMemoryRedis:
+    """
+    Async in-memory stand-in for ``redis.asyncio.Redis``.
+
+    Implements only the commands the application uses, with Redis semantics
+    for list ranges and key expiration. Used in the test environment and by
+    local benchmarks where a Redis server is not available.
+    """
+
+    def __init__(self):
+        """Initialize an empty keyspace."""
+        self._data: dict[str, object] = {}
+        self._expires_at: dict[str, float] = {}
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+
+    def _get(self, key: str, default=None):
+        """Get a live value, dropping it first if it has expired."""
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires_at[key]
+        return self._data.get(key, default)
+
+    async def ping(self) -> bool:
+        """Check the connection."""
+        return True
+
+    async def exists(self, *keys: str) -> int:
+        """Count how many of the keys exist."""
+        return sum(1 for key in keys if self._get(key) is not None)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        """Set a key's time to live in seconds."""
+        if self._get(key) is None:
+            return False
+        self._expires_at[key] = time.monotonic() + seconds
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        """Delete keys."""
+        deleted = 0
+        for key in keys:
+            if self._get(key) is not None:
+                deleted += 1
+            self._data.pop(key, None)
+            self._expires_at.pop(key, None)
+        return deleted
+
+    async def get(self, key: str):
+        """Get the value of a key."""
+        return self._get(key)
+
+    async def set(
+        self, key: str, value, ex: int | None = None, nx: bool = False
+    ) -> bool | None:
+        """
+        Set the value of a key, with an optional expiration in seconds.
+
+        With ``nx`` an existing key is left alone and None is returned.
+        """
+        if nx and self._get(key) is not None:
+            return None
+        self._data[key] = str(value)
+        self._expires_at.pop(key, None)
+        if ex is not None:
+            await self.expire(key, ex)
+        return True
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """Increment the integer value of a key."""
+        value = int(self._get(key, 0)) + amount
+        self._data[key] = str(value)
+        return value
+
+    async def rpush(self, key: str, *values: str) -> int:
+        """Append values to a list."""
+        items = self._get(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(values)
+        return len(items)
+
+    async def llen(self, key: str) -> int:
+        """Get the length of a list."""
+        return len(self._get(key, []))
+
+    async def lrange(self, key: str, start: int, end: int) -> list[str]:
+        """Get a range of list elements, ``end`` inclusive as in Redis."""
+        items = self._get(key, [])
+        size = len(items)
+        if start < 0:
+            start = max(size + start, 0)
+        if end < 0:
+            end = size + end
+        end = min(end, size - 1)
+        if start > end:
+            return []
+        return items[start : end + 1]
+
+    async def aclose(self) -> None:
+        """Close the connection."""
+
+    async def publish(self, channel: str, message) -> int:
+        """Send a message to the subscribers of a channel."""
+        queues = self._subscribers.get(channel, set())
+        for queue in queues:
+            queue.put_nowait(
+                {"type": "message", "channel": channel, "data": str(message)}
+            )
+        return len(queues)
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        """Create a command buffer, executed as one transaction."""
+        return InMemoryPipeline(self)
+
+    def pubsub(self) -> "InMemoryPubSub":
+        """Create a subscription handle."""
+        return InMemoryPubSub(self)
+
+
+class InMemoryPipeline:
+    """
+    Command buffer of ``InMemoryRedis``, like ``redis.asyncio.client.Pipeline``.
+
+    Commands are queued and run back to back by ``execute`` without yielding
+    to the event loop, so they are atomic like a MULTI/EXEC transaction.
+    """
+
+    def __init__(self, redis: InMemoryRedis):
+        """Initialize an empty buffer."""
+        self._redis = redis
+        self._commands: list[tuple[Callable, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Callable:
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs) -> "InMemoryPipeline":
+            self._commands.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list:
+        """Run the queued commands and return their results in order."""
+        commands, self._commands = self._commands, []
+        return [await command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class InMemoryPubSub:
+    """Subscription handle, like ``redis.asyncio.client.PubSub``."""
+
+    def __init__(self, redis: InMemoryRedis):
+        """Initialize a handle without subscriptions."""
+        self._redis = redis
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._channels: set[str] = set()
+
+    async def subscribe(self, *channels: str) -> None:
+        """Subscribe to channels."""
+        for channel in channels:
+            self._redis._subscribers.setdefault(channel, set()).add(self._queue)
+            self._channels.add(channel)
+            self._queue.put_nowait(
+                {"type": "subscribe", "channel": channel, "data": len(self._channels)}
+            )
+
+    async def listen(self) -> AsyncIterator[dict]:
+        """Yield subscription confirmations and messages as they arrive."""
+        while True:
+            yield await self._queue.get()
+
+    async def aclose(self) -> None:
+        """Drop all subscriptions."""
+        for channel in self._channels:
+            self._redis._subscribers.get(channel, set()).discard(self._queue)
+        self._channels.clear()
@@ -0,0 +1,114 @@
+"""Per-socket outbound queue that coalesces chat events into batch frames."""
+
+import asyncio
+from typing import Callable
+
+from fastapi import WebSocket
+
+from src.config import settings
+from src.logger import chat_logger
+
+
+class Outbox:
+    """
+    Outbound buffer for a single WebSocket session.
+
+    Events sent within the flush window are written as one
+    ``{"type": "batch", "events": [...]}`` frame; a lone event is written
+    unchanged so clients that do not batch see the usual format.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_error: Callable[[WebSocket], None] | None = None,
+        flush_window_ms: int = None,
+        max_batch_size: int = None,
+    ):
+        """
+        Initialize the outbox.
+
+        Args:
+            websocket: WebSocket connection to write to
+            on_error: Callback invoked with the WebSocket when a write fails
+            flush_window_ms: Coalescing window in milliseconds, 0 disables it
+            max_batch_size: Number of buffered events that forces a flush
+        """
+        self.websocket = websocket
+        self.on_error = on_error
+        self.flush_window = (
+            settings.ws_flush_window_ms if flush_window_ms is None else flush_window_ms
+        ) / 1000
+        self.max_batch_size = max_batch_size or settings.ws_max_batch_size
+        self._buffer: list[str] = []
+        self._flush_task: asyncio.Task | None = None
+        self._paused = False
+        self._logger = chat_logger
+
+    async def send(self, data: str) -> None:
+        """
+        Queue a JSON-encoded event for the socket.
+
+        Args:
+            data: JSON object encoded as a string
+
+        Raises:
+            Exception: Write errors when coalescing is disabled
+        """
+        if self._paused:
+            self._buffer.append(data)
+            return
+        if self.flush_window <= 0:
+            await self.websocket.send_text(data)
+            return
+
+        self._buffer.append(data)
+        if len(self._buffer) >= self.max_batch_size:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    def pause(self) -> None:
+        """Hold events in the buffer until ``resume`` is called."""
+        self._paused = True
+
+    async def resume(self) -> None:
+        """Stop holding events and write the ones buffered meanwhile."""
+        self._paused = False
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write all buffered events as a single frame."""
+        if self._flush_task is not None and (
+            self._flush_task is not asyncio.current_task()
+        ):
+            self._flush_task.cancel()
+        self._flush_task = None
+
+        if not self._buffer or self._paused:
+            return
+        events, self._buffer = self._buffer, []
+        if len(events) == 1:
+            frame = events[0]
+        else:
+            # Events are already encoded, join them instead of re-serializing
+            frame = '{"type": "batch", "events": [' + ", ".join(events) + "]}"
+
+        try:
+            await self.websocket.send_text(frame)
+        except Exception as e:
+            self._logger.error("Error flushing %s events: %s", len(events), e)
+            if self.on_error:
+                self.on_error(self.websocket)
+
+    def close(self) -> None:
+        """Drop buffered events and cancel the pending flush."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._buffer.clear()
+
+    async def _flush_later(self) -> None:
+        """Flush once the coalescing window has passed."""
+        await asyncio.sleep(self.flush_window)
+        await self.flush()
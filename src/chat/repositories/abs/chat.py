@@ -1,6 +1,7 @@
 """Abstract base class for chat repositories."""
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 
 
 class AbstractChatRepository(ABC):
@@ -20,17 +21,53 @@ class AbstractChatRepository(ABC):
 
     @abstractmethod
     async def get_history(
-        self, user1: int, user2: int, limit: int = 50
+        self, user1: int, user2: int, limit: int = 50, before: int | None = None
     ) -> list[dict[str, str | int | float | bool | None]]:
         """
         Get chat history between two users.
 
+        Messages are numbered with a ``seq`` that grows in the order they
+        were saved and is never reused, even after the history expired; it
+        does not necessarily start at 1. Pass the ``seq`` of the oldest
+        message a client has as ``before`` to page backwards.
+
         Args:
             user1: ID of the first user
             user2: ID of the second user
             limit: Maximum number of messages to return
+            before: Only return messages with a lower ``seq`` (latest page if None)
 
         Returns:
-            List of message objects
+            List of message objects with ``from``, ``to``, ``message``, an ISO
+            8601 UTC ``timestamp`` and ``seq``, oldest first
+        """
+        pass
+
+    @abstractmethod
+    def iter_history(
+        self, user1: int, user2: int, chunk_size: int = 500
+    ) -> AsyncIterator[list[dict[str, str | int | float | bool | None]]]:
+        """
+        Walk the whole chat history between two users in chunks.
+
+        Only one chunk is held in memory at a time, so callers can stream
+        conversations of any length.
+
+        Args:
+            user1: ID of the first user
+            user2: ID of the second user
+            chunk_size: Maximum number of messages per chunk
+
+        Yields:
+            Lists of message objects shaped like ``get_history`` results,
+            oldest first
         """
         pass
+
+    async def close(self) -> None:
+        """
+        Release connections held by the repository, if any.
+
+        Repositories without connections keep this default, which does nothing.
+        """
+        return None
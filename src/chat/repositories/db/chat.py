@@ -2,12 +2,15 @@
 
 import json
 import logging
+from collections.abc import AsyncIterator
 from datetime import datetime
 
 import redis.asyncio as redis
 from redis.asyncio import Redis
 
+from src.chat import history
 from src.chat.repositories.abs.chat import AbstractChatRepository
+from src.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +18,17 @@ logger = logging.getLogger(__name__)
 class ChatRepositoryDB(AbstractChatRepository):
     """Redis-based implementation of chat repository."""
 
-    def __init__(self, redis_url: str):
+    def __init__(self, redis_url: str, redis_client: Redis | None = None):
         """
         Initialize the repository with Redis connection.
 
         Args:
             redis_url: Redis connection URL
+            redis_client: Ready Redis client to use instead of connecting to
+                ``redis_url`` on first use (optional)
         """
         self.redis_url = redis_url
-        self.redis: Redis | None = None
+        self.redis: Redis | None = redis_client
 
     def _get_redis(self) -> Redis:
         """Get or create Redis connection."""
@@ -35,6 +40,9 @@ class ChatRepositoryDB(AbstractChatRepository):
         """
         Save a message to Redis.
 
+        The message is numbered and expires like the ones the WebSocket
+        service stores, see ``src.chat.history``.
+
         Args:
             from_user: ID of the user sending the message
             to_user: ID of the user receiving the message
@@ -42,21 +50,25 @@ class ChatRepositoryDB(AbstractChatRepository):
         """
         try:
             redis_client = self._get_redis()
-            key = f"chat:{min(from_user, to_user)}:{max(from_user, to_user)}"
             message_data = {
                 "from": from_user,
                 "to": to_user,
                 "message": message,
                 "timestamp": datetime.utcnow().isoformat(),
             }
-            await redis_client.rpush(key, json.dumps(message_data))  # type: ignore
-            logger.debug(f"Message saved from user {from_user} to user {to_user}")
+            await history.append(
+                redis_client,
+                history.chat_key(from_user, to_user),
+                json.dumps(message_data),
+                settings.message_retention_minutes * 60,
+            )
+            logger.debug("Message saved from user %s to user %s", from_user, to_user)
         except Exception as e:
-            logger.error(f"Failed to save message: {str(e)}")
+            logger.error("Failed to save message: %s", e)
             raise
 
     async def get_history(
-        self, user1: int, user2: int, limit: int = 50
+        self, user1: int, user2: int, limit: int = 50, before: int | None = None
     ) -> list[dict[str, str | int | float | bool | None]]:
         """
         Get chat history from Redis.
@@ -65,29 +77,43 @@ class ChatRepositoryDB(AbstractChatRepository):
             user1: ID of the first user
             user2: ID of the second user
             limit: Maximum number of messages to return
+            before: Only return messages with a lower ``seq`` (latest page if None)
 
         Returns:
-            List of message objects with timestamp, from, to, and message fields
+            List of message objects with seq, timestamp, from, to, and message
+            fields
         """
         try:
-            redis_client = self._get_redis()
-            key = f"chat:{min(user1, user2)}:{max(user1, user2)}"
-            messages = await redis_client.lrange(key, -limit, -1)  # type: ignore
-            parsed_messages = []
-            for message in messages:
-                try:
-                    parsed_message = json.loads(message)
-                    parsed_messages.append(parsed_message)
-                except json.JSONDecodeError as e:
-                    logger.warning(
-                        f"Failed to parse message: {message}, error: {str(e)}"
-                    )
-                    continue
-            return parsed_messages
+            messages, _, _ = await history.read_page(
+                self._get_redis(), history.chat_key(user1, user2), limit, before=before
+            )
+            return messages
         except Exception as e:
-            logger.error(f"Failed to get chat history: {str(e)}")
+            logger.error("Failed to get chat history: %s", e)
             raise
 
+    async def iter_history(
+        self, user1: int, user2: int, chunk_size: int = 500
+    ) -> AsyncIterator[list[dict[str, str | int | float | bool | None]]]:
+        """
+        Walk chat history in Redis in chunks.
+
+        The bounds are read once, so messages sent during the walk are not
+        included and every chunk is one LRANGE of its own size.
+
+        Args:
+            user1: ID of the first user
+            user2: ID of the second user
+            chunk_size: Maximum number of messages per chunk
+
+        Yields:
+            Lists of message objects with seq, oldest first
+        """
+        async for chunk in history.iter_pages(
+            self._get_redis(), history.chat_key(user1, user2), chunk_size
+        ):
+            yield chunk
+
     async def close(self) -> None:
         """Close the Redis connection."""
         try:
@@ -96,5 +122,5 @@ class ChatRepositoryDB(AbstractChatRepository):
                 self.redis = None
                 logger.debug("Redis connection closed")
         except Exception as e:
-            logger.error(f"Failed to close Redis connection: {str(e)}")
+            logger.error("Failed to close Redis connection: %s", e)
             raise
@@ -1,5 +1,8 @@
 """In-memory implementation of chat repository."""
 
+from collections.abc import AsyncIterator
+from datetime import datetime
+
 from src.chat.repositories.abs.chat import AbstractChatRepository
 
 
@@ -9,6 +12,7 @@ class ChatRepositoryInMemory(AbstractChatRepository):
     def __init__(self):
         """Initialize the in-memory repository."""
         self.messages = {}
+        self.last_seq = {}
 
     async def save_message(self, from_user: int, to_user: int, message: str) -> None:
         """
@@ -22,12 +26,21 @@ class ChatRepositoryInMemory(AbstractChatRepository):
         key = tuple(sorted((from_user, to_user)))
         if key not in self.messages:
             self.messages[key] = []
+        # Same fields as the Redis repository stores, numbered by a counter
+        # that outlives the messages like the ``:seq`` key does
+        self.last_seq[key] = self.last_seq.get(key, 0) + 1
         self.messages[key].append(
-            {"from": from_user, "to": to_user, "message": message}
+            {
+                "from": from_user,
+                "to": to_user,
+                "message": message,
+                "timestamp": datetime.utcnow().isoformat(),
+                "seq": self.last_seq[key],
+            }
         )
 
     async def get_history(
-        self, user1: int, user2: int, limit: int = 50
+        self, user1: int, user2: int, limit: int = 50, before: int | None = None
     ) -> list[dict[str, str | int | float | bool | None]]:
         """
         Get chat history from in-memory storage.
@@ -36,9 +49,32 @@ class ChatRepositoryInMemory(AbstractChatRepository):
             user1: ID of the first user
             user2: ID of the second user
             limit: Maximum number of messages to return
+            before: Only return messages with a lower ``seq`` (latest page if None)
 
         Returns:
-            List of message objects
+            List of message objects with ``seq``
+        """
+        key = tuple(sorted((user1, user2)))
+        messages = self.messages.get(key, [])
+        if before is not None:
+            messages = [message for message in messages if message["seq"] < before]
+        return [dict(message) for message in messages[-limit:]] if limit > 0 else []
+
+    async def iter_history(
+        self, user1: int, user2: int, chunk_size: int = 500
+    ) -> AsyncIterator[list[dict[str, str | int | float | bool | None]]]:
+        """
+        Walk chat history in memory in chunks.
+
+        Args:
+            user1: ID of the first user
+            user2: ID of the second user
+            chunk_size: Maximum number of messages per chunk
+
+        Yields:
+            Lists of message objects with ``seq``, oldest first
         """
         key = tuple(sorted((user1, user2)))
-        return self.messages.get(key, [])[-limit:]
+        messages = list(self.messages.get(key, []))
+        for start in range(0, len(messages), chunk_size):
+            yield [dict(message) for message in messages[start : start + chunk_size]]
@@ -1,13 +1,32 @@
 """WebSocket service for managing chat connections and message handling."""
 
+import asyncio
 import json
+import random
 import time
+import uuid
+from collections.abc import AsyncIterator
 
 import redis.asyncio as redis
 from fastapi import WebSocket
 
+from src.chat import history
+from src.chat.outbox import Outbox
 from src.config import settings
 from src.logger import chat_logger
+from src.metrics import (
+    REDIS_COMMAND_SECONDS,
+    WS_ACTIVE_CONNECTIONS,
+    WS_FANOUT_SESSIONS,
+    TimedRedis,
+)
+from src.users.loader import UserLoader
+
+# Close codes sent to clients when connection limits are enforced
+CLOSE_CODE_SESSION_EVICTED = 4005
+CLOSE_CODE_NODE_FULL = 1013
+# Sent while draining, clients reconnect to another node
+CLOSE_CODE_SERVICE_RESTART = 1012
 
 
 class ChatWebSocketService:
@@ -17,42 +36,111 @@ class ChatWebSocketService:
     Stores active connections, message history in Redis, and ensures message delivery.
     """
 
-    def __init__(self, redis_url: str = None, user_service=None):
+    def __init__(self, redis_url: str = None, user_service=None, redis_client=None):
         """
         Initialize the service.
 
         Args:
             redis_url: Redis connection URL (optional, uses config default)
             user_service: User service for checking blocks
+            redis_client: Ready Redis client to use instead of connecting to
+                ``redis_url`` on first connect (optional)
         """
-        self.active_connections: dict[int, set[WebSocket]] = {}
+        # Sessions per user in connection order (oldest first) for eviction,
+        # each with its own outbound buffer
+        self.active_connections: dict[int, dict[WebSocket, Outbox]] = {}
         self.redis_url = redis_url or settings.redis_url
-        self.redis: redis.Redis | None = None
+        self.redis: redis.Redis | None = (
+            TimedRedis(redis_client, REDIS_COMMAND_SECONDS) if redis_client else None
+        )
         self.user_service = user_service
+        self.max_connections_per_user = settings.max_connections_per_user
+        self.max_connections_per_node = settings.max_connections_per_node
+        self._connection_count = 0
+        # Bumped whenever a user goes online or offline on this node
+        self._presence_version = 0
+        # Drain mode: new sessions are refused before shutdown
+        self.draining = False
+        # Messages being saved and broadcast, waited for while draining
+        self._writes_in_flight = 0
+        self._writes_done = asyncio.Event()
+        self._writes_done.set()
         self._logger = chat_logger
 
-    async def connect(self, user_id: int, websocket: WebSocket) -> None:
+    async def connect(self, user_id: int, websocket: WebSocket) -> bool:
         """
         Connect user to chat (connection registration only).
 
+        Enforces per-user and per-node connection limits. When the user is at
+        the limit, the oldest sessions are closed to make room. When the node is
+        full and the user has no session to give up, the connection is rejected.
+
         Args:
             user_id: ID of the user connecting
             websocket: WebSocket connection object
+
+        Returns:
+            True if the connection was registered, False if it was rejected
         """
+        if self.draining:
+            await self._close_websocket(
+                websocket, CLOSE_CODE_SERVICE_RESTART, "Server is restarting"
+            )
+            return False
+
+        sessions = self.active_connections.get(user_id, {})
+        if self._connection_count >= self.max_connections_per_node and not sessions:
+            self._logger.warning(
+                "Node connection limit reached, rejecting user %s", user_id
+            )
+            await self._close_websocket(
+                websocket, CLOSE_CODE_NODE_FULL, "Server connection limit reached"
+            )
+            return False
+
+        while sessions and (
+            len(sessions) >= self.max_connections_per_user
+            or self._connection_count >= self.max_connections_per_node
+        ):
+            oldest = next(iter(sessions))
+            self._remove_connection(user_id, oldest)
+            self._logger.info("Evicting oldest session of user %s", user_id)
+            await self._close_websocket(
+                oldest, CLOSE_CODE_SESSION_EVICTED, "Session limit reached"
+            )
+
         self._ensure_user_connections(user_id)
-        self.active_connections[user_id].add(websocket)
+        self.active_connections[user_id][websocket] = Outbox(
+            websocket, on_error=lambda ws: self._remove_connection(user_id, ws)
+        )
+        self._connection_count += 1
+        WS_ACTIVE_CONNECTIONS.set(self._connection_count)
         await self._initialize_redis()
-        self._logger.info(f"User {user_id} connected to chat")
+        self._logger.info("User %s connected to chat", user_id)
+        return True
 
     def _ensure_user_connections(self, user_id: int) -> None:
-        """Ensure user has a connections set."""
+        """Ensure user has a connections mapping."""
         if user_id not in self.active_connections:
-            self.active_connections[user_id] = set()
+            self.active_connections[user_id] = {}
+            self._presence_version += 1
+
+    async def _close_websocket(
+        self, websocket: WebSocket, code: int, reason: str
+    ) -> None:
+        """Close WebSocket ignoring errors from already closed connections."""
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception as e:
+            self._logger.debug("Error closing WebSocket: %s", e)
 
     async def _initialize_redis(self) -> None:
         """Initialize Redis connection if not already done."""
         if not self.redis:
-            self.redis = redis.from_url(self.redis_url, decode_responses=True)
+            self.redis = TimedRedis(
+                redis.from_url(self.redis_url, decode_responses=True),
+                REDIS_COMMAND_SECONDS,
+            )
             self._logger.info("Redis connection initialized")
 
     def disconnect(self, user_id: int, websocket: WebSocket) -> None:
@@ -63,11 +151,96 @@ class ChatWebSocketService:
             user_id: ID of the user disconnecting
             websocket: WebSocket connection object
         """
-        if user_id in self.active_connections:
-            self.active_connections[user_id].discard(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-                self._logger.info(f"User {user_id} disconnected from chat")
+        self._remove_connection(user_id, websocket)
+        if user_id not in self.active_connections:
+            self._logger.info("User %s disconnected from chat", user_id)
+
+    def _remove_connection(self, user_id: int, websocket: WebSocket) -> None:
+        """Remove a single session, dropping the user entry when it was the last."""
+        sessions = self.active_connections.get(user_id)
+        outbox = sessions.pop(websocket, None) if sessions is not None else None
+        if outbox is None:
+            return
+        outbox.close()
+        self._connection_count -= 1
+        WS_ACTIVE_CONNECTIONS.set(self._connection_count)
+        if not sessions:
+            del self.active_connections[user_id]
+            self._presence_version += 1
+
+    async def drain(self, timeout: float = None) -> None:
+        """
+        Move all sessions off this node before shutdown.
+
+        New sessions are refused from now on. Messages being saved are
+        awaited, then every session gets its buffered events followed by a
+        ``{"type": "reconnect", "retry_after_ms": ...}`` frame with a random
+        delay, so clients do not reconnect to the other nodes all at once, and
+        is closed with code 1012. Sessions left when the deadline passes are
+        dropped without the frame.
+
+        Args:
+            timeout: Deadline in seconds (uses config default)
+        """
+        timeout = settings.ws_drain_timeout_seconds if timeout is None else timeout
+        self.draining = True
+        sessions = [
+            (user_id, websocket, outbox)
+            for user_id, user_sessions in self.active_connections.items()
+            for websocket, outbox in user_sessions.items()
+        ]
+        self._logger.info("Draining %d WebSocket sessions", len(sessions))
+        try:
+            await asyncio.wait_for(self._drain_sessions(sessions), timeout)
+        except asyncio.TimeoutError:
+            self._logger.warning("Drain deadline of %.1f s exceeded", timeout)
+        for user_id, websocket, _ in sessions:
+            self._remove_connection(user_id, websocket)
+
+    async def _drain_sessions(self, sessions: list[tuple]) -> None:
+        """Flush, hint a reconnect and close every session."""
+        await self._writes_done.wait()
+        await asyncio.gather(
+            *(self._send_reconnect(outbox) for _, _, outbox in sessions),
+            return_exceptions=True,
+        )
+        await asyncio.gather(
+            *(
+                self._close_websocket(
+                    websocket, CLOSE_CODE_SERVICE_RESTART, "Server is restarting"
+                )
+                for _, websocket, _ in sessions
+            )
+        )
+        # Messages received while the frames were being written
+        await self._writes_done.wait()
+
+    async def _send_reconnect(self, outbox: Outbox) -> None:
+        """Write buffered events and the reconnect hint to a session."""
+        retry_after_ms = random.randint(0, settings.ws_reconnect_jitter_ms)
+        await outbox.send(
+            json.dumps({"type": "reconnect", "retry_after_ms": retry_after_ms})
+        )
+        # Also releases events held back during a replay
+        await outbox.resume()
+
+    def get_connection_count(self) -> int:
+        """
+        Get the number of WebSocket sessions registered on this node.
+
+        Returns:
+            Total number of active sessions across all users
+        """
+        return self._connection_count
+
+    def get_presence_version(self) -> int:
+        """
+        Get a version of the online user set on this node.
+
+        Returns:
+            Counter that changes whenever a user goes online or offline
+        """
+        return self._presence_version
 
     def get_online_users(self) -> set[int]:
         """
@@ -79,8 +252,13 @@ class ChatWebSocketService:
         return set(self.active_connections.keys())
 
     async def send_personal_message(
-        self, message: str, to_user_id: int, from_user_id: int
-    ) -> bool:
+        self,
+        message: str,
+        to_user_id: int,
+        from_user_id: int,
+        client_id: str | None = None,
+        users: UserLoader | None = None,
+    ) -> dict | None:
         """
         Send personal message between users, save to Redis and broadcast to all
         sessions.
@@ -89,103 +267,155 @@ class ChatWebSocketService:
             message: Message content
             to_user_id: ID of the recipient
             from_user_id: ID of the sender
+            client_id: Message ID generated by the sending client (optional)
+            users: Loader shared by a batch of messages to look the sender up
+                once (optional)
 
         Returns:
-            True if message was sent successfully, False otherwise
+            Stored message data with server-assigned ``id``, ``seq`` and
+            ``timestamp``, or None if the message was not sent
         """
         if self._is_message_blocked(from_user_id, to_user_id):
-            return False
+            return None
 
+        self._writes_in_flight += 1
+        self._writes_done.clear()
         try:
-            await self._save_message_to_redis(message, to_user_id, from_user_id)
-            message_data = self._create_message_data(message, from_user_id)
-            await self._broadcast_message(message_data, to_user_id, from_user_id)
+            message_data = self._create_message_data(
+                message, to_user_id, from_user_id, client_id, users
+            )
+            message_data["seq"] = await self._save_message_to_redis(
+                json.dumps(message_data), to_user_id, from_user_id
+            )
+            await self._broadcast_message(
+                json.dumps(message_data), to_user_id, from_user_id
+            )
 
-            self._logger.info(f"Message sent from {from_user_id} to {to_user_id}")
-            return True
+            self._logger.info("Message sent from %s to %s", from_user_id, to_user_id)
+            return message_data
 
         except Exception as e:
             self._logger.error(
-                f"Error sending message from {from_user_id} to {to_user_id}: {e}"
+                "Error sending message from %s to %s: %s", from_user_id, to_user_id, e
             )
-            return False
+            return None
+        finally:
+            self._writes_in_flight -= 1
+            if not self._writes_in_flight:
+                self._writes_done.set()
+
+    async def send_receipt(
+        self, message_ids: list[str], reader_id: int, sender_id: int
+    ) -> None:
+        """
+        Forward delivery receipts from a recipient to the sender's sessions.
+
+        Args:
+            message_ids: Server IDs of the messages the recipient has received
+            reader_id: ID of the user who received the messages
+            sender_id: ID of the user who sent the messages
+        """
+        if self.is_blocked(reader_id, sender_id):
+            return
+
+        receipt = json.dumps({"type": "receipt", "ids": message_ids, "by": reader_id})
+        await self._send_to_user_sessions(receipt, sender_id, "sender")
 
     def _is_message_blocked(self, from_user_id: int, to_user_id: int) -> bool:
         """Check if message is blocked due to user blocking."""
         if self.is_blocked(from_user_id, to_user_id):
             self._logger.warning(
-                f"Message blocked: {from_user_id} -> {to_user_id} (users are blocked)"
+                "Message blocked: %s -> %s (users are blocked)",
+                from_user_id,
+                to_user_id,
             )
             return True
         return False
 
     async def _save_message_to_redis(
-        self, message: str, to_user_id: int, from_user_id: int
-    ) -> None:
-        """Save message to Redis for chat history with 30-minute expiration."""
+        self, payload: str, to_user_id: int, from_user_id: int
+    ) -> int | None:
+        """
+        Save message to Redis for chat history with 30-minute expiration.
+
+        Returns the message sequence number within the conversation, see
+        ``src.chat.history`` for how it stays valid across clears and expiry.
+        """
         if not self.redis:
-            return
+            return None
 
-        chat_key = self._get_chat_key(to_user_id, from_user_id)
+        return await history.append(
+            self.redis,
+            history.chat_key(to_user_id, from_user_id),
+            payload,
+            self._retention_seconds(),
+        )
 
-        # Get username from user service if available
-        from_username = None
-        if self.user_service:
-            try:
-                user = self.user_service.get_user(from_user_id)
-                if user:
-                    from_username = user.username
-            except Exception as e:
-                self._logger.warning(
-                    f"Could not get username for user {from_user_id}: {e}"
-                )
+    @staticmethod
+    def _retention_seconds() -> int:
+        """Get the lifetime of chat history from config (default 30 minutes)."""
+        return settings.message_retention_minutes * 60
 
-        message_data = {
+    async def get_history_version(self, user1_id: int, user2_id: int) -> str:
+        """
+        Get the version of a conversation for conditional requests.
+
+        The version changes on every new message and when the history is
+        cleared, and expires together with the history.
+
+        Args:
+            user1_id: ID of the first user
+            user2_id: ID of the second user
+
+        Returns:
+            Opaque version string, empty for a conversation without history
+        """
+        if not self.redis:
+            return ""
+        chat_key = history.chat_key(user1_id, user2_id)
+        return await self.redis.get(history.version_key(chat_key)) or ""
+
+    def _create_message_data(
+        self,
+        message: str,
+        to_user_id: int,
+        from_user_id: int,
+        client_id: str | None = None,
+        users: UserLoader | None = None,
+    ) -> dict:
+        """Create message envelope used both for storage and WebSocket delivery."""
+        return {
+            "type": "message",
+            "id": uuid.uuid4().hex,
+            "client_id": client_id,
             "from": from_user_id,
-            "from_username": from_username,
+            "from_username": self._get_username(from_user_id, users),
             "to": to_user_id,
             "message": message,
             "timestamp": int(time.time()),
         }
 
-        # Save message to Redis list
-        await self.redis.rpush(chat_key, json.dumps(message_data))
-
-        # Set expiration based on config (default 30 minutes)
-        expiration_seconds = settings.message_retention_minutes * 60
-        await self.redis.expire(chat_key, expiration_seconds)
-
-    def _get_chat_key(self, user1_id: int, user2_id: int) -> str:
-        """Generate consistent Redis key for chat between two users."""
-        return f"chat:{min(user1_id, user2_id)}:{max(user1_id, user2_id)}"
-
-    def _create_message_data(self, message: str, from_user_id: int) -> str:
-        """Create JSON message data for WebSocket transmission."""
-        # Get username from user service if available
-        from_username = None
-        if self.user_service:
-            try:
-                user = self.user_service.get_user(from_user_id)
-                if user:
-                    from_username = user.username
-            except Exception as e:
-                self._logger.warning(
-                    f"Could not get username for user {from_user_id}: {e}"
-                )
-
-        return json.dumps(
-            {
-                "from": from_user_id,
-                "from_username": from_username,
-                "message": message,
-                "timestamp": int(time.time()),
-            }
-        )
+    def _get_username(
+        self, user_id: int, users: UserLoader | None = None
+    ) -> str | None:
+        """Get username from the batch loader or user service if available."""
+        if not self.user_service and users is None:
+            return None
+        try:
+            user = users.load(user_id) if users else self.user_service.get_user(user_id)
+            return user.username if user else None
+        except Exception as e:
+            self._logger.warning("Could not get username for user %s: %s", user_id, e)
+            return None
 
     async def _broadcast_message(
         self, message_data: str, to_user_id: int, from_user_id: int
     ) -> None:
         """Broadcast message to all connected sessions of both users."""
+        WS_FANOUT_SESSIONS.observe(
+            len(self.active_connections.get(to_user_id, ()))
+            + len(self.active_connections.get(from_user_id, ()))
+        )
         await self._send_to_user_sessions(message_data, to_user_id, "recipient")
         await self._send_to_user_sessions(message_data, from_user_id, "sender")
 
@@ -198,16 +428,16 @@ class ChatWebSocketService:
 
         broken_connections = set()
 
-        for websocket in self.active_connections[user_id].copy():
+        for websocket, outbox in list(self.active_connections[user_id].items()):
             try:
-                await websocket.send_text(message_data)
+                await outbox.send(message_data)
             except Exception as e:
-                self._logger.error(f"Error sending to {user_type} {user_id}: {e}")
+                self._logger.error("Error sending to %s %s: %s", user_type, user_id, e)
                 broken_connections.add(websocket)
 
         # Remove broken connections
         for websocket in broken_connections:
-            self.active_connections[user_id].discard(websocket)
+            self._remove_connection(user_id, websocket)
 
     def is_blocked(self, user1_id: int, user2_id: int) -> bool:
         """
@@ -225,7 +455,7 @@ class ChatWebSocketService:
         return False
 
     async def get_history(
-        self, user1_id: int, user2_id: int, limit: int = None
+        self, user1_id: int, user2_id: int, limit: int = None, before: int = None
     ) -> list[dict]:
         """
         Get message history between two users from Redis.
@@ -234,43 +464,138 @@ class ChatWebSocketService:
             user1_id: ID of the first user
             user2_id: ID of the second user
             limit: Number of recent messages to return (uses config default if None)
+            before: Sequence number cursor, only older messages are returned
+                (the latest page if None)
 
         Returns:
-            List of message dictionaries
+            List of message dictionaries with their ``seq`` numbers
         """
-        if not self.redis:
+        limit = limit or settings.chat_history_limit
+        try:
+            messages, _, _ = await self._read_messages(
+                user1_id, user2_id, limit, before=before
+            )
+            return messages
+        except Exception as e:
+            self._logger.error(
+                "Error getting chat history for %s-%s: %s", user1_id, user2_id, e
+            )
             return []
 
+    async def get_messages_after(
+        self, user1_id: int, user2_id: int, after_seq: int, limit: int = None
+    ) -> dict:
+        """
+        Get messages a client missed since its last seen sequence number.
+
+        Args:
+            user1_id: ID of the first user
+            user2_id: ID of the second user
+            after_seq: Last sequence number the client has, 0 for none
+            limit: Maximum number of messages to replay (uses config default)
+
+        Returns:
+            Dictionary with ``messages`` (oldest first), ``latest_seq``, ``gap``
+            (messages between ``after_seq`` and the first replayed one were
+            skipped because of the limit or have expired) and ``reset`` (the
+            conversation was cleared since ``after_seq``, so the client must
+            drop what it has)
+        """
         limit = limit or settings.chat_history_limit
-        chat_key = self._get_chat_key(user1_id, user2_id)
+        messages, latest_seq, cleared_seq = await self._read_messages(
+            user1_id, user2_id, limit, after_seq
+        )
+        reset = after_seq > latest_seq or 0 < after_seq <= cleared_seq
+        first_seq = messages[0]["seq"] if messages else latest_seq + 1
+        return {
+            "messages": messages,
+            "latest_seq": latest_seq,
+            "gap": not reset and first_seq > after_seq + 1,
+            "reset": reset,
+        }
 
-        try:
-            # Check if key exists (hasn't expired)
-            exists = await self.redis.exists(chat_key)
-            if not exists:
-                self._logger.info(f"Chat history expired for {user1_id}-{user2_id}")
-                return []
-
-            messages = await self.redis.lrange(chat_key, -limit, -1)
-            parsed_messages = []
-
-            for message in messages:
-                try:
-                    parsed_messages.append(json.loads(message))
-                except json.JSONDecodeError as e:
-                    self._logger.warning(f"Failed to parse message: {e}")
-                    continue
-
-                    self._logger.info(
-                        f"Retrieved {len(parsed_messages)} messages for {user1_id}-{user2_id}"
-                    )
-            return parsed_messages
+    async def _read_messages(
+        self,
+        user1_id: int,
+        user2_id: int,
+        limit: int,
+        after_seq: int = 0,
+        before: int = None,
+    ) -> tuple[list[dict], int, int]:
+        """
+        Read the last ``limit`` messages newer than ``after_seq`` and older
+        than ``before``.
+
+        Returns:
+            Parsed messages with ``seq`` set, the latest sequence number and
+            the last sequence number removed by ``clear_chat_history``
+        """
+        if not self.redis:
+            return [], 0, 0
+
+        messages, latest_seq, cleared_seq = await history.read_page(
+            self.redis, history.chat_key(user1_id, user2_id), limit, after_seq, before
+        )
+        if not latest_seq:
+            self._logger.info("Chat history expired for %s-%s", user1_id, user2_id)
+        return messages, latest_seq, cleared_seq
+
+    async def iter_history(
+        self, user1_id: int, user2_id: int, chunk_size: int = 500
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Walk the whole stored conversation between two users in chunks.
+
+        Messages are read in the shape they are stored and delivered in, with
+        ``seq`` set. Only one chunk is held in memory at a time, and messages
+        saved during the walk are not included.
+
+        Args:
+            user1_id: ID of the first user
+            user2_id: ID of the second user
+            chunk_size: Maximum number of messages per chunk
 
+        Yields:
+            Lists of message dictionaries, oldest first
+        """
+        if not self.redis:
+            return
+
+        async for chunk in history.iter_pages(
+            self.redis, history.chat_key(user1_id, user2_id), chunk_size
+        ):
+            yield chunk
+
+    async def replay_missed_messages(
+        self, user_id: int, other_user_id: int, websocket: WebSocket, after_seq: int
+    ) -> None:
+        """
+        Send a session the messages it missed, before any live events.
+
+        Live events for the session are held in its outbox while the replay is
+        read and sent, so the client sees them after the replay and can drop
+        duplicates by ``seq``.
+
+        Args:
+            user_id: ID of the connected user
+            other_user_id: ID of the other user in the conversation
+            websocket: Session that has just connected
+            after_seq: Last sequence number the client has, 0 for none
+        """
+        outbox = self.active_connections.get(user_id, {}).get(websocket)
+        if outbox is None:
+            return
+
+        outbox.pause()
+        try:
+            replay = await self.get_messages_after(user_id, other_user_id, after_seq)
+            await websocket.send_text(json.dumps({"type": "replay", **replay}))
         except Exception as e:
             self._logger.error(
-                f"Error getting chat history for {user1_id}-{user2_id}: {e}"
+                "Error replaying messages for %s-%s: %s", user_id, other_user_id, e
             )
-            return []
+        finally:
+            await outbox.resume()
 
     async def get_message_count(self, user1_id: int, user2_id: int) -> int:
         """
@@ -286,13 +611,13 @@ class ChatWebSocketService:
         if not self.redis:
             return 0
 
-        chat_key = self._get_chat_key(user1_id, user2_id)
+        chat_key = history.chat_key(user1_id, user2_id)
 
         try:
             return await self.redis.llen(chat_key)
         except Exception as e:
             self._logger.error(
-                f"Error getting message count for {user1_id}-{user2_id}: {e}"
+                "Error getting message count for %s-%s: %s", user1_id, user2_id, e
             )
             return 0
 
@@ -310,14 +635,14 @@ class ChatWebSocketService:
         if not self.redis:
             return False
 
-        chat_key = self._get_chat_key(user1_id, user2_id)
+        chat_key = history.chat_key(user1_id, user2_id)
 
         try:
-            await self.redis.delete(chat_key)
-            self._logger.info(f"Chat history cleared for {user1_id}-{user2_id}")
+            await history.clear(self.redis, chat_key, self._retention_seconds())
+            self._logger.info("Chat history cleared for %s-%s", user1_id, user2_id)
             return True
         except Exception as e:
             self._logger.error(
-                f"Error clearing chat history for {user1_id}-{user2_id}: {e}"
+                "Error clearing chat history for %s-%s: %s", user1_id, user2_id, e
             )
             return False
@@ -1,6 +1,18 @@
 """Application configuration settings."""
 
 import os
+import secrets
+import tempfile
+
+
+def _parse_rates(value: str) -> dict[str, float]:
+    """Parse ``name=rate`` pairs separated by commas."""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
 
 
 class Settings:
@@ -25,13 +37,71 @@ class Settings:
         # WebSocket settings
         self.websocket_ping_interval = int(os.getenv("WEBSOCKET_PING_INTERVAL", "20"))
         self.websocket_ping_timeout = int(os.getenv("WEBSOCKET_PING_TIMEOUT", "20"))
+        # Лимиты соединений: при превышении лимита на пользователя закрывается
+        # самая старая сессия, при превышении лимита на узел новые отклоняются
+        self.max_connections_per_user = int(os.getenv("MAX_CONNECTIONS_PER_USER", "5"))
+        self.max_connections_per_node = int(
+            os.getenv("MAX_CONNECTIONS_PER_NODE", "10000")
+        )
 
         # Chat settings
         self.max_message_length = int(os.getenv("MAX_MESSAGE_LENGTH", "1000"))
+        self.ws_max_frame_bytes = int(os.getenv("WS_MAX_FRAME_BYTES", "16384"))
+        self.ws_rate_limit_per_second = float(
+            os.getenv("WS_RATE_LIMIT_PER_SECOND", "5")
+        )
+        self.ws_rate_limit_burst = int(os.getenv("WS_RATE_LIMIT_BURST", "10"))
+        # Пакетная отправка: события одному сокету в пределах окна уходят
+        # одним кадром, 0 отключает объединение
+        self.ws_flush_window_ms = int(os.getenv("WS_FLUSH_WINDOW_MS", "10"))
+        self.ws_max_batch_size = int(os.getenv("WS_MAX_BATCH_SIZE", "50"))
+        # Сжатие permessage-deflate: кадры меньше порога уходят без сжатия,
+        # отключение context takeover экономит память на соединение
+        self.ws_compression_enabled = (
+            os.getenv("WS_COMPRESSION_ENABLED", "true").lower() == "true"
+        )
+        self.ws_compression_min_size = int(os.getenv("WS_COMPRESSION_MIN_SIZE", "256"))
+        self.ws_compression_context_takeover = (
+            os.getenv("WS_COMPRESSION_CONTEXT_TAKEOVER", "true").lower() == "true"
+        )
+        self.ws_compression_window_bits = int(
+            os.getenv("WS_COMPRESSION_WINDOW_BITS", "12")
+        )
+        self.ws_compression_mem_level = int(os.getenv("WS_COMPRESSION_MEM_LEVEL", "5"))
+        # Остановка узла: сессии получают кадр reconnect со случайной задержкой
+        # до WS_RECONNECT_JITTER_MS и закрываются не позже чем за таймаут
+        self.ws_drain_timeout_seconds = float(
+            os.getenv("WS_DRAIN_TIMEOUT_SECONDS", "10")
+        )
+        self.ws_reconnect_jitter_ms = int(os.getenv("WS_RECONNECT_JITTER_MS", "5000"))
+        # "local" — лимит на каждом узле отдельно, "redis" — общий для всех узлов
+        self.ws_rate_limit_backend = os.getenv("WS_RATE_LIMIT_BACKEND", "local")
         self.chat_history_limit = int(os.getenv("CHAT_HISTORY_LIMIT", "50"))
         self.message_retention_minutes = int(
             os.getenv("MESSAGE_RETENTION_MINUTES", "30")
         )
+        # Экспорт переписки читается из хранилища порциями такого размера
+        self.chat_export_chunk_size = int(os.getenv("CHAT_EXPORT_CHUNK_SIZE", "500"))
+
+        # Кэш шаблонов: байткод Jinja на диске и готовые HTML-фрагменты в памяти
+        self.jinja_bytecode_cache_dir = os.getenv(
+            "JINJA_BYTECODE_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "felchat-jinja-cache"),
+        )
+        self.fragment_cache_size = int(os.getenv("FRAGMENT_CACHE_SIZE", "1024"))
+
+        # Кэш пользователей по ID: размер, время жизни и время жизни промахов
+        self.user_cache_size = int(os.getenv("USER_CACHE_SIZE", "10000"))
+        self.user_cache_ttl_seconds = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+        self.user_cache_negative_ttl_seconds = float(
+            os.getenv("USER_CACHE_NEGATIVE_TTL_SECONDS", "5")
+        )
+
+        # Диагностика SQL: медленные запросы и повторы одного запроса (N+1)
+        self.db_slow_query_ms = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+        self.db_repeated_query_threshold = int(
+            os.getenv("DB_REPEATED_QUERY_THRESHOLD", "10")
+        )
 
         # Security settings
         self.session_cookie_name = os.getenv("SESSION_COOKIE_NAME", "user_id")
@@ -42,12 +112,33 @@ class Settings:
         self.session_cookie_secure = (
             os.getenv("SESSION_COOKIE_SECURE", "true").lower() == "true"
         )
+        # Ключ подписи сессионных токенов. Без него ключ случайный: сессии не
+        # переживают перезапуск и не принимаются другими процессами
+        self.session_secret_key = os.getenv(
+            "SESSION_SECRET_KEY"
+        ) or secrets.token_urlsafe(32)
+        self.session_max_age_seconds = int(
+            os.getenv("SESSION_MAX_AGE_SECONDS", str(7 * 24 * 3600))
+        )
 
         # Logging settings
         self.log_level = os.getenv("LOG_LEVEL", "INFO")
         self.log_format = os.getenv(
             "LOG_FORMAT", "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
+        # JSON-строка на запись вместо текстового LOG_FORMAT
+        self.log_json = os.getenv("LOG_JSON", "false").lower() == "true"
+        # Записи пишутся в stdout фоновым потоком, при переполнении очереди
+        # новые записи отбрасываются, а не блокируют обработчик запроса
+        self.log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        # Доля сохраняемых DEBUG/INFO записей по логгерам:
+        # "felchat.websocket=0.1,felchat.chat=0.5"
+        self.log_sample_rates = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+        # Не больше стольких DEBUG/INFO записей в секунду на один шаблон
+        # сообщения, 0 — без ограничения
+        self.log_rate_limit_per_second = float(
+            os.getenv("LOG_RATE_LIMIT_PER_SECOND", "50")
+        )
 
         # Server settings
         self.host = os.getenv("HOST", "0.0.0.0")
@@ -55,6 +146,13 @@ class Settings:
         # В продакшене отключаем reload
         self.reload = os.getenv("RELOAD", "false").lower() == "true"
 
+        # Запуск: ожидание PostgreSQL/Redis с экспоненциальной паузой, прогрев
+        # пулов соединений и кэш результата глубокой проверки /ready
+        self.startup_timeout_seconds = float(os.getenv("STARTUP_TIMEOUT_SECONDS", "30"))
+        self.db_pool_warmup = int(os.getenv("DB_POOL_WARMUP", "5"))
+        self.redis_pool_warmup = int(os.getenv("REDIS_POOL_WARMUP", "5"))
+        self.readiness_cache_seconds = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+
 
 # Global settings instance
 settings = Settings()
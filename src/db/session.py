@@ -1,7 +1,18 @@
 import os
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import settings
+from src.logger import db_logger
 
 # Подключение к PostgreSQL через переменную окружения
 DATABASE_URL = os.getenv(
@@ -14,7 +25,222 @@ engine = create_engine(
     max_overflow=30,
     pool_timeout=60,
     pool_recycle=3600,
-    pool_pre_ping=True
+    pool_pre_ping=True,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def ping_database() -> None:
+    """
+    Run a trivial query to check that the database accepts connections.
+
+    Raises:
+        sqlalchemy.exc.OperationalError: If the database is unreachable
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+
+
+def warm_up_pool(connections: int) -> None:
+    """
+    Open pool connections in advance so first requests do not pay for them.
+
+    Args:
+        connections: Number of connections to open, capped by the pool size
+    """
+    opened = []
+    try:
+        for _ in range(min(connections, engine.pool.size())):
+            opened.append(engine.connect())
+    finally:
+        # Returned connections stay open in the pool
+        for conn in opened:
+            conn.close()
+
+
+class QueryStats:
+    """Queries issued while handling one request or WebSocket message."""
+
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+
+    def repeated(self, threshold: int = None) -> list[tuple[str, int]]:
+        """
+        Get statements executed suspiciously often, a typical N+1 pattern.
+
+        Args:
+            threshold: Minimum number of executions (uses config default)
+
+        Returns:
+            Pairs of statement and execution count, most frequent first
+        """
+        threshold = threshold or settings.db_repeated_query_threshold
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by ``query_budget`` when more queries than allowed were issued."""
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar(
+    "db_query_stats", default=None
+)
+
+# Вызываются после каждого HTTP-запроса со статистикой его SQL-запросов
+_request_observers: list[Callable[[str, QueryStats], None]] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Remember when a statement started."""
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Account a finished statement and log it if it was slow."""
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        stats.statements[statement] += 1
+
+    if duration * 1000 >= settings.db_slow_query_ms:
+        db_logger.warning(
+            "Slow query (%.1f ms): %s parameters=%r",
+            duration * 1000,
+            statement,
+            parameters,
+        )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collect statistics of the queries issued inside the block.
+
+    Statistics follow the context, so queries made from threadpool workers
+    started inside the block are counted too.
+
+    Yields:
+        Statistics filled in as queries run
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def log_query_stats(label: str, stats: QueryStats) -> None:
+    """
+    Log repeated statements of a request or message.
+
+    Args:
+        label: What issued the queries, e.g. the route path
+        stats: Statistics collected for it
+    """
+    for statement, count in stats.repeated():
+        db_logger.warning(
+            "Possible N+1 in %s: statement executed %d times: %s",
+            label,
+            count,
+            statement,
+        )
+    db_logger.debug(
+        "%s: %d queries in %.1f ms", label, stats.count, stats.duration * 1000
+    )
+
+
+@contextmanager
+def query_budget(max_queries: int) -> Iterator[QueryStats]:
+    """
+    Fail when code or any HTTP request inside the block exceeds a query budget.
+
+    Meant for tests: wrap a test client call to declare how many queries the
+    route may issue.
+
+    Args:
+        max_queries: Maximum number of queries per request and for the block
+
+    Yields:
+        Statistics of the queries issued directly inside the block
+
+    Raises:
+        QueryBudgetExceeded: If the budget was exceeded
+    """
+    violations = []
+
+    def check(label: str, stats: QueryStats) -> None:
+        if stats.count > max_queries:
+            statements = "\n".join(
+                f"  {count}x {statement}"
+                for statement, count in stats.statements.most_common()
+            )
+            violations.append(
+                f"{label}: {stats.count} queries, budget {max_queries}\n{statements}"
+            )
+
+    _request_observers.append(check)
+    try:
+        with track_queries() as stats:
+            yield stats
+        check("block", stats)
+    finally:
+        _request_observers.remove(check)
+    if violations:
+        raise QueryBudgetExceeded("\n".join(violations))
+
+
+class QueryTimingMiddleware:
+    """
+    ASGI middleware counting SQL queries per HTTP request.
+
+    Adds a ``Server-Timing`` header with the number of queries and total
+    database time, and logs repeated statements.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    duration_ms = stats.duration * 1000
+                    headers.append(
+                        "Server-Timing",
+                        f'db;dur={duration_ms:.1f};desc="{stats.count} queries"',
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        label = f"{scope['method']} {scope['path']}"
+        log_query_stats(label, stats)
+        for observer in list(_request_observers):
+            observer(label, stats)
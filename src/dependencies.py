@@ -5,7 +5,9 @@ from typing import Generator
 from fastapi import Depends
 from sqlalchemy.orm import Session
 
+from src.chat.ingress import IngressGuard
 from src.chat.ws_service import ChatWebSocketService
+from src.users.loader import UserLoader
 from src.users.services import UserService
 from src.db.session import SessionLocal
 
@@ -36,6 +38,18 @@ def get_user_service(container=Depends(get_container)) -> UserService:
     return container.user_service()
 
 
+def get_user_loader(
+    user_service: UserService = Depends(get_user_service),
+) -> UserLoader:
+    """Get a UserLoader shared by all dependencies of the current request."""
+    return user_service.create_loader()
+
+
 def get_chat_service(container=Depends(get_container)) -> ChatWebSocketService:
     """Get ChatWebSocketService instance from DI container."""
     return container.chat_service()
+
+
+def get_ingress_guard(container=Depends(get_container)) -> IngressGuard:
+    """Get IngressGuard instance from DI container."""
+    return container.ingress_guard()
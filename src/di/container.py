@@ -1,11 +1,15 @@
 """Dependency injection container for the application."""
 
+import redis.asyncio as redis
 from dependency_injector import containers, providers
 
 from src.chat.repositories.db.chat import ChatRepositoryDB
+from src.chat.ingress import IngressGuard
+from src.chat.inmem_redis import InMemoryRedis
 from src.chat.repositories.inmem.chat import ChatRepositoryInMemory
 from src.chat.ws_service import ChatWebSocketService
 from src.config import settings
+from src.users.repositories.cached.user import UserCache, UserRepositoryCached
 from src.users.repositories.user_repo_db import UserRepositoryDB
 from src.users.repositories.inmem.user import UserRepositoryInMemory
 from src.users.services import UserService
@@ -20,10 +24,25 @@ class Container(containers.DeclarativeContainer):
     # Database session provider
     db_session = providers.Factory(SessionLocal)
 
+    redis_client = providers.Selector(
+        config.env,
+        prod=providers.Singleton(
+            redis.from_url, settings.redis_url, decode_responses=True
+        ),
+        test=providers.Singleton(InMemoryRedis),
+    )
+
+    # Users by ID cached per process, invalidated across processes via Redis
+    user_cache = providers.Singleton(UserCache, redis_client=redis_client)
+
     # User repository - select based on environment
     user_repository = providers.Selector(
         config.env,
-        prod=providers.Factory(UserRepositoryDB, db_session=db_session),
+        prod=providers.Factory(
+            UserRepositoryCached,
+            repo=providers.Factory(UserRepositoryDB, db_session=db_session),
+            cache=user_cache,
+        ),
         test=providers.Singleton(UserRepositoryInMemory),
     )
 
@@ -37,5 +56,15 @@ class Container(containers.DeclarativeContainer):
     )
 
     chat_service = providers.Singleton(
-        ChatWebSocketService, redis_url=settings.redis_url, user_service=user_service
+        ChatWebSocketService,
+        redis_url=settings.redis_url,
+        user_service=user_service,
+        redis_client=redis_client,
+    )
+
+    ingress_guard = providers.Singleton(
+        IngressGuard,
+        redis_url=(
+            settings.redis_url if settings.ws_rate_limit_backend == "redis" else None
+        ),
     )
@@ -0,0 +1,73 @@
+"""Helpers for conditional GET requests (ETag / If-None-Match)."""
+
+import hashlib
+
+from fastapi import Request, Response
+
+# Клиент может хранить ответ, но обязан перепроверять его через ETag
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from version parts.
+
+    Args:
+        *parts: Values that change whenever the response changes, such as a
+            version counter and the query parameters of the request
+
+    Returns:
+        Quoted ETag value
+    """
+    key = ":".join(str(part) for part in parts)
+    return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Check whether the client already has the current representation.
+
+    Args:
+        request: Incoming request with an optional If-None-Match header
+        etag: Current ETag of the resource
+
+    Returns:
+        True if a 304 response can be sent instead of the body
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def set_validators(response: Response, etag: str) -> None:
+    """
+    Attach the ETag and revalidation headers to a response.
+
+    Args:
+        response: Response to update
+        etag: Current ETag of the resource
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    # Ответ зависит от пользователя из cookie
+    response.headers["Vary"] = "Cookie"
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Build an empty 304 Not Modified response.
+
+    Args:
+        etag: Current ETag of the resource
+
+    Returns:
+        Response with the validators the client should keep
+    """
+    response = Response(status_code=304)
+    set_validators(response, etag)
+    return response
@@ -1,9 +1,154 @@
-"""Logging configuration for the application."""
+"""
+Logging configuration for the application.
 
+Records are handed to a bounded queue and written to stdout by a background
+thread, so a slow terminal or log collector never blocks a request or the
+event loop. DEBUG and INFO records can be sampled per logger and rate limited
+per message template; warnings and errors are always kept. Use lazy
+``%``-style arguments (``logger.info("User %s connected", user_id)``) so
+messages are only formatted for records that are actually written.
+"""
+
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
 import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 from src.config import settings
+from src.metrics import LOG_RECORDS_DROPPED
+
+# Атрибуты LogRecord, всё остальное пришло через extra= и выводится в JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# Шаблонов сообщений ограниченное число, если ключей больше — это f-строки
+_MAX_RATE_KEYS = 1024
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drop part of the DEBUG and INFO records of a logger.
+
+    A record is first kept with probability ``sample_rate``, then each
+    message template (``record.msg`` before formatting) is limited by a token
+    bucket refilled at ``per_second``. WARNING and above always pass.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, per_second: float = 0.0):
+        """
+        Initialize the filter.
+
+        Args:
+            sample_rate: Fraction of records kept, 1.0 keeps all
+            per_second: Records per second allowed per template, 0 disables
+        """
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.per_second = per_second
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            LOG_RECORDS_DROPPED.labels(record.name, "sampled").inc()
+            return False
+        if self.per_second > 0 and not self._take_token(str(record.msg)):
+            LOG_RECORDS_DROPPED.labels(record.name, "rate_limited").inc()
+            return False
+        return True
+
+    def _take_token(self, key: str) -> bool:
+        """Take a token from the bucket of a message template."""
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._buckets and len(self._buckets) >= _MAX_RATE_KEYS:
+                self._buckets.clear()
+            tokens, updated = self._buckets.get(key, (self.per_second, now))
+            tokens = min(self.per_second, tokens + (now - updated) * self.per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops records instead of waiting on a full queue.
+
+    Unlike ``QueueHandler`` it only merges the message arguments in the
+    calling thread and leaves formatting (JSON, tracebacks) to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Аргументы могут измениться после возврата из вызова логгера
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.name, "queue_full").inc()
+
+
+def _create_output_handler() -> logging.Handler:
+    """Create the stdout handler used by the background listener."""
+    handler = logging.StreamHandler(sys.stdout)
+    if settings.log_json:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(settings.log_format))
+    return handler
+
+
+_queue: queue.Queue = queue.Queue(settings.log_queue_size)
+_queue_handler = NonBlockingQueueHandler(_queue)
+_listener = QueueListener(_queue, _create_output_handler())
+_listener.start()
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
 
 
 def setup_logger(name: str, level: str | None = None) -> logging.Logger:
@@ -23,22 +168,34 @@ def setup_logger(name: str, level: str | None = None) -> logging.Logger:
     log_level = level or settings.log_level
     logger.setLevel(getattr(logging, log_level.upper()))
 
-    # Avoid adding handlers multiple times
-    if logger.handlers:
+    # Avoid configuring the logger multiple times
+    if any(isinstance(f, SamplingFilter) for f in logger.filters):
         return logger
 
-    # Create console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(getattr(logging, log_level.upper()))
+    # Sampling runs before any handler, dropped records are never formatted
+    logger.addFilter(
+        SamplingFilter(
+            settings.log_sample_rates.get(name, 1.0),
+            settings.log_rate_limit_per_second,
+        )
+    )
+    # Child loggers reach the handler of their parent through propagation
+    if not _reaches_queue_handler(logger):
+        logger.addHandler(_queue_handler)
 
-    # Create formatter
-    formatter = logging.Formatter(settings.log_format)
-    console_handler.setFormatter(formatter)
+    return logger
 
-    # Add handler to logger
-    logger.addHandler(console_handler)
 
-    return logger
+def _reaches_queue_handler(logger: logging.Logger) -> bool:
+    """Check whether records of a logger already end up in the log queue."""
+    current = logger
+    while current is not None:
+        if _queue_handler in current.handlers:
+            return True
+        if not current.propagate:
+            return False
+        current = current.parent
+    return False
 
 
 # Create default loggers
@@ -46,3 +203,4 @@ app_logger = setup_logger("felchat")
 websocket_logger = setup_logger("felchat.websocket")
 chat_logger = setup_logger("felchat.chat")
 user_logger = setup_logger("felchat.users")
+db_logger = setup_logger("felchat.db")
@@ -1,17 +1,23 @@
 """Main entry point for the FastAPI application."""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from pathlib import Path
 
+from src.assets import PrecompressedStaticFiles
 from src.config import settings
+from src.db.session import QueryTimingMiddleware
 from src.di.container import Container
 from src.logger import app_logger
+from src.metrics import CONTENT_TYPE, HTTPMetricsMiddleware, render_metrics
+from src.middleware import NO_STORE_HEADERS, HeaderPolicyMiddleware, TimingMiddleware
+from src.readiness import shut_down, start_up
 from src.users.api import api_router as users_api_router
+from src.users.auth import read_session_token
 from src.web.chat import router as chat_router
 from src.web.users import router as web_users_router
 
@@ -19,17 +25,31 @@ container = Container()
 container.config.env.from_env("ENV", default=settings.env)
 
 
-class NoCacheMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        return response
+# Заголовки по шаблону пути, первое совпадение выигрывает. Ответы с ETag сами
+# задают Cache-Control и проверяются через 304, их заголовки не перезаписываются
+HEADER_POLICIES = [
+    # Файлы с хэшем в имени получают immutable от PrecompressedStaticFiles,
+    # остальные браузер перепроверяет по ETag, чтобы не держать старые версии
+    ("/static/*", {"Cache-Control": "no-cache"}),
+    ("/ping", {}),
+    ("/metrics", {}),
+    ("*", NO_STORE_HEADERS),
+]
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Wait for dependencies before serving, drain sessions on shutdown."""
+    app.state.readiness = await start_up(container)
+    yield
+    await shut_down(container)
 
-app = FastAPI(title="Felchat", version="1.0.0")
-app.add_middleware(NoCacheMiddleware)
+
+app = FastAPI(title="Felchat", version="1.0.0", lifespan=lifespan)
+app.add_middleware(HeaderPolicyMiddleware, policies=HEADER_POLICIES)
+app.add_middleware(QueryTimingMiddleware)
+app.add_middleware(TimingMiddleware)
+app.add_middleware(HTTPMetricsMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -45,27 +65,46 @@ __all__ = ["container", "app"]
 
 # Mount static files
 static_dir = Path(__file__).parent / "static"
-app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
 
 
 @app.get("/")
 def root(request: Request):
     """Redirect to appropriate page based on authentication status."""
-    user_id = request.cookies.get(settings.session_cookie_name)
-    if user_id:
-        app_logger.info(f"Authenticated user {user_id} accessing root")
+    user = read_session_token(request.cookies.get(settings.session_cookie_name))
+    if user:
+        app_logger.info("Authenticated user %s accessing root", user.id)
         return RedirectResponse("/users/")
 
     app_logger.info("Unauthenticated user accessing root, redirecting to login")
     return RedirectResponse("/users/login")
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Metrics endpoint in the Prometheus text exposition format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 @app.get("/ping")
 def ping():
     """Health check endpoint."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready(request: Request):
+    """Readiness endpoint checking PostgreSQL and Redis, 503 if any is down."""
+    if container.chat_service().draining:
+        return JSONResponse({"status": "draining", "checks": {}}, status_code=503)
+    checks = await request.app.state.readiness.check()
+    is_ready = all(checks.values())
+    return JSONResponse(
+        {"status": "ready" if is_ready else "unavailable", "checks": checks},
+        status_code=200 if is_ready else 503,
+    )
+
+
 app.include_router(users_api_router)
 app.include_router(web_users_router)
 app.include_router(chat_router)
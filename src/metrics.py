@@ -0,0 +1,460 @@
+"""In-process metrics rendered in the Prometheus text exposition format."""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable
+from functools import wraps
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы в секундах: от долей миллисекунды (Redis) до секунд (медленные запросы)
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+FANOUT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra="") -> str:
+    """Render a label set, escaping values as the exposition format requires."""
+    pairs = [
+        f'{name}="{value}"'
+        for name, value in zip(names, (_escape(v) for v in values), strict=True)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, integers without a trailing ``.0``."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(ABC):
+    """Base class keeping one child per label value combination."""
+
+    type_name = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        registry: list | None = None,
+    ):
+        """
+        Initialize and register the metric.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels children are keyed by
+            registry: List to register in (the global ``REGISTRY`` if None)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def labels(self, *values):
+        """
+        Get the child for a label value combination.
+
+        Args:
+            *values: Label values in the order of ``labelnames``
+
+        Returns:
+            Child metric to observe values on
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        """Get the child of a metric without labels."""
+        return self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        """
+        Create the child for a new label value combination.
+
+        Returns:
+            Object holding the observed value(s) of one child
+        """
+        pass
+
+    def render(self) -> list[str]:
+        """
+        Render the metric.
+
+        Returns:
+            Lines of the text exposition format
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: tuple[str, ...], child) -> list[str]:
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(child.value)}"]
+
+
+class _Value:
+    """Single number guarded by a lock, shared by counters and gauges."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """Add to the value."""
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        """Replace the value."""
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        """Increment the counter of a metric without labels."""
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float) -> None:
+        """Set the value of a metric without labels."""
+        self._default().set(value)
+
+
+class _HistogramChild:
+    """Bucket counts for one label value combination."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        # The last slot counts observations above the highest bound (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values.
+
+    Observations only bump one bucket; cumulative counts are computed when
+    the metric is rendered, so observing stays cheap on hot paths.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        registry: list | None = None,
+    ):
+        """
+        Initialize and register the histogram.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            labelnames: Names of the labels children are keyed by
+            buckets: Sorted upper bounds of the buckets
+            registry: List to register in (the global ``REGISTRY`` if None)
+        """
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        """Record an observation on a histogram without labels."""
+        self._default().observe(value)
+
+    def _render_child(self, values: tuple[str, ...], child) -> list[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, counts, strict=True):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+# Collectors refresh gauges from live objects right before rendering
+_collectors: list[Callable[[], None]] = []
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """
+    Register a callback that updates metrics before each scrape.
+
+    Args:
+        collector: Function called by ``render_metrics``
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    Render all registered metrics.
+
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    for collector in _collectors:
+        collector()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram):
+    """
+    Decorate a function to observe its duration, labeled by function name.
+
+    Args:
+        histogram: Histogram with a single ``operation`` label
+
+    Returns:
+        Decorator for sync functions
+    """
+
+    def decorator(func):
+        child = histogram.labels(func.__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+class TimedRedis:
+    """
+    Proxy for an async Redis client that times every awaited command.
+
+    Attribute access is forwarded to the wrapped client; coroutine methods
+    are wrapped so their latency is observed per command name.
+    """
+
+    def __init__(self, client, histogram: Histogram):
+        """
+        Initialize the proxy.
+
+        Args:
+            client: Async Redis client to wrap
+            histogram: Histogram with a single ``command`` label
+        """
+        self._client = client
+        self._histogram = histogram
+        self._methods: dict[str, Callable] = {}
+
+    def __getattr__(self, name: str):
+        method = self._methods.get(name)
+        if method is not None:
+            return method
+
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+
+        method = self._methods[name] = self._timed(name, attribute)
+        return method
+
+    def pipeline(self, transaction: bool = True):
+        """
+        Create a pipeline of the wrapped client.
+
+        Commands are only queued by the pipeline, so the whole ``execute``
+        round trip is observed as a single ``pipeline`` command.
+
+        Args:
+            transaction: Run the queued commands as one MULTI/EXEC transaction
+
+        Returns:
+            Pipeline with a timed ``execute``
+        """
+        pipe = self._client.pipeline(transaction=transaction)
+        pipe.execute = self._timed("pipeline", pipe.execute)
+        return pipe
+
+    def _timed(self, name: str, command: Callable) -> Callable:
+        """Wrap a coroutine method so its latency is observed as ``name``."""
+        child = self._histogram.labels(name)
+
+        @wraps(command)
+        async def timed_command(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await command(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        return timed_command
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware observing HTTP latency per route template."""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], path, status_code).observe(
+                time.perf_counter() - start
+            )
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+WS_MESSAGE_SECONDS = Histogram(
+    "chat_ws_message_duration_seconds",
+    "Time from receiving a chat frame to handing it to all recipient sessions.",
+)
+WS_FANOUT_SESSIONS = Histogram(
+    "chat_ws_fanout_sessions",
+    "Number of WebSocket sessions a chat message is delivered to.",
+    buckets=FANOUT_BUCKETS,
+)
+WS_ACTIVE_CONNECTIONS = Gauge(
+    "chat_ws_active_connections", "WebSocket connections open on this node."
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "chat_redis_command_duration_seconds",
+    "Redis command latency in the chat service.",
+    ("command",),
+)
+DB_QUERY_SECONDS = Histogram(
+    "user_repository_query_duration_seconds",
+    "Database latency of user repository operations.",
+    ("operation",),
+)
+TEMPLATE_BYTECODE_CACHE = Counter(
+    "template_bytecode_cache_requests_total",
+    "Jinja bytecode cache lookups when a template is compiled.",
+    ("result",),
+)
+TEMPLATE_FRAGMENT_CACHE = Counter(
+    "template_fragment_cache_requests_total",
+    "Rendered HTML fragment cache lookups.",
+    ("fragment", "result"),
+)
+USER_CACHE = Counter(
+    "user_cache_requests_total",
+    "User-by-id cache lookups.",
+    ("result",),
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped by sampling, rate limiting or a full log queue.",
+    ("logger", "reason"),
+)
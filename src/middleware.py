@@ -0,0 +1,114 @@
+"""Lightweight ASGI middleware for response headers and timing."""
+
+import re
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Запрет кэширования для динамических страниц и API
+NO_STORE_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate",
+    "Pragma": "no-cache",
+    "Expires": "0",
+}
+
+
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """Compile a route pattern where ``*`` matches any rest of the path."""
+    return re.compile("".join(".*" if p == "*" else re.escape(p) for p in pattern))
+
+
+class HeaderPolicyMiddleware:
+    """
+    Add default response headers chosen by request path.
+
+    Policies are ``(pattern, headers)`` pairs checked in order, the first
+    matching pattern wins. Headers the endpoint has already set are kept, so
+    routes with their own caching (ETag responses) are left alone. Paths with
+    an empty policy are passed through without wrapping ``send``.
+    """
+
+    def __init__(self, app: ASGIApp, policies: list[tuple[str, dict[str, str]]]):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+            policies: Route patterns such as ``/static/*`` with their headers
+        """
+        self.app = app
+        self.policies = [
+            (
+                _compile_pattern(pattern),
+                [
+                    (name.lower().encode(), value.encode())
+                    for name, value in headers.items()
+                ],
+            )
+            for pattern, headers in policies
+        ]
+        self._cache: dict[str, list[tuple[bytes, bytes]]] = {}
+
+    def _headers_for(self, path: str) -> list[tuple[bytes, bytes]]:
+        """Find the headers of the first matching policy."""
+        headers = self._cache.get(path)
+        if headers is not None:
+            return headers
+        headers = next(
+            (headers for regex, headers in self.policies if regex.fullmatch(path)), []
+        )
+        # Only a bounded set of paths is remembered, paths with ids vary a lot
+        if len(self._cache) < 1024:
+            self._cache[path] = headers
+        return headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = self._headers_for(scope["path"])
+        if not headers:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                raw = list(message.get("headers", []))
+                present = {name.lower() for name, _ in raw}
+                raw.extend(item for item in headers if item[0] not in present)
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class TimingMiddleware:
+    """Report the time until response headers in a ``Server-Timing`` header."""
+
+    def __init__(self, app: ASGIApp):
+        """
+        Initialize the middleware.
+
+        Args:
+            app: Wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                duration = (time.perf_counter() - start) * 1000
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f"app;dur={duration:.1f}"
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,214 @@
+"""
+Startup, readiness and shutdown of external dependencies (PostgreSQL, Redis).
+
+On startup the application waits for its dependencies with exponential
+backoff and opens pool connections in advance, so the container is ready as
+soon as they are and the first requests do not pay for connecting. ``/ready``
+reports the same checks, cached for a short time so frequent probes do not
+load the database. ``/ping`` stays a liveness check that touches nothing.
+On shutdown chat sessions are drained and connection pools are closed.
+
+Run ``python -m src.readiness`` to only wait for the dependencies, e.g.
+before applying migrations.
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.db.session import engine, ping_database, warm_up_pool
+from src.logger import app_logger
+
+Check = Callable[[], Awaitable[object]]
+
+# Одна проверка не должна задерживать /ready дольше этого времени
+CHECK_TIMEOUT_SECONDS = 2.0
+
+
+async def wait_for(
+    name: str,
+    check: Check,
+    timeout: float = None,
+    initial_delay: float = 0.05,
+    max_delay: float = 2.0,
+) -> None:
+    """
+    Retry a check with exponential backoff until it succeeds.
+
+    Args:
+        name: Dependency name for logs
+        check: Coroutine function raising while the dependency is unavailable
+        timeout: Total time to wait in seconds (uses config default)
+        initial_delay: Delay after the first failure in seconds
+        max_delay: Upper bound of the delay between attempts in seconds
+
+    Raises:
+        Exception: The last error of the check once the timeout is exceeded
+    """
+    timeout = settings.startup_timeout_seconds if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempt = 1
+    while True:
+        try:
+            await asyncio.wait_for(check(), CHECK_TIMEOUT_SECONDS)
+            app_logger.info("%s is available after %d attempt(s)", name, attempt)
+            return
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                app_logger.error("%s is unavailable, giving up: %s", name, e)
+                raise
+            app_logger.info("Waiting for %s (attempt %d): %s", name, attempt, e)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+            attempt += 1
+
+
+async def warm_up_redis(client, connections: int) -> None:
+    """
+    Open Redis pool connections by issuing concurrent pings.
+
+    Args:
+        client: Redis client with a connection pool
+        connections: Number of concurrent pings
+    """
+    await asyncio.gather(*(client.ping() for _ in range(connections)))
+
+
+class ReadinessProbe:
+    """Run dependency checks for ``/ready`` and cache the result briefly."""
+
+    def __init__(self, checks: dict[str, Check], cache_seconds: float = None):
+        """
+        Initialize the probe.
+
+        Args:
+            checks: Dependency names with their checks
+            cache_seconds: How long a result is reused (uses config default)
+        """
+        self.checks = checks
+        self.cache_seconds = (
+            settings.readiness_cache_seconds if cache_seconds is None else cache_seconds
+        )
+        self._result: dict[str, bool] | None = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> dict[str, bool]:
+        """
+        Get the status of every dependency.
+
+        Concurrent callers share one round of checks.
+
+        Returns:
+            Dependency names mapped to whether they are available
+        """
+        async with self._lock:
+            if (
+                self._result is None
+                or time.monotonic() - self._checked_at >= self.cache_seconds
+            ):
+                results = await asyncio.gather(
+                    *(
+                        asyncio.wait_for(check(), CHECK_TIMEOUT_SECONDS)
+                        for check in self.checks.values()
+                    ),
+                    return_exceptions=True,
+                )
+                self._result = {
+                    name: not isinstance(result, BaseException)
+                    for name, result in zip(self.checks, results)
+                }
+                self._checked_at = time.monotonic()
+            return self._result
+
+
+def build_checks(container) -> dict[str, Check]:
+    """
+    Build dependency checks for the configured environment.
+
+    Args:
+        container: DI container of the application
+
+    Returns:
+        Dependency names with their checks
+    """
+    redis_client = container.redis_client()
+    checks: dict[str, Check] = {"redis": redis_client.ping}
+    # В тестовом окружении пользователи хранятся в памяти, БД не нужна
+    if container.config.env() != "test":
+        checks["database"] = lambda: asyncio.to_thread(ping_database)
+    return checks
+
+
+async def start_up(container) -> ReadinessProbe:
+    """
+    Wait for dependencies, warm up connection pools and create the probe.
+
+    Args:
+        container: DI container of the application
+
+    Returns:
+        Readiness probe over the same checks
+
+    Raises:
+        Exception: If a dependency stays unavailable past the startup timeout
+    """
+    start = time.perf_counter()
+    checks = build_checks(container)
+    await asyncio.gather(*(wait_for(name, check) for name, check in checks.items()))
+
+    warm_ups = [warm_up_redis(container.redis_client(), settings.redis_pool_warmup)]
+    if "database" in checks:
+        warm_ups.append(asyncio.to_thread(warm_up_pool, settings.db_pool_warmup))
+    await asyncio.gather(*warm_ups)
+    # Create the chat service now instead of on the first WebSocket connect
+    container.chat_service()
+    await container.user_cache().start()
+
+    app_logger.info("Started in %.0f ms", (time.perf_counter() - start) * 1000)
+    return ReadinessProbe(checks)
+
+
+async def shut_down(container) -> None:
+    """
+    Drain chat sessions and close connection pools.
+
+    Args:
+        container: DI container of the application
+    """
+    await container.chat_service().drain()
+    await container.user_cache().close()
+
+    results = await asyncio.gather(
+        container.redis_client().aclose(),
+        container.chat_repository().close(),
+        container.ingress_guard().close(),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            app_logger.warning("Error closing connections: %s", result)
+    if container.config.env() != "test":
+        await asyncio.to_thread(engine.dispose)
+    app_logger.info("Shut down")
+
+
+async def _wait_for_dependencies() -> None:
+    """Wait for PostgreSQL and Redis without starting the application."""
+    client = redis.from_url(settings.redis_url)
+    try:
+        await asyncio.gather(
+            wait_for("database", lambda: asyncio.to_thread(ping_database)),
+            wait_for("redis", client.ping),
+        )
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_wait_for_dependencies())
@@ -0,0 +1,59 @@
+"""Server entrypoint running the application under uvicorn with tuned WebSockets."""
+
+import logging
+
+import uvicorn
+from uvicorn.protocols.websockets.websockets_sansio_impl import (
+    WebSocketsSansIOProtocol,
+)
+from websockets.server import ServerProtocol
+
+from src.chat.compression import build_compression_extensions
+from src.config import settings
+
+
+class ChatWebSocketProtocol(WebSocketsSansIOProtocol):
+    """Uvicorn WebSocket protocol negotiating compression from settings."""
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the protocol and replace the default deflate extension."""
+        super().__init__(*args, **kwargs)
+        self.conn = ServerProtocol(
+            extensions=build_compression_extensions(),
+            max_size=self.config.ws_max_size,
+            logger=logging.getLogger("uvicorn.error"),
+        )
+
+
+class ChatServer(uvicorn.Server):
+    """Uvicorn server that drains chat sessions before closing connections."""
+
+    async def shutdown(self, sockets=None) -> None:
+        # Uvicorn closes WebSockets before the lifespan shutdown runs, so the
+        # reconnect hints have to be sent here
+        from src.main import container
+
+        await container.chat_service().drain()
+        await super().shutdown(sockets)
+
+
+def main() -> None:
+    """Run the application server."""
+    options = dict(
+        host=settings.host,
+        port=settings.port,
+        ws=ChatWebSocketProtocol,
+        ws_max_size=settings.ws_max_frame_bytes,
+        ws_ping_interval=settings.websocket_ping_interval,
+        ws_ping_timeout=settings.websocket_ping_timeout,
+        timeout_graceful_shutdown=int(settings.ws_drain_timeout_seconds) + 5,
+    )
+    if settings.reload:
+        # The reloader runs its own server in a subprocess
+        uvicorn.run("src.main:app", reload=True, **options)
+        return
+    ChatServer(uvicorn.Config("src.main:app", **options)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,12 @@ class ModernChat {
         this.maxReconnectAttempts = 5;
         this.reconnectDelay = 1000;
         this.isManualClose = false; // Flag to prevent reconnection on manual close
+        this.reconnectHint = null; // Delay suggested by a draining server, ms
+        this.conversations = {}; // Cached messages and last seen seq per chat user
+        this.maxCachedMessages = 200;
+        this.historyPageSize = 30;
+        this.maxReceiptIds = 50; // WS_MAX_BATCH_SIZE on the server
+        this.isLoadingOlder = false;
         
         this.init();
     }
@@ -36,6 +42,16 @@ class ModernChat {
     }
     
     setupEventListeners() {
+        // Load older messages when scrolled to the top
+        const messagesContainer = document.getElementById('messages');
+        if (messagesContainer) {
+            messagesContainer.addEventListener('scroll', () => {
+                if (messagesContainer.scrollTop < 50) {
+                    this.loadOlderMessages();
+                }
+            });
+        }
+        
         // Send message on Enter (Shift+Enter for new line)
         const messageInput = document.getElementById('message-input');
         if (messageInput) {
@@ -216,7 +232,7 @@ class ModernChat {
         }
         
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/ws/chat?user_id=${this.currentUser}&other_user=${this.currentChatUser}`;
+        const wsUrl = `${protocol}//${window.location.host}/ws/chat?user_id=${this.currentUser}&other_user=${this.currentChatUser}&last_seq=${this.getConversation(this.currentChatUser).lastSeq}`;
         
         console.log('=== WebSocket Connection Details ===');
         console.log('Connecting to WebSocket:', wsUrl);
@@ -248,6 +264,7 @@ class ModernChat {
             this.isConnected = true;
             this.reconnectAttempts = 0;
             this.updateConnectionStatus('connected');
+            this.flushOutgoing();
             console.log('=== WebSocket connected successfully ===');
             console.log('Connected to user:', this.currentChatUser);
             console.log('WebSocket state:', this.ws.readyState);
@@ -279,6 +296,25 @@ class ModernChat {
                 manualClose: this.isManualClose
             });
             
+            // Server is restarting: reconnect after the jittered delay it suggested
+            if (event.code === 1012 && !this.isManualClose) {
+                const delay = this.reconnectHint ?? this.reconnectDelay;
+                this.reconnectHint = null;
+                this.updateConnectionStatus('connecting');
+                setTimeout(() => this.initializeWebSocket(), delay);
+                return;
+            }
+
+            // Session closed by server connection limits
+            if (event.code === 4005 || event.code === 1013) {
+                this.updateConnectionStatus('disconnected');
+                const reason = event.code === 4005
+                    ? 'Чат открыт в другой вкладке'
+                    : 'Сервер перегружен, попробуйте позже';
+                this.showNotification(reason, 'warning');
+                return;
+            }
+
             // Only update status if this wasn't a manual close
             if (event.code !== 1000 && !this.isManualClose) {
                 this.updateConnectionStatus('disconnected');
@@ -318,13 +354,32 @@ class ModernChat {
             }
         }
         
+        if (data.type === 'batch') {
+            // Several events coalesced by the server into one frame
+            (data.events || []).forEach(event => this.handleMessage(event));
+            return;
+        }
+        
         if (data.type === 'message') {
-            this.addMessage(data);
-            this.scrollToBottom();
-            this.playMessageSound();
+            this.receiveMessage(data);
+        } else if (data.type === 'replay') {
+            this.applyReplay(data);
+        } else if (data.type === 'ack') {
+            this.markMessageAcked(data.client_id, data.id, data.timestamp);
+        } else if (data.type === 'receipt') {
+            // Ids come from the peer, escape them before building a selector
+            (data.ids || []).forEach(id => this.setMessageStatus(
+                document.querySelector(`.message[data-message-id="${CSS.escape(String(id))}"]`), 'delivered'
+            ));
+        } else if (data.type === 'reconnect') {
+            // Sent before the server closes the socket with code 1012
+            this.reconnectHint = data.retry_after_ms;
         } else if (data.type === 'block_notification') {
             this.showNotification(data.message, 'warning');
         } else if (data.type === 'error') {
+            if (data.client_id) {
+                this.setMessageStatus(this.findPendingMessage(data.client_id), 'failed');
+            }
             this.showNotification(data.message, 'danger');
         } else if (data.from && data.message) {
             // Direct message format (from WebSocket)
@@ -336,7 +391,7 @@ class ModernChat {
         }
     }
     
-    addMessage(data) {
+    addMessage(data, prepend = false) {
         const messagesContainer = document.getElementById('messages');
         if (!messagesContainer) return;
         
@@ -401,6 +456,11 @@ class ModernChat {
         const currentUserId = parseInt(this.currentUser);
         const isOwnMessage = fromUserId === currentUserId;
         messageDiv.className = `message ${isOwnMessage ? 'own' : ''}`;
+        if (typeof data === 'object') {
+            if (data.id) messageDiv.dataset.messageId = data.id;
+            if (data.client_id) messageDiv.dataset.clientId = data.client_id;
+            if (data.pending) messageDiv.classList.add('pending');
+        }
         
         console.log('Adding message:', {
             fromUser: fromUser,
@@ -441,11 +501,18 @@ class ModernChat {
                 <div class="message-header">
                     <span class="message-author">${authorName}</span>
                     <span class="message-time">${timeString}</span>
+                    ${isOwnMessage ? '<span class="message-status"></span>' : ''}
                 </div>
                 <div class="message-text">${this.escapeHtml(messageText)}</div>
             </div>
         `;
         
+        const placeholder = messagesContainer.querySelector('.empty-conversation, .loading');
+        if (placeholder) placeholder.remove();
+        if (prepend) {
+            messagesContainer.insertBefore(messageDiv, messagesContainer.firstChild);
+            return;
+        }
         messagesContainer.appendChild(messageDiv);
         
         // Add animation
@@ -524,8 +591,17 @@ class ModernChat {
             sendBtn.innerHTML = '<div class="loading"></div>';
         }
         
-        // Send just the message text, not JSON
-        this.ws.send(message);
+        // Render optimistically, the server ack confirms persistence
+        const clientId = this.generateClientId();
+        this.addMessage({
+            from: this.currentUser,
+            message: message,
+            timestamp: Date.now() / 1000,
+            client_id: clientId,
+            pending: true
+        });
+        this.scrollToBottom();
+        this.queueOutgoing({ type: 'message', message: message, client_id: clientId });
         
         // Clear input and reset button
         messageInput.value = '';
@@ -542,6 +618,92 @@ class ModernChat {
         messageInput.focus();
     }
     
+    queueOutgoing(event) {
+        // Events queued within the same tick go out as one batch frame
+        this.outgoing = this.outgoing || [];
+        // Receipts cost a rate limit token each, so acknowledge together
+        const last = this.outgoing[this.outgoing.length - 1];
+        if (event.type === 'receipt' && last && last.type === 'receipt'
+                && last.ids.length + event.ids.length <= this.maxReceiptIds) {
+            last.ids.push(...event.ids);
+            return;
+        }
+        this.outgoing.push(event);
+        if (this.outgoing.length === 1) {
+            setTimeout(() => this.flushOutgoing(), 0);
+        }
+    }
+    
+    flushOutgoing() {
+        // Keep events queued until the socket opens
+        if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
+            return;
+        }
+        const messages = this.outgoing || [];
+        this.outgoing = [];
+        if (messages.length === 0) {
+            return;
+        }
+        
+        const frame = messages.length === 1
+            ? messages[0]
+            : { type: 'batch', messages: messages };
+        this.ws.send(JSON.stringify(frame));
+    }
+    
+    generateClientId() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+    
+    receiveMessage(data) {
+        // Live events held during replay may repeat replayed messages
+        if (!this.rememberMessage(data)) return;
+        
+        // Echo of our own optimistic message: just confirm it
+        const pending = data.client_id ? this.findPendingMessage(data.client_id) : null;
+        if (pending) {
+            this.markMessageAcked(data.client_id, data.id, data.timestamp);
+            return;
+        }
+        
+        this.addMessage(data);
+        this.scrollToBottom();
+        
+        if (parseInt(data.from) !== parseInt(this.currentUser)) {
+            this.playMessageSound();
+            if (data.id) {
+                this.queueOutgoing({ type: 'receipt', ids: [data.id] });
+            }
+        }
+    }
+    
+    findPendingMessage(clientId) {
+        return document.querySelector(`.message[data-client-id="${CSS.escape(clientId)}"]`);
+    }
+    
+    markMessageAcked(clientId, messageId, timestamp) {
+        const messageDiv = this.findPendingMessage(clientId);
+        if (!messageDiv) return;
+        messageDiv.dataset.messageId = messageId;
+        this.setMessageStatus(messageDiv, 'sent');
+    }
+    
+    setMessageStatus(messageDiv, status) {
+        if (!messageDiv) return;
+        // Delivery receipt may arrive before the ack, never downgrade
+        if (status === 'sent' && messageDiv.classList.contains('delivered')) return;
+        messageDiv.classList.remove('pending', 'sent', 'delivered', 'failed');
+        messageDiv.classList.add(status);
+        const statusEl = messageDiv.querySelector('.message-status');
+        if (statusEl) {
+            const icons = { sent: '✓', delivered: '✓✓', failed: '!' };
+            statusEl.textContent = icons[status] || '';
+        }
+    }
+    
     selectUser(userId, username) {
         // Prevent switching to the same user
         if (this.currentChatUser === parseInt(userId)) {
@@ -570,6 +732,9 @@ class ModernChat {
             this.ws = null;
         }
         
+        // Events queued for the previous conversation must not leak into the new one
+        this.outgoing = [];
+        
         // Reset connection state
         this.isConnected = false;
         this.reconnectAttempts = 0;
@@ -593,8 +758,8 @@ class ModernChat {
             chatTitle.innerHTML = `<i class="fas fa-comment"></i> Чат с ${username}`;
         }
         
-        // Clear messages and load history
-        this.loadChatHistory(userId, username);
+        // Show cached messages, the socket replays only what was missed
+        this.renderConversation(userId, username);
         
         // Initialize WebSocket connection after a longer delay to ensure old connection is closed
         setTimeout(() => {
@@ -615,46 +780,111 @@ class ModernChat {
         window.history.pushState({}, '', url);
     }
     
-    async loadChatHistory(userId, username = null) {
+    getConversation(userId) {
+        const key = parseInt(userId);
+        if (!this.conversations[key]) {
+            this.conversations[key] = { lastSeq: 0, messages: [], reachedStart: false };
+        }
+        return this.conversations[key];
+    }
+    
+    rememberMessage(data) {
+        // Returns false for messages that were already seen
+        if (!data.seq) return true;
+        const conversation = this.getConversation(this.currentChatUser);
+        if (data.seq <= conversation.lastSeq) return false;
+        
+        conversation.lastSeq = data.seq;
+        conversation.messages.push(data);
+        if (conversation.messages.length > this.maxCachedMessages) {
+            conversation.messages.shift();
+        }
+        return true;
+    }
+    
+    renderConversation(userId, username = null) {
         const messagesContainer = document.getElementById('messages');
         if (!messagesContainer) return;
         
-        // Show loading
-        messagesContainer.innerHTML = '<div class="loading" style="margin: 2rem auto;"></div>';
+        const conversation = this.getConversation(userId);
+        if (conversation.messages.length === 0) {
+            // Replaced by the replay frame once the socket connects
+            messagesContainer.innerHTML = '<div class="loading" style="margin: 2rem auto;"></div>';
+            return;
+        }
         
+        messagesContainer.innerHTML = '';
+        conversation.messages.forEach(message => this.addMessage(message));
+        this.scrollToBottom();
+    }
+    
+    async loadOlderMessages() {
+        const conversation = this.getConversation(this.currentChatUser);
+        const oldest = conversation.messages[0];
+        // seq doesn't start at 1, a short page means nothing is older
+        if (this.isLoadingOlder || !oldest || !oldest.seq || conversation.reachedStart) return;
+        
+        const chatUser = this.currentChatUser;
+        this.isLoadingOlder = true;
         try {
-            const response = await fetch(`/chat/history?user=${userId}`);
-            const history = await response.json();
+            const response = await fetch(`/chat/history?user=${chatUser}&before=${oldest.seq}&limit=${this.historyPageSize}`);
+            const messages = await response.json();
+            if (!Array.isArray(messages) || chatUser !== this.currentChatUser) return;
+            if (messages.length < this.historyPageSize) conversation.reachedStart = true;
             
+            // Keep the visible messages in place while prepending
+            const messagesContainer = document.getElementById('messages');
+            const previousHeight = messagesContainer.scrollHeight;
+            messages.filter(message => message.seq < oldest.seq).reverse().forEach(message => {
+                conversation.messages.unshift(message);
+                this.addMessage(message, true);
+            });
+            messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            this.isLoadingOlder = false;
+        }
+    }
+    
+    applyReplay(data) {
+        const messagesContainer = document.getElementById('messages');
+        if (!messagesContainer) return;
+        
+        const conversation = this.getConversation(this.currentChatUser);
+        if (data.reset || (data.gap && conversation.lastSeq > 0)) {
+            // Cached messages can't be joined with the replay, start over
+            conversation.lastSeq = 0;
+            conversation.messages = [];
+            conversation.reachedStart = false;
+        }
+        if (conversation.messages.length === 0) {
             messagesContainer.innerHTML = '';
-            
-            if (history.length === 0) {
-                const displayName = username || this.getUserName(userId);
-                messagesContainer.innerHTML = `
-                    <div style="text-align: center; color: var(--text-secondary); margin: 2rem 0;">
-                        <i class="fas fa-comments" style="font-size: 3rem; margin-bottom: 1rem;"></i>
-                        <p>Начните разговор с ${displayName}</p>
-                    </div>
-                `;
-            } else {
-                console.log('Loading chat history:', history);
-                console.log('Current user for history:', this.currentUser);
-                
-                history.forEach(message => {
-                    this.addMessage(message);
-                });
+        }
+        
+        data.messages.forEach(message => {
+            if (this.rememberMessage(message)) {
+                this.addMessage(message);
             }
-            
-            this.scrollToBottom();
-            
-        } catch (error) {
-            console.error('Error loading chat history:', error);
-            messagesContainer.innerHTML = `
-                <div class="alert alert-danger">
-                    Ошибка загрузки истории сообщений
-                </div>
-            `;
+        });
+        
+        if (conversation.messages.length === 0 && !messagesContainer.querySelector('.message')) {
+            this.showEmptyConversation(this.currentChatUser);
         }
+        this.scrollToBottom();
+    }
+    
+    showEmptyConversation(userId) {
+        const messagesContainer = document.getElementById('messages');
+        if (!messagesContainer) return;
+        
+        const displayName = this.getUserName(userId);
+        messagesContainer.innerHTML = `
+            <div class="empty-conversation" style="text-align: center; color: var(--text-secondary); margin: 2rem 0;">
+                <i class="fas fa-comments" style="font-size: 3rem; margin-bottom: 1rem;"></i>
+                <p>Начните разговор с ${this.escapeHtml(displayName)}</p>
+            </div>
+        `;
     }
     
     async toggleBlock(userId, action) {
@@ -1113,7 +1343,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     const username = userElement.dataset.username;
                     console.log('Initializing chat with current page user:', userId, username);
                     chat.currentChatUser = parseInt(userId);
-                    chat.loadChatHistory(userId, username);
+                    chat.renderConversation(userId, username);
                     chat.initializeWebSocket();
                 }
             }
@@ -1,7 +1,114 @@
 import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from jinja2.bccache import Bucket
+from markupsafe import Markup
+
+from src.assets import asset_url
+from src.config import settings
+from src.metrics import TEMPLATE_BYTECODE_CACHE, TEMPLATE_FRAGMENT_CACHE
+
+
+class MeteredBytecodeCache(FileSystemBytecodeCache):
+    """Jinja bytecode cache on disk that counts hits and misses."""
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+        TEMPLATE_BYTECODE_CACHE.labels(
+            "hit" if bucket.code is not None else "miss"
+        ).inc()
+
+
+class FragmentCache:
+    """
+    LRU cache of rendered HTML fragments.
+
+    Keys must contain the versions of everything the fragment shows, so
+    entries never need to be invalidated explicitly: a changed version simply
+    produces a new key and the stale entry ages out.
+    """
+
+    def __init__(self, max_entries: int = None):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of fragments kept (uses config default)
+        """
+        self.max_entries = max_entries or settings.fragment_cache_size
+        self._entries: OrderedDict[Hashable, Markup] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(
+        self, name: str, key: Hashable, render: Callable[[], str]
+    ) -> Markup:
+        """
+        Get a cached fragment or render and cache it.
+
+        Args:
+            name: Fragment name, used as the metrics label
+            key: Versions the fragment depends on
+            render: Function producing the fragment HTML on a miss
+
+        Returns:
+            Fragment HTML, safe to insert into a template
+        """
+        cache_key = (name, key)
+        with self._lock:
+            fragment = self._entries.get(cache_key)
+            if fragment is not None:
+                self._entries.move_to_end(cache_key)
+        if fragment is not None:
+            TEMPLATE_FRAGMENT_CACHE.labels(name, "hit").inc()
+            return fragment
+
+        TEMPLATE_FRAGMENT_CACHE.labels(name, "miss").inc()
+        fragment = Markup(render())
+        with self._lock:
+            self._entries[cache_key] = fragment
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self) -> None:
+        """Drop all fragments."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _create_bytecode_cache() -> MeteredBytecodeCache | None:
+    """Create the bytecode cache, or None if its directory is not writable."""
+    try:
+        os.makedirs(settings.jinja_bytecode_cache_dir, exist_ok=True)
+    except OSError:
+        return None
+    return MeteredBytecodeCache(settings.jinja_bytecode_cache_dir)
+
 
 templates = Jinja2Templates(
     directory=os.path.join(os.path.dirname(__file__), "templates")
 )
+templates.env.bytecode_cache = _create_bytecode_cache()
+
+# Fingerprinted URLs of static assets: {{ asset_url("css/main.css") }}
+templates.env.globals["asset_url"] = asset_url
+
+fragment_cache = FragmentCache()
+
+
+def render_fragment(template_name: str, context: dict) -> str:
+    """
+    Render a partial template to a string.
+
+    Args:
+        template_name: Template path, e.g. ``partials/users_list.html``
+        context: Template variables
+
+    Returns:
+        Rendered HTML
+    """
+    return templates.get_template(template_name).render(context)
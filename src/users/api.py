@@ -1,8 +1,11 @@
 """API router for user-related endpoints (JSON responses)."""
 
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
+from src.config import settings
 from src.dependencies import get_user_service
+from src.http_cache import is_not_modified, make_etag, not_modified, set_validators
+from src.users.auth import get_session_user, set_session_cookie
 from src.users.schemas import UserCreate, UserLogin, UserRead
 from src.users.services import UserService
 
@@ -37,57 +40,60 @@ def login(
     user_obj = user_service.login(user_data.username, user_data.password)
     if not user_obj:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    response.set_cookie(key="user_id", value=str(user_obj.id), httponly=True)
+    set_session_cookie(response, user_obj)
     return user_obj
 
 
 @api_router.post("/logout")
 def logout(response: Response):
     """Logout user via API."""
-    response.delete_cookie(key="user_id")
+    response.delete_cookie(key=settings.session_cookie_name)
     return {"message": "Logged out successfully"}
 
 
 @api_router.get("/me", response_model=UserRead)
-def get_current_user(
-    user_id: int = Cookie(None), user_service: UserService = Depends(get_user_service)
-):
+def get_current_user(current_user: UserRead | None = Depends(get_session_user)):
     """Get current user info via API."""
-    if not user_id:
+    if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user_obj = user_service.get_user(int(user_id))
-    if not user_obj:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user_obj
+    return current_user
 
 
 @api_router.get("/", response_model=list[UserRead])
-def list_users(user_service: UserService = Depends(get_user_service)):
-    """Get list of all users via API."""
+def list_users(
+    request: Request,
+    response: Response,
+    user_service: UserService = Depends(get_user_service),
+):
+    """Get list of all users via API, answering 304 if it has not changed."""
+    etag = make_etag("users", user_service.get_users_version())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
     return user_service.list_users()
 
 
 @api_router.post("/block/{user_id}")
 def block_user(
     user_id: int,
-    current_user_id: int = Cookie(None, alias="user_id"),
+    current_user: UserRead | None = Depends(get_session_user),
     user_service: UserService = Depends(get_user_service),
 ):
     """Block a user via API."""
-    if not current_user_id:
+    if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user_service.block_user(int(current_user_id), user_id)
+    user_service.block_user(current_user.id, user_id)
     return {"message": "User blocked successfully"}
 
 
 @api_router.delete("/block/{user_id}")
 def unblock_user(
     user_id: int,
-    current_user_id: int = Cookie(None, alias="user_id"),
+    current_user: UserRead | None = Depends(get_session_user),
     user_service: UserService = Depends(get_user_service),
 ):
     """Unblock a user via API."""
-    if not current_user_id:
+    if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    user_service.unblock_user(int(current_user_id), user_id)
+    user_service.unblock_user(current_user.id, user_id)
     return {"message": "User unblocked successfully"}
@@ -0,0 +1,117 @@
+"""Signed session tokens carrying the identity of a logged in user."""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from fastapi import Request, Response
+
+from src.config import settings
+from src.users.schemas import UserRead
+
+
+def _b64encode(data: bytes) -> str:
+    """Encode bytes as URL-safe base64 without padding."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    """Decode URL-safe base64 with the padding stripped."""
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str, secret: str) -> str:
+    """Get the HMAC-SHA256 signature of an encoded payload."""
+    digest = hmac.new(secret.encode(), payload.encode("ascii"), hashlib.sha256)
+    return _b64encode(digest.digest())
+
+
+def create_session_token(
+    user: UserRead, max_age: int = None, secret: str = None
+) -> str:
+    """
+    Create a session token for a user.
+
+    Args:
+        user: Logged in user
+        max_age: Lifetime of the token in seconds (uses config default)
+        secret: Signing key (uses config default)
+
+    Returns:
+        Token of the form ``payload.signature``
+    """
+    max_age = settings.session_max_age_seconds if max_age is None else max_age
+    claims = {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "exp": int(time.time()) + max_age,
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload, secret or settings.session_secret_key)}"
+
+
+def read_session_token(token: str | None, secret: str = None) -> UserRead | None:
+    """
+    Get the user of a session token without touching the database.
+
+    Args:
+        token: Token from the session cookie
+        secret: Signing key (uses config default)
+
+    Returns:
+        User the token was issued to, or None if it is missing, malformed,
+        forged or expired
+    """
+    if not token:
+        return None
+    payload, _, signature = token.rpartition(".")
+    try:
+        expected = _sign(payload, secret or settings.session_secret_key)
+        if not payload or not hmac.compare_digest(
+            signature.encode(), expected.encode()
+        ):
+            return None
+        claims = json.loads(_b64decode(payload))
+        if claims["exp"] < time.time():
+            return None
+        # Подпись уже подтверждает данные: повторная валидация email не нужна
+        return UserRead.model_construct(
+            id=int(claims["id"]),
+            username=claims["username"],
+            email=claims["email"],
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def set_session_cookie(response: Response, user: UserRead) -> None:
+    """
+    Log a user in by setting the session cookie.
+
+    Args:
+        response: Response to set the cookie on
+        user: Logged in user
+    """
+    response.set_cookie(
+        key=settings.session_cookie_name,
+        value=create_session_token(user),
+        max_age=settings.session_max_age_seconds,
+        httponly=settings.session_cookie_httponly,
+        secure=settings.session_cookie_secure,
+    )
+
+
+def get_session_user(request: Request) -> UserRead | None:
+    """
+    Get the user of the session cookie without a database lookup.
+
+    Args:
+        request: FastAPI request object
+
+    Returns:
+        User object or None if not authenticated
+    """
+    return read_session_token(request.cookies.get(settings.session_cookie_name))
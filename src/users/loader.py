@@ -0,0 +1,84 @@
+"""Request-scoped batching of user lookups by ID."""
+
+from collections.abc import Iterable
+
+from src.users.repositories.abs.user import AbstractUserRepository
+from src.users.schemas import UserRead
+
+
+class UserLoader:
+    """
+    Collect user IDs and load them with one repository call.
+
+    Callers ``prime`` every ID they are going to need, then ``load`` them: the
+    first load fetches all pending IDs in a single ``get_users_by_ids`` call
+    (``WHERE id IN (...)`` in the database) and every result, including a
+    missing user, is remembered for the lifetime of the loader. Create one per
+    request or per batch of WebSocket messages, never share it between them.
+    """
+
+    def __init__(self, repo: AbstractUserRepository):
+        """
+        Initialize an empty loader.
+
+        Args:
+            repo: User repository to load from
+        """
+        self.repo = repo
+        self._users: dict[int, UserRead | None] = {}
+        self._pending: set[int] = set()
+
+    def prime(self, *user_ids: int) -> None:
+        """
+        Schedule users to be loaded by the next ``load``.
+
+        Args:
+            *user_ids: User IDs
+        """
+        self._pending.update(i for i in user_ids if i not in self._users)
+
+    def load(self, user_id: int) -> UserRead | None:
+        """
+        Get a user, loading it together with all pending IDs.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            User object or None if not found
+        """
+        self.prime(user_id)
+        self._dispatch()
+        return self._users[user_id]
+
+    def load_many(self, user_ids: Iterable[int]) -> dict[int, UserRead | None]:
+        """
+        Get several users with at most one repository call.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            User object or None for every requested ID
+        """
+        user_ids = list(user_ids)
+        self.prime(*user_ids)
+        self._dispatch()
+        return {user_id: self._users[user_id] for user_id in user_ids}
+
+    def _dispatch(self) -> None:
+        """Load all pending IDs in one call."""
+        if not self._pending:
+            return
+        found = {user.id: user for user in self.repo.get_users_by_ids(self._pending)}
+        for user_id in self._pending:
+            user = found.get(user_id)
+            # Данные из собственной БД уже проверены при регистрации
+            self._users[user_id] = (
+                UserRead.model_construct(
+                    id=user.id, username=user.username, email=user.email
+                )
+                if user is not None
+                else None
+            )
+        self._pending.clear()
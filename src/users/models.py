@@ -2,7 +2,15 @@
 
 import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 
 from src.db.base import Base
 
@@ -36,9 +44,11 @@ class UserBlock(Base):
     blocked_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
 
-    # Ensure unique blocking relationship
+    # Ensure unique blocking relationship; the reverse index serves lookups
+    # by the blocked user
     __table_args__ = (
         UniqueConstraint("blocker_id", "blocked_id", name="unique_block"),
+        Index("ix_user_blocks_blocked_blocker", "blocked_id", "blocker_id"),
     )
 
     def __repr__(self):
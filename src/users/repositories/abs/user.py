@@ -1,9 +1,10 @@
 """Abstract base class for user repository implementations."""
 
 from abc import ABC, abstractmethod
+from collections.abc import Iterable
 
 from src.users.models import User
-from src.users.schemas import UserCreate
+from src.users.schemas import BlockRelation, UserCreate
 
 
 class AbstractUserRepository(ABC):
@@ -35,6 +36,19 @@ class AbstractUserRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> list[User]:
+        """
+        Get several users by ID at once.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            Found users in no particular order, unknown IDs are skipped
+        """
+        pass
+
     @abstractmethod
     def get_user_by_username(self, username: str) -> User | None:
         """
@@ -71,6 +85,29 @@ class AbstractUserRepository(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_users_version(self) -> str:
+        """
+        Get a version of the users table for conditional requests.
+
+        Returns:
+            Opaque string that changes whenever a user is registered
+        """
+        pass
+
+    @abstractmethod
+    def get_block_version(self, user_id: int) -> str:
+        """
+        Get a version of the blocks a user takes part in.
+
+        Args:
+            user_id: ID of the user as blocker or blocked
+
+        Returns:
+            Opaque string that changes whenever such a block is added or removed
+        """
+        pass
+
     @abstractmethod
     def block_user(self, blocker_id: int, blocked_id: int) -> None:
         """
@@ -94,6 +131,19 @@ class AbstractUserRepository(ABC):
         pass
 
     @abstractmethod
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
+        """
+        Get the blocks between two users in both directions at once.
+
+        Args:
+            user_id: ID of the user the relation is seen from
+            other_user_id: ID of the other user
+
+        Returns:
+            Which of the users blocked the other
+        """
+        pass
+
     def is_blocked(self, user1_id: int, user2_id: int) -> bool:
         """
         Check if two users are blocked.
@@ -105,9 +155,8 @@ class AbstractUserRepository(ABC):
         Returns:
             True if either user has blocked the other
         """
-        pass
+        return self.get_block_relation(user1_id, user2_id).is_blocked
 
-    @abstractmethod
     def who_blocked_whom(self, user1_id: int, user2_id: int) -> tuple[int, int] | None:
         """
         Check who blocked whom between two users.
@@ -117,9 +166,15 @@ class AbstractUserRepository(ABC):
             user2_id: ID of the second user
 
         Returns:
-            Tuple (blocker_id, blocked_id) if there's a block, None otherwise
-        """
-        pass
+            Tuple (blocker_id, blocked_id) if there's a block, None otherwise.
+            If both blocked each other, the block by the first user
+        """
+        relation = self.get_block_relation(user1_id, user2_id)
+        if relation.blocks_other:
+            return (user1_id, user2_id)
+        if relation.blocked_by_other:
+            return (user2_id, user1_id)
+        return None
 
     @abstractmethod
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
@@ -0,0 +1,300 @@
+"""Read-through caching decorator for user repositories."""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.logger import user_logger
+from src.metrics import USER_CACHE
+from src.users.models import User
+from src.users.repositories.abs.user import AbstractUserRepository
+from src.users.schemas import BlockRelation, UserCreate
+
+# Канал Redis, по которому процессы сообщают друг другу об изменённых пользователях
+INVALIDATION_CHANNEL = "users:invalidate"
+
+
+class UserCache:
+    """
+    Process-wide TTL + LRU cache of users by ID.
+
+    Missing users are cached too, for a shorter time, so repeated lookups of
+    an unknown ID do not reach the database. When ``redis_client`` is given,
+    invalidations are published to every process of the application and
+    received by a listener started with ``start``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        ttl_seconds: float = None,
+        negative_ttl_seconds: float = None,
+        redis_client: redis.Redis | None = None,
+    ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries: Maximum number of users kept (uses config default)
+            ttl_seconds: Lifetime of a cached user (uses config default)
+            negative_ttl_seconds: Lifetime of a cached miss (uses config default)
+            redis_client: Redis client for cross-process invalidation (optional)
+        """
+        self.max_entries = (
+            settings.user_cache_size if max_entries is None else max_entries
+        )
+        self.ttl_seconds = (
+            settings.user_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        self.negative_ttl_seconds = (
+            settings.user_cache_negative_ttl_seconds
+            if negative_ttl_seconds is None
+            else negative_ttl_seconds
+        )
+        self.redis = redis_client
+        self._entries: OrderedDict[int, tuple[float, User | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listener: asyncio.Task | None = None
+
+    def get(self, user_id: int) -> tuple[bool, User | None]:
+        """
+        Look up a user.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Whether the ID was cached, and the user or None for a cached miss
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] <= now:
+                del self._entries[user_id]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+        if entry is None:
+            USER_CACHE.labels("miss").inc()
+            return False, None
+        USER_CACHE.labels("hit" if entry[1] is not None else "negative_hit").inc()
+        return True, entry[1]
+
+    def put(self, user_id: int, user: User | None) -> None:
+        """
+        Cache a user or, with None, the absence of one.
+
+        Args:
+            user_id: User ID
+            user: Loaded user or None if it does not exist
+        """
+        ttl = self.ttl_seconds if user is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id: int) -> None:
+        """Drop a user from this process only."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Drop a user here and in every other process.
+
+        Safe to call from the worker threads of sync endpoints: the publish
+        is handed over to the event loop the listener runs on.
+
+        Args:
+            user_id: ID of the changed user
+        """
+        self.evict(user_id)
+        if self.redis is None or self._loop is None or self._loop.is_closed():
+            return
+        publish = self.redis.publish(INVALIDATION_CHANNEL, str(user_id))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._loop.create_task(publish)
+        else:
+            asyncio.run_coroutine_threadsafe(publish, self._loop)
+
+    def clear(self) -> None:
+        """Drop all users."""
+        with self._lock:
+            self._entries.clear()
+
+    async def start(self) -> None:
+        """Start receiving invalidations from other processes."""
+        if self.redis is None or self._listener is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        """Stop receiving invalidations."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._loop = None
+
+    async def _listen(self) -> None:
+        """Evict users named on the invalidation channel, resubscribing on errors."""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Изменения, пропущенные без подписки, сбрасываем целиком
+                self.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.evict(int(message["data"]))
+            except (redis.RedisError, OSError) as e:
+                user_logger.warning("User cache invalidation listener failed: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+class UserRepositoryCached(AbstractUserRepository):
+    """
+    User repository that serves lookups by ID from a shared cache.
+
+    Every other call goes to the wrapped repository. Cached users are detached
+    copies, so they stay readable after the session that loaded them closes.
+    """
+
+    def __init__(self, repo: AbstractUserRepository, cache: UserCache):
+        """
+        Initialize the decorator.
+
+        Args:
+            repo: Repository to read through to
+            cache: Cache shared by all repositories of the process
+        """
+        self.repo = repo
+        self.cache = cache
+
+    def create_user(self, user_data: UserCreate) -> User | None:
+        """
+        Create a new user and forget a cached miss for its ID.
+
+        Args:
+            user_data: User creation data
+
+        Returns:
+            Created user object or None if creation failed
+        """
+        user = self.repo.create_user(user_data)
+        if user is not None:
+            self.cache.invalidate(user.id)
+        return user
+
+    def get_user_by_id(self, user_id: int) -> User | None:
+        """
+        Get user by ID, from the cache when possible.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            User object or None if not found
+        """
+        cached, user = self.cache.get(user_id)
+        if cached:
+            return user
+        user = self.repo.get_user_by_id(user_id)
+        if user is not None:
+            user = self._detach(user)
+        self.cache.put(user_id, user)
+        return user
+
+    @staticmethod
+    def _detach(user: User) -> User:
+        """Copy a user so that it does not depend on the session that loaded it."""
+        return User(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            password_hash=user.password_hash,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> list[User]:
+        """
+        Get several users by ID, loading only the uncached ones in one call.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            Found users in no particular order, unknown IDs are skipped
+        """
+        users = []
+        missing = set()
+        for user_id in set(user_ids):
+            cached, user = self.cache.get(user_id)
+            if not cached:
+                missing.add(user_id)
+            elif user is not None:
+                users.append(user)
+        if missing:
+            loaded = {
+                user.id: self._detach(user)
+                for user in self.repo.get_users_by_ids(missing)
+            }
+            for user_id in missing:
+                self.cache.put(user_id, loaded.get(user_id))
+            users.extend(loaded.values())
+        return users
+
+    def get_user_by_username(self, username: str) -> User | None:
+        """Get user by username from the wrapped repository."""
+        return self.repo.get_user_by_username(username)
+
+    def get_user_by_email(self, email: str) -> User | None:
+        """Get user by email from the wrapped repository."""
+        return self.repo.get_user_by_email(email)
+
+    def list_users(self) -> list[User]:
+        """Get list of all users from the wrapped repository."""
+        return self.repo.list_users()
+
+    def get_users_version(self) -> str:
+        """Get a version of the users from the wrapped repository."""
+        return self.repo.get_users_version()
+
+    def get_block_version(self, user_id: int) -> str:
+        """Get a version of the blocks of a user from the wrapped repository."""
+        return self.repo.get_block_version(user_id)
+
+    def block_user(self, blocker_id: int, blocked_id: int) -> None:
+        """Block a user in the wrapped repository."""
+        self.repo.block_user(blocker_id, blocked_id)
+
+    def unblock_user(self, blocker_id: int, blocked_id: int) -> None:
+        """Unblock a user in the wrapped repository."""
+        self.repo.unblock_user(blocker_id, blocked_id)
+
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
+        """Get the blocks between two users from the wrapped repository."""
+        return self.repo.get_block_relation(user_id, other_user_id)
+
+    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify password against hash with the wrapped repository."""
+        return self.repo.verify_password(plain_password, hashed_password)
@@ -1,11 +1,14 @@
 """Database implementation of user repository using SQLAlchemy."""
 
+from collections.abc import Iterable
+
+from sqlalchemy import and_, func, or_
 from sqlalchemy.exc import IntegrityError
 
 from src.db.session import SessionLocal
 from src.users.models import User, UserBlock
 from src.users.repositories.abs.user import AbstractUserRepository
-from src.users.schemas import UserCreate
+from src.users.schemas import BlockRelation, UserCreate
 
 
 class UserRepositoryDB(AbstractUserRepository):
@@ -53,6 +56,22 @@ class UserRepositoryDB(AbstractUserRepository):
         with SessionLocal() as db:
             return db.query(User).filter(User.id == user_id).first()
 
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> list[User]:
+        """
+        Get several users by ID from database in one query.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            Found users in no particular order, unknown IDs are skipped
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return []
+        with SessionLocal() as db:
+            return db.query(User).filter(User.id.in_(user_ids)).all()
+
     def get_user_by_username(self, username: str) -> User | None:
         """
         Get user by username from database.
@@ -89,6 +108,38 @@ class UserRepositoryDB(AbstractUserRepository):
         with SessionLocal() as db:
             return db.query(User).all()
 
+    def get_users_version(self) -> str:
+        """
+        Get a version of the users table from database.
+
+        Returns:
+            Highest user id as a string, users are only ever inserted
+        """
+        with SessionLocal() as db:
+            return str(db.query(func.max(User.id)).scalar() or 0)
+
+    def get_block_version(self, user_id: int) -> str:
+        """
+        Get a version of the blocks a user takes part in from database.
+
+        Args:
+            user_id: ID of the user as blocker or blocked
+
+        Returns:
+            Version string in the form ``"<count>-<max id>"``
+        """
+        with SessionLocal() as db:
+            count, max_id = (
+                db.query(func.count(UserBlock.id), func.max(UserBlock.id))
+                .filter(
+                    or_(
+                        UserBlock.blocker_id == user_id, UserBlock.blocked_id == user_id
+                    )
+                )
+                .one()
+            )
+            return f"{count}-{max_id or 0}"
+
     def block_user(self, blocker_id: int, blocked_id: int) -> None:
         """
         Block a user in the database.
@@ -127,68 +178,34 @@ class UserRepositoryDB(AbstractUserRepository):
             ).delete()
             db.commit()
 
-    def is_blocked(self, user1_id: int, user2_id: int) -> bool:
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
         """
-        Check if two users are blocked in the database.
+        Get the blocks between two users in both directions in one query.
 
         Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
+            user_id: ID of the user the relation is seen from
+            other_user_id: ID of the other user
 
         Returns:
-            True if either user has blocked the other
+            Which of the users blocked the other
         """
         with SessionLocal() as db:
-            return (
-                db.query(UserBlock)
-                .filter(
-                    (
-                        (UserBlock.blocker_id == user1_id)
-                        & (UserBlock.blocked_id == user2_id)
-                    )
-                    | (
-                        (UserBlock.blocker_id == user2_id)
-                        & (UserBlock.blocked_id == user1_id)
+            blocker_ids = {
+                blocker_id
+                for (blocker_id,) in db.query(UserBlock.blocker_id).filter(
+                    or_(
+                        and_(
+                            UserBlock.blocker_id == user_id,
+                            UserBlock.blocked_id == other_user_id,
+                        ),
+                        and_(
+                            UserBlock.blocker_id == other_user_id,
+                            UserBlock.blocked_id == user_id,
+                        ),
                     )
                 )
-                .first()
-                is not None
-            )
-
-    def who_blocked_whom(self, user1_id: int, user2_id: int) -> tuple[int, int] | None:
-        """
-        Check who blocked whom between two users.
-
-        Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
-
-        Returns:
-            Tuple (blocker_id, blocked_id) if there's a block, None otherwise
-        """
-        with SessionLocal() as db:
-            # Check if user1 blocked user2
-            block = (
-                db.query(UserBlock)
-                .filter(
-                    (UserBlock.blocker_id == user1_id)
-                    & (UserBlock.blocked_id == user2_id)
-                )
-                .first()
-            )
-            if block:
-                return (user1_id, user2_id)
-
-            # Check if user2 blocked user1
-            block = (
-                db.query(UserBlock)
-                .filter(
-                    (UserBlock.blocker_id == user2_id)
-                    & (UserBlock.blocked_id == user1_id)
-                )
-                .first()
-            )
-            if block:
-                return (user2_id, user1_id)
-
-            return None
+            }
+        return BlockRelation(
+            blocks_other=user_id in blocker_ids,
+            blocked_by_other=other_user_id in blocker_ids,
+        )
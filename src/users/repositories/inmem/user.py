@@ -1,18 +1,29 @@
 """In-memory implementation of user repository for testing."""
 
+from collections.abc import Iterable
+
 from src.users.models import User, UserBlock
 from src.users.repositories.abs.user import AbstractUserRepository
-from src.users.schemas import UserCreate
+from src.users.schemas import BlockRelation, UserCreate
 
 
 class UserRepositoryInMemory(AbstractUserRepository):
-    """In-memory implementation of user repository for testing."""
+    """In-memory user repository with hash indexes, for tests and local runs."""
 
     def __init__(self):
         """Initialize the in-memory repository."""
         self.users = {}
         self.blocks = {}
         self._next_id = 1
+        self._next_block_id = 1
+        # Индексы: поиск по имени и почте за O(1) вместо обхода всех пользователей
+        self._ids_by_username: dict[str, int] = {}
+        self._ids_by_email: dict[str, int] = {}
+        # Списки смежности блокировок: кого заблокировал и кем заблокирован
+        self._blocking: dict[int, set[int]] = {}
+        self._blocked_by: dict[int, set[int]] = {}
+        self._version = 0
+        self._block_versions: dict[int, int] = {}
 
     def create_user(self, user_data: UserCreate) -> User | None:
         """
@@ -25,9 +36,11 @@ class UserRepositoryInMemory(AbstractUserRepository):
             Created user object or None if creation failed
         """
         # Check for existing username or email
-        for user in self.users.values():
-            if user.username == user_data.username or user.email == user_data.email:
-                return None
+        if (
+            user_data.username in self._ids_by_username
+            or user_data.email in self._ids_by_email
+        ):
+            return None
 
         # For testing, we'll use the password as the hash
         # In production, this should be properly hashed
@@ -38,7 +51,10 @@ class UserRepositoryInMemory(AbstractUserRepository):
             password_hash=user_data.password,  # Store password as hash for testing
         )
         self.users[user.id] = user
+        self._ids_by_username[user.username] = user.id
+        self._ids_by_email[user.email] = user.id
         self._next_id += 1
+        self._version += 1
         return user
 
     def get_user_by_id(self, user_id: int) -> User | None:
@@ -53,6 +69,18 @@ class UserRepositoryInMemory(AbstractUserRepository):
         """
         return self.users.get(user_id)
 
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> list[User]:
+        """
+        Get several users by ID from memory.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            Found users in no particular order, unknown IDs are skipped
+        """
+        return [self.users[i] for i in set(user_ids) if i in self.users]
+
     def get_user_by_username(self, username: str) -> User | None:
         """
         Get user by username from memory.
@@ -63,10 +91,8 @@ class UserRepositoryInMemory(AbstractUserRepository):
         Returns:
             User object or None if not found
         """
-        for user in self.users.values():
-            if user.username == username:
-                return user
-        return None
+        user_id = self._ids_by_username.get(username)
+        return None if user_id is None else self.users[user_id]
 
     def get_user_by_email(self, email: str) -> User | None:
         """
@@ -78,10 +104,8 @@ class UserRepositoryInMemory(AbstractUserRepository):
         Returns:
             User object or None if not found
         """
-        for user in self.users.values():
-            if user.email == email:
-                return user
-        return None
+        user_id = self._ids_by_email.get(email)
+        return None if user_id is None else self.users[user_id]
 
     def list_users(self) -> list[User]:
         """
@@ -92,6 +116,32 @@ class UserRepositoryInMemory(AbstractUserRepository):
         """
         return list(self.users.values())
 
+    def get_users_version(self) -> str:
+        """
+        Get a version of the users stored in memory.
+
+        Returns:
+            Counter bumped on every registration
+        """
+        return str(self._version)
+
+    def get_block_version(self, user_id: int) -> str:
+        """
+        Get a version of the blocks a user takes part in.
+
+        Args:
+            user_id: ID of the user as blocker or blocked
+
+        Returns:
+            Counter bumped on every block and unblock involving the user
+        """
+        return str(self._block_versions.get(user_id, 0))
+
+    def _bump_block_version(self, *user_ids: int) -> None:
+        """Mark the block sets of users as changed."""
+        for user_id in user_ids:
+            self._block_versions[user_id] = self._block_versions.get(user_id, 0) + 1
+
     def block_user(self, blocker_id: int, blocked_id: int) -> None:
         """
         Block a user in memory.
@@ -103,9 +153,13 @@ class UserRepositoryInMemory(AbstractUserRepository):
         block_key = (blocker_id, blocked_id)
         if block_key not in self.blocks:
             block = UserBlock(
-                id=len(self.blocks) + 1, blocker_id=blocker_id, blocked_id=blocked_id
+                id=self._next_block_id, blocker_id=blocker_id, blocked_id=blocked_id
             )
             self.blocks[block_key] = block
+            self._next_block_id += 1
+            self._blocking.setdefault(blocker_id, set()).add(blocked_id)
+            self._blocked_by.setdefault(blocked_id, set()).add(blocker_id)
+            self._bump_block_version(blocker_id, blocked_id)
 
     def unblock_user(self, blocker_id: int, blocked_id: int) -> None:
         """
@@ -118,39 +172,25 @@ class UserRepositoryInMemory(AbstractUserRepository):
         block_key = (blocker_id, blocked_id)
         if block_key in self.blocks:
             del self.blocks[block_key]
+            self._blocking[blocker_id].discard(blocked_id)
+            self._blocked_by[blocked_id].discard(blocker_id)
+            self._bump_block_version(blocker_id, blocked_id)
 
-    def is_blocked(self, user1_id: int, user2_id: int) -> bool:
-        """
-        Check if two users are blocked in memory.
-
-        Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
-
-        Returns:
-            True if either user has blocked the other
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
         """
-        return (user1_id, user2_id) in self.blocks or (
-            user2_id,
-            user1_id,
-        ) in self.blocks
-
-    def who_blocked_whom(self, user1_id: int, user2_id: int) -> tuple[int, int] | None:
-        """
-        Check who blocked whom between two users.
+        Get the blocks between two users in both directions from memory.
 
         Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
+            user_id: ID of the user the relation is seen from
+            other_user_id: ID of the other user
 
         Returns:
-            Tuple (blocker_id, blocked_id) if there's a block, None otherwise
+            Which of the users blocked the other
         """
-        if (user1_id, user2_id) in self.blocks:
-            return (user1_id, user2_id)
-        elif (user2_id, user1_id) in self.blocks:
-            return (user2_id, user1_id)
-        return None
+        return BlockRelation(
+            blocks_other=other_user_id in self._blocking.get(user_id, ()),
+            blocked_by_other=other_user_id in self._blocked_by.get(user_id, ()),
+        )
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """
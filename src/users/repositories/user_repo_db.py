@@ -1,12 +1,16 @@
 """Database implementation of user repository using SQLAlchemy."""
 
+from collections.abc import Iterable
+
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from passlib.context import CryptContext
 
+from src.metrics import DB_QUERY_SECONDS, timed
 from src.users.repositories.abs.user import AbstractUserRepository
 from src.users.models import User, UserBlock
-from src.users.schemas import UserCreate
+from src.users.schemas import BlockRelation, UserCreate
 
 # Настройка хэширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -23,6 +27,7 @@ class UserRepositoryDB(AbstractUserRepository):
         """Hash password using bcrypt."""
         return pwd_context.hash(password)
 
+    @timed(DB_QUERY_SECONDS)
     def create_user(self, user_data: UserCreate) -> User | None:
         """
         Create a new user.
@@ -58,6 +63,7 @@ class UserRepositoryDB(AbstractUserRepository):
             self.db_session.rollback()
             return None
 
+    @timed(DB_QUERY_SECONDS)
     def get_user_by_id(self, user_id: int) -> User | None:
         """
         Get user by ID.
@@ -70,6 +76,23 @@ class UserRepositoryDB(AbstractUserRepository):
         """
         return self.db_session.query(User).filter(User.id == user_id).first()
 
+    @timed(DB_QUERY_SECONDS)
+    def get_users_by_ids(self, user_ids: Iterable[int]) -> list[User]:
+        """
+        Get several users by ID in one query.
+
+        Args:
+            user_ids: User IDs
+
+        Returns:
+            Found users in no particular order, unknown IDs are skipped
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return []
+        return self.db_session.query(User).filter(User.id.in_(user_ids)).all()
+
+    @timed(DB_QUERY_SECONDS)
     def get_user_by_username(self, username: str) -> User | None:
         """
         Get user by username.
@@ -82,6 +105,7 @@ class UserRepositoryDB(AbstractUserRepository):
         """
         return self.db_session.query(User).filter(User.username == username).first()
 
+    @timed(DB_QUERY_SECONDS)
     def get_user_by_email(self, email: str) -> User | None:
         """
         Get user by email.
@@ -94,6 +118,7 @@ class UserRepositoryDB(AbstractUserRepository):
         """
         return self.db_session.query(User).filter(User.email == email).first()
 
+    @timed(DB_QUERY_SECONDS)
     def list_users(self) -> list[User]:
         """
         Get list of all users.
@@ -103,6 +128,45 @@ class UserRepositoryDB(AbstractUserRepository):
         """
         return self.db_session.query(User).all()
 
+    @timed(DB_QUERY_SECONDS)
+    def get_users_version(self) -> str:
+        """
+        Get a version of the users table.
+
+        Users are only ever inserted, so the highest id changes on every
+        registration. It is read with a single probe of the primary key
+        index, so the cost does not grow with the table.
+
+        Returns:
+            Highest user id as a string, ``"0"`` for an empty table
+        """
+        max_id = self.db_session.query(func.max(User.id)).scalar()
+        return str(max_id or 0)
+
+    def get_block_version(self, user_id: int) -> str:
+        """
+        Get a version of the blocks a user takes part in.
+
+        Block ids only grow, so once a block is removed its id never comes
+        back: any later set of blocks with the same count and highest id is
+        the same set. Both are read in one aggregate query.
+
+        Args:
+            user_id: ID of the user as blocker or blocked
+
+        Returns:
+            Version string in the form ``"<count>-<max id>"``
+        """
+        count, max_id = (
+            self.db_session.query(func.count(UserBlock.id), func.max(UserBlock.id))
+            .filter(
+                or_(UserBlock.blocker_id == user_id, UserBlock.blocked_id == user_id)
+            )
+            .one()
+        )
+        return f"{count}-{max_id or 0}"
+
+    @timed(DB_QUERY_SECONDS)
     def block_user(self, blocker_id: int, blocked_id: int) -> None:
         """
         Block a user.
@@ -142,6 +206,7 @@ class UserRepositoryDB(AbstractUserRepository):
         except Exception:
             self.db_session.rollback()
 
+    @timed(DB_QUERY_SECONDS)
     def unblock_user(self, blocker_id: int, blocked_id: int) -> None:
         """
         Unblock a user.
@@ -168,69 +233,40 @@ class UserRepositoryDB(AbstractUserRepository):
         except Exception:
             self.db_session.rollback()
 
-    def is_blocked(self, user1_id: int, user2_id: int) -> bool:
+    @timed(DB_QUERY_SECONDS)
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
         """
-        Check if two users are blocked.
+        Get the blocks between two users in both directions in one query.
 
-        Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
-
-        Returns:
-            True if either user has blocked the other
-        """
-        # Проверяем блокировку в обе стороны
-        block_exists = (
-            self.db_session.query(UserBlock)
-            .filter(
-                (
-                    (UserBlock.blocker_id == user1_id)
-                    & (UserBlock.blocked_id == user2_id)
-                )
-                | (
-                    (UserBlock.blocker_id == user2_id)
-                    & (UserBlock.blocked_id == user1_id)
-                )
-            )
-            .first()
-        )
-
-        return block_exists is not None
-
-    def who_blocked_whom(self, user1_id: int, user2_id: int) -> tuple[int, int] | None:
-        """
-        Check who blocked whom between two users.
+        Both directions are exact matches, served by the unique
+        (blocker_id, blocked_id) index.
 
         Args:
-            user1_id: ID of the first user
-            user2_id: ID of the second user
+            user_id: ID of the user the relation is seen from
+            other_user_id: ID of the other user
 
         Returns:
-            Tuple (blocker_id, blocked_id) if there's a block, None otherwise
+            Which of the users blocked the other
         """
-        # Check if user1 blocked user2
-        block = (
-            self.db_session.query(UserBlock)
-            .filter(
-                (UserBlock.blocker_id == user1_id) & (UserBlock.blocked_id == user2_id)
-            )
-            .first()
-        )
-        if block:
-            return (user1_id, user2_id)
-
-        # Check if user2 blocked user1
-        block = (
-            self.db_session.query(UserBlock)
-            .filter(
-                (UserBlock.blocker_id == user2_id) & (UserBlock.blocked_id == user1_id)
+        blocker_ids = {
+            blocker_id
+            for (blocker_id,) in self.db_session.query(UserBlock.blocker_id).filter(
+                or_(
+                    and_(
+                        UserBlock.blocker_id == user_id,
+                        UserBlock.blocked_id == other_user_id,
+                    ),
+                    and_(
+                        UserBlock.blocker_id == other_user_id,
+                        UserBlock.blocked_id == user_id,
+                    ),
+                )
             )
-            .first()
+        }
+        return BlockRelation(
+            blocks_other=user_id in blocker_ids,
+            blocked_by_other=other_user_id in blocker_ids,
         )
-        if block:
-            return (user2_id, user1_id)
-
-        return None
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """
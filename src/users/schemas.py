@@ -19,3 +19,19 @@ class UserRead(UserBase):
 class UserLogin(BaseModel):
     username: str
     password: str
+
+
+class BlockRelation(BaseModel):
+    """Blocks between a user and another user, seen from the first one."""
+
+    # The user blocked the other one
+    blocks_other: bool = False
+    # The other user blocked this one
+    blocked_by_other: bool = False
+
+    model_config = {"frozen": True}
+
+    @property
+    def is_blocked(self) -> bool:
+        """Whether either user blocked the other."""
+        return self.blocks_other or self.blocked_by_other
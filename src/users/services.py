@@ -1,7 +1,8 @@
 """User service for business logic operations."""
 
+from src.users.loader import UserLoader
 from src.users.repositories.abs.user import AbstractUserRepository
-from src.users.schemas import UserCreate, UserRead
+from src.users.schemas import BlockRelation, UserCreate, UserRead
 
 
 class UserService:
@@ -47,6 +48,15 @@ class UserService:
             return None
         return UserRead(id=user.id, username=user.username, email=user.email)
 
+    def create_loader(self) -> UserLoader:
+        """
+        Create a loader batching user lookups of one request.
+
+        Returns:
+            Empty loader over this service's repository
+        """
+        return UserLoader(self.repo)
+
     def list_users(self) -> list[UserRead]:
         """
         Get list of all users.
@@ -60,6 +70,27 @@ class UserService:
             users.append(user_read)
         return users
 
+    def get_users_version(self) -> str:
+        """
+        Get a version of the user list for conditional requests.
+
+        Returns:
+            Opaque string that changes whenever a user is registered
+        """
+        return self.repo.get_users_version()
+
+    def get_block_version(self, user_id: int) -> str:
+        """
+        Get a version of the blocks a user takes part in.
+
+        Args:
+            user_id: ID of the user as blocker or blocked
+
+        Returns:
+            Opaque string that changes whenever such a block changes
+        """
+        return self.repo.get_block_version(user_id)
+
     def block_user(self, blocker_id: int, blocked_id: int) -> None:
         """
         Block a user.
@@ -80,6 +111,19 @@ class UserService:
         """
         self.repo.unblock_user(blocker_id, blocked_id)
 
+    def get_block_relation(self, user_id: int, other_user_id: int) -> BlockRelation:
+        """
+        Get the blocks between two users in both directions with one lookup.
+
+        Args:
+            user_id: ID of the user the relation is seen from
+            other_user_id: ID of the other user
+
+        Returns:
+            Which of the users blocked the other
+        """
+        return self.repo.get_block_relation(user_id, other_user_id)
+
     def is_blocked(self, user1_id: int, user2_id: int) -> bool:
         """
         Check if two users are blocked.
@@ -1,14 +1,38 @@
 """WebSocket chat routes and HTML chat interface."""
 
 import json
-from fastapi import APIRouter, Depends, Request, WebSocket, WebSocketDisconnect
-from fastapi.responses import RedirectResponse
-
+import time
+import zlib
+from collections.abc import AsyncIterator
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import RedirectResponse, StreamingResponse
+
+from src.chat.compression import compression_stats
+from src.chat.ingress import IngressGuard, IngressRejected
 from src.chat.ws_service import ChatWebSocketService
 from src.config import settings
-from src.dependencies import get_chat_service, get_user_service
+from src.db.session import log_query_stats, track_queries
+from src.dependencies import (
+    get_chat_service,
+    get_ingress_guard,
+    get_user_loader,
+    get_user_service,
+)
+from src.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from src.logger import websocket_logger
-from src.templates_engine import templates
+from src.metrics import WS_MESSAGE_SECONDS
+from src.templates_engine import fragment_cache, render_fragment, templates
+from src.users.auth import read_session_token
+from src.users.loader import UserLoader
 from src.users.services import UserService
 
 router = APIRouter()
@@ -16,7 +40,8 @@ router = APIRouter()
 
 def get_current_user(request: Request) -> int | None:
     """
-    Get current user ID from cookie. Returns None if not authenticated.
+    Get current user ID from the signed session cookie. Returns None if not
+    authenticated.
 
     Args:
         request: FastAPI request object
@@ -24,14 +49,8 @@ def get_current_user(request: Request) -> int | None:
     Returns:
         User ID as integer or None if not authenticated
     """
-    user_id = request.cookies.get(settings.session_cookie_name)
-    if not user_id:
-        return None
-    try:
-        return int(user_id)
-    except ValueError:
-        websocket_logger.warning(f"Invalid user_id in cookie: {user_id}")
-        return None
+    user = read_session_token(request.cookies.get(settings.session_cookie_name))
+    return user.id if user else None
 
 
 @router.get("/chat")
@@ -40,6 +59,7 @@ async def chat_page(
     current_user: int = Depends(get_current_user),
     user_service: UserService = Depends(get_user_service),
     chat_service: ChatWebSocketService = Depends(get_chat_service),
+    users: UserLoader = Depends(get_user_loader),
 ):
     """
     Chat page between current user and another user.
@@ -60,12 +80,14 @@ async def chat_page(
         return RedirectResponse("/users")
 
     chat_data = await _prepare_chat_data(
-        current_user, other_user_id, user_service, chat_service
+        current_user, other_user_id, user_service, chat_service, users
     )
 
-    # Debug: print chat data
-    websocket_logger.info(
-        f"Chat data for user {current_user} -> {other_user_id}: {chat_data}"
+    websocket_logger.debug(
+        "Chat page for user %s -> %s: %d messages",
+        current_user,
+        other_user_id,
+        len(chat_data["history"]),
     )
 
     return templates.TemplateResponse("chat.html", {"request": request, **chat_data})
@@ -76,43 +98,29 @@ async def _prepare_chat_data(
     other_user_id: int,
     user_service: UserService,
     chat_service: ChatWebSocketService,
+    users: UserLoader,
 ) -> dict:
     """Prepare data for chat page template."""
     history = await chat_service.get_history(current_user, other_user_id)
-    user_info = _get_user_info(current_user, other_user_id, user_service)
-    is_blocked = user_service.is_blocked(current_user, other_user_id)
-
-    # Check who blocked whom
-    block_info = user_service.who_blocked_whom(current_user, other_user_id)
-    is_blocker = False
-    is_blocked_user = False
-
-    if block_info:
-        blocker_id, blocked_id = block_info
-        is_blocker = blocker_id == current_user
-        is_blocked_user = blocked_id == current_user
-
-    # Get all users for sidebar - use simple dictionaries
-    db_users = user_service.repo.list_users()
-    users = []
-    blocked_ids = []
-    for u in db_users:
-        users.append(
-            {
-                "id": u.id,
-                "username": u.username,
-                "email": u.email,
-                "created_at": u.created_at,
-            }
-        )
-        if user_service.is_blocked(current_user, u.id):
-            blocked_ids.append(u.id)
-
-    # Get online users from chat service
-    online_users = chat_service.get_online_users()
+    # Both users in one query
+    users.prime(current_user, other_user_id)
+    user_info = _get_user_info(current_user, other_user_id, users)
+    # Both directions of the block in one lookup
+    relation = user_service.get_block_relation(current_user, other_user_id)
+
+    # Sidebar HTML depends only on the user list and who is online
+    users_sidebar = fragment_cache.get_or_render(
+        "users_sidebar",
+        (
+            current_user,
+            user_service.get_users_version(),
+            chat_service.get_presence_version(),
+        ),
+        lambda: _render_users_sidebar(current_user, user_service, chat_service),
+    )
 
     # Get current user object for detailed info
-    current_user_obj = user_service.repo.get_user_by_id(current_user)
+    current_user_obj = users.load(current_user)
 
     return {
         "other_user_id": other_user_id,
@@ -122,21 +130,37 @@ async def _prepare_chat_data(
         "username": user_info["username"],
         "other_username": user_info["other_username"],
         "email": current_user_obj.email if current_user_obj else "",
-        "is_blocked": is_blocked,
-        "is_blocker": is_blocker,
-        "is_blocked_user": is_blocked_user,
-        "users": users,
-        "blocked_ids": blocked_ids,
-        "online_users": online_users,
+        "is_blocked": relation.is_blocked,
+        "is_blocker": relation.blocks_other,
+        "is_blocked_user": relation.blocked_by_other,
+        "users_sidebar": users_sidebar,
     }
 
 
-def _get_user_info(
-    current_user: int, other_user_id: int, user_service: UserService
-) -> dict:
+def _render_users_sidebar(
+    current_user: int,
+    user_service: UserService,
+    chat_service: ChatWebSocketService,
+) -> str:
+    """Render the sidebar with all users and their online status."""
+    users = [
+        {"id": u.id, "username": u.username} for u in user_service.repo.list_users()
+    ]
+    return render_fragment(
+        "partials/users_sidebar.html",
+        {
+            "users": users,
+            "current_user_id": current_user,
+            "online_users": chat_service.get_online_users(),
+        },
+    )
+
+
+def _get_user_info(current_user: int, other_user_id: int, users: UserLoader) -> dict:
     """Get username information for both users."""
-    user_obj = user_service.repo.get_user_by_id(current_user)
-    other_user_obj = user_service.repo.get_user_by_id(other_user_id)
+    loaded = users.load_many((current_user, other_user_id))
+    user_obj = loaded[current_user]
+    other_user_obj = loaded[other_user_id]
 
     return {
         "username": user_obj.username if user_obj else f"id:{current_user}",
@@ -151,6 +175,7 @@ async def chat_ws(
     websocket: WebSocket,
     chat_service: ChatWebSocketService = Depends(get_chat_service),
     user_service: UserService = Depends(get_user_service),
+    ingress: IngressGuard = Depends(get_ingress_guard),
 ):
     """
     WebSocket route for message exchange between users.
@@ -163,7 +188,7 @@ async def chat_ws(
 
     # Accept connection only after successful authentication
     await websocket.accept()
-    websocket_logger.info(f"WebSocket connection accepted for user {user_id}")
+    websocket_logger.info("WebSocket connection accepted for user %s", user_id)
 
     # Get other user ID from query parameter
     other_user_id = websocket.query_params.get("other_user")
@@ -177,35 +202,54 @@ async def chat_ws(
         await websocket.close(code=4004, reason="Invalid other user ID")
         return
 
-    await chat_service.connect(user_id, websocket)
+    if not await chat_service.connect(user_id, websocket):
+        return
     websocket_logger.info(
-        f"WebSocket connection established: user {user_id} -> user {other_user_id}"
+        "WebSocket connection established: user %s -> user %s", user_id, other_user_id
     )
 
     try:
+        last_seq = _get_last_seq(websocket)
+        if last_seq is not None:
+            await chat_service.replay_missed_messages(
+                user_id, other_user_id, websocket, last_seq
+            )
         await _handle_websocket_messages(
-            websocket, user_id, other_user_id, chat_service, user_service
+            websocket, user_id, other_user_id, chat_service, user_service, ingress
         )
     except WebSocketDisconnect:
-        websocket_logger.info(f"WebSocket disconnected: user {user_id}")
+        websocket_logger.info("WebSocket disconnected: user %s", user_id)
     except Exception as e:
-        websocket_logger.error(f"WebSocket error for user {user_id}: {e}")
+        websocket_logger.error("WebSocket error for user %s: %s", user_id, e)
     finally:
         chat_service.disconnect(user_id, websocket)
+        if user_id not in chat_service.active_connections:
+            ingress.forget(user_id)
+
+
+def _get_last_seq(websocket: WebSocket) -> int | None:
+    """Get the last seen sequence number the client resumes from, if any."""
+    try:
+        return max(int(websocket.query_params["last_seq"]), 0)
+    except (KeyError, ValueError):
+        return None
 
 
 async def _authenticate_websocket_user(websocket: WebSocket) -> int | None:
-    """Authenticate WebSocket user from query parameters."""
-    user_id = websocket.query_params.get("user_id")
-    if not user_id:
+    """
+    Authenticate WebSocket user from the signed session cookie.
+
+    The ``user_id`` query parameter, if sent, must name the same user.
+    """
+    user = read_session_token(websocket.cookies.get(settings.session_cookie_name))
+    if user is None:
         await websocket.close(code=4001, reason="Authentication required")
         return None
 
-    try:
-        return int(user_id)
-    except ValueError:
+    if websocket.query_params.get("user_id") not in (None, str(user.id)):
         await websocket.close(code=4002, reason="Invalid user ID")
         return None
+    return user.id
 
 
 async def _handle_websocket_messages(
@@ -214,16 +258,42 @@ async def _handle_websocket_messages(
     other_user_id: int,
     chat_service: ChatWebSocketService,
     user_service: UserService,
+    ingress: IngressGuard,
 ) -> None:
     """Handle incoming WebSocket messages."""
     while True:
-        message = await websocket.receive_text()
-        if not message.strip():
+        frame = await websocket.receive()
+        received_at = time.perf_counter()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+
+        try:
+            events = await ingress.admit(user_id, frame)
+        except IngressRejected as e:
+            await _send_error_message(websocket, e.error_type, e.message)
             continue
 
-        await _process_message(
-            websocket, user_id, other_user_id, message, chat_service, user_service
-        )
+        # The sender is looked up once per frame, not once per message
+        users = user_service.create_loader()
+        with track_queries() as query_stats:
+            for event in events:
+                if event["type"] == "receipt":
+                    await chat_service.send_receipt(
+                        event["ids"], user_id, other_user_id
+                    )
+                    continue
+                await _process_message(
+                    websocket,
+                    user_id,
+                    other_user_id,
+                    event["message"],
+                    chat_service,
+                    user_service,
+                    client_id=event["client_id"],
+                    users=users,
+                )
+                WS_MESSAGE_SECONDS.observe(time.perf_counter() - received_at)
+        log_query_stats(f"WS message from user {user_id}", query_stats)
 
 
 async def _process_message(
@@ -233,54 +303,183 @@ async def _process_message(
     message: str,
     chat_service: ChatWebSocketService,
     user_service: UserService,
+    client_id: str | None = None,
+    users: UserLoader | None = None,
 ) -> None:
-    """Process a single WebSocket message."""
+    """Process a single WebSocket message and acknowledge it once persisted."""
     if user_service.is_blocked(user_id, other_user_id):
         await _send_error_message(
             websocket,
             "blocked",
             "Вы заблокированы этим пользователем или заблокировали его",
+            client_id,
         )
         return
 
-    success = await chat_service.send_personal_message(message, other_user_id, user_id)
-    if not success:
+    stored = await chat_service.send_personal_message(
+        message, other_user_id, user_id, client_id=client_id, users=users
+    )
+    if not stored:
         await _send_error_message(
-            websocket, "send_failed", "Не удалось отправить сообщение"
+            websocket, "send_failed", "Не удалось отправить сообщение", client_id
         )
+        return
+
+    if client_id:
+        ack = {
+            "type": "ack",
+            "client_id": client_id,
+            "id": stored["id"],
+            "seq": stored.get("seq"),
+            "timestamp": stored["timestamp"],
+        }
+        await websocket.send_text(json.dumps(ack))
 
 
 async def _send_error_message(
-    websocket: WebSocket, error_type: str, message: str
+    websocket: WebSocket, error_type: str, message: str, client_id: str | None = None
 ) -> None:
     """Send error message to WebSocket client."""
-    error_data = {"error": error_type, "message": message}
+    error_data = {"type": "error", "error": error_type, "message": message}
+    if client_id:
+        error_data["client_id"] = client_id
     await websocket.send_text(json.dumps(error_data))
 
 
 @router.get("/chat/history")
 async def get_chat_history(
     request: Request,
+    response: Response,
     current_user: int = Depends(get_current_user),
     chat_service: ChatWebSocketService = Depends(get_chat_service),
 ):
-    """Get chat history between current user and another user."""
+    """
+    Get chat history between current user and another user.
+
+    Returns the latest page, or the page of messages older than the ``before``
+    sequence number so clients can load older messages on scroll-up.
+    Answers 304 without reading the messages when the client's ETag matches
+    the conversation version.
+    """
     if not current_user:
-        return {"error": "Unauthorized"}, 401
+        raise HTTPException(status_code=401, detail="Not authenticated")
 
     # Get other user ID from query parameter
     other_user_id = request.query_params.get("user")
     if not other_user_id:
-        return {"error": "User ID required"}, 400
+        raise HTTPException(status_code=400, detail="User ID required")
 
     try:
         other_user_id = int(other_user_id)
-    except ValueError:
-        return {"error": "Invalid user ID"}, 400
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid user ID") from e
+
+    try:
+        before = _get_int_param(request, "before")
+        limit = _get_int_param(request, "limit")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail="Invalid pagination parameters"
+        ) from e
+    # Pages are never larger than the configured history limit
+    if limit is not None:
+        limit = min(limit, settings.chat_history_limit)
 
     try:
-        history = await chat_service.get_history(current_user, other_user_id)
+        version = await chat_service.get_history_version(current_user, other_user_id)
+        etag = make_etag("chat", current_user, other_user_id, version, before, limit)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        set_validators(response, etag)
+        history = await chat_service.get_history(
+            current_user, other_user_id, limit=limit, before=before
+        )
         return history
     except Exception as e:
-        websocket_logger.error(f"Error getting chat history: {e}")
-        return {"error": "Failed to load chat history"}, 500
+        websocket_logger.error("Error getting chat history: %s", e)
+        raise HTTPException(
+            status_code=500, detail="Failed to load chat history"
+        ) from e
+
+
+@router.get("/chat/export")
+async def export_chat(
+    user: int,
+    gzip: bool = False,
+    current_user: int = Depends(get_current_user),
+    chat_service: ChatWebSocketService = Depends(get_chat_service),
+):
+    """
+    Export the whole conversation with another user as NDJSON.
+
+    Messages are read from the store the chat service writes to, in the shape
+    clients receive them over the WebSocket. The history is read and written
+    in chunks, so memory use does not depend on the length of the
+    conversation. With ``gzip=true`` the stream is
+    compressed on the fly and downloaded as ``.ndjson.gz``.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    websocket_logger.info("Exporting chat %s-%s", current_user, user)
+    filename = f"chat-{min(current_user, user)}-{max(current_user, user)}.ndjson"
+    media_type = "application/x-ndjson"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        _export_chunks(chat_service, current_user, user, gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+async def _export_chunks(
+    chat_service: ChatWebSocketService,
+    user1_id: int,
+    user2_id: int,
+    compress: bool,
+) -> AsyncIterator[bytes]:
+    """Encode history chunks as NDJSON lines, gzip-compressed if requested."""
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    async for chunk in chat_service.iter_history(
+        user1_id, user2_id, settings.chat_export_chunk_size
+    ):
+        data = "".join(
+            json.dumps(message, ensure_ascii=False) + "\n" for message in chunk
+        ).encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def _get_int_param(request: Request, name: str) -> int | None:
+    """
+    Read an optional positive integer query parameter.
+
+    Raises:
+        ValueError: If the parameter is present but not a positive integer
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{name} must be positive")
+    return number
+
+
+@router.get("/ws/stats")
+def get_websocket_stats(
+    chat_service: ChatWebSocketService = Depends(get_chat_service),
+):
+    """Get WebSocket connection and compression counters for this node."""
+    return {
+        "connections": chat_service.get_connection_count(),
+        "compression": compression_stats.snapshot(),
+    }
@@ -6,36 +6,27 @@ from pydantic import ValidationError
 
 from src.config import settings
 from src.dependencies import get_user_service
+from src.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from src.logger import user_logger
-from src.templates_engine import templates
+from src.templates_engine import fragment_cache, render_fragment, templates
+from src.users.auth import get_session_user, set_session_cookie
 from src.users.schemas import UserRead
 from src.users.services import UserService
 
 router = APIRouter()
 
 
-def get_current_user(
-    request: Request, user_service: UserService = Depends(get_user_service)
-) -> UserRead | None:
+def get_current_user(request: Request) -> UserRead | None:
     """
-    Get current user from cookie. Returns None if not authenticated.
+    Get current user from the signed session cookie, without a database lookup.
 
     Args:
         request: FastAPI request object
-        user_service: User service dependency
 
     Returns:
         User object or None if not authenticated
     """
-    user_id = request.cookies.get(settings.session_cookie_name)
-    if not user_id:
-        return None
-
-    try:
-        return user_service.get_user(int(user_id))
-    except ValueError:
-        user_logger.warning(f"Invalid user_id in cookie: {user_id}")
-        return None
+    return get_session_user(request)
 
 
 @router.get("/users/register")
@@ -58,22 +49,22 @@ def register(
     try:
         user_data = UserCreate(username=username, email=email, password=password)
     except ValidationError:
-        user_logger.warning(f"Invalid registration data: {email}")
+        user_logger.warning("Invalid registration data: %s", email)
         return _render_register_error(request, "Введите корректный email.")
 
     try:
         result = user_service.register(user_data)
     except Exception as e:
-        user_logger.error(f"Registration error: {e}")
+        user_logger.error("Registration error: %s", e)
         return _render_register_error(request, f"Ошибка регистрации: {str(e)}")
 
     if result is None:
-        user_logger.warning(f"Registration failed for username: {username}")
+        user_logger.warning("Registration failed for username: %s", username)
         return _render_register_error(
             request, "Пользователь с таким именем уже существует."
         )
 
-    user_logger.info(f"User registered successfully: {username}")
+    user_logger.info("User registered successfully: %s", username)
     return RedirectResponse("/users/login", status_code=status.HTTP_302_FOUND)
 
 
@@ -101,17 +92,12 @@ def login(
     """Handle login form submission."""
     user_obj = user_service.login(username, password)
     if not user_obj:
-        user_logger.warning(f"Failed login attempt for username: {username}")
+        user_logger.warning("Failed login attempt for username: %s", username)
         return _render_login_error(request, "Неверные данные")
 
-    user_logger.info(f"User logged in successfully: {username} (ID: {user_obj.id})")
+    user_logger.info("User logged in successfully: %s (ID: %s)", username, user_obj.id)
     response = RedirectResponse("/users/", status_code=status.HTTP_302_FOUND)
-    response.set_cookie(
-        key=settings.session_cookie_name,
-        value=str(user_obj.id),
-        httponly=settings.session_cookie_httponly,
-        secure=settings.session_cookie_secure,
-    )
+    set_session_cookie(response, user_obj)
     return response
 
 
@@ -148,35 +134,50 @@ def users_page(
     if not current_user:
         return RedirectResponse("/users/login")
 
-    # Получаем пользователей напрямую из базы данных
-    db_users = user_service.repo.list_users()
-
-    # Создаем простые словари для шаблона
-    users_data = []
-    for user in db_users:
-        users_data.append(
-            {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "created_at": user.created_at,
-            }
-        )
-
-    # Получаем заблокированных пользователей
-    blocked_ids = []
-    for user in db_users:
-        if user_service.is_blocked(current_user.id, user.id):
-            blocked_ids.append(user.id)
+    # Список меняется только при регистрации и блокировках, поэтому готовый
+    # HTML кэшируется по версиям этих данных
+    key = (
+        current_user.id,
+        user_service.get_users_version(),
+        user_service.get_block_version(current_user.id),
+    )
+    users_list = fragment_cache.get_or_render(
+        "users_list",
+        key,
+        lambda: _render_users_list(current_user, user_service),
+    )
 
-    user_logger.info(f"User {current_user.username} accessed user list")
+    user_logger.info("User %s accessed user list", current_user.username)
     return templates.TemplateResponse(
         request,
         "users.html",
+        {
+            "users_list": users_list,
+            "current_user": {"id": current_user.id, "username": current_user.username},
+        },
+    )
+
+
+def _render_users_list(current_user: UserRead, user_service: UserService) -> str:
+    """Render the user list fragment with block marks for the current user."""
+    db_users = user_service.repo.list_users()
+    users_data = [
+        {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "created_at": user.created_at,
+        }
+        for user in db_users
+    ]
+    return render_fragment(
+        "partials/users_list.html",
         {
             "users": users_data,
             "current_user": {"id": current_user.id, "username": current_user.username},
-            "blocked_ids": blocked_ids,
+            "blocked_ids": _get_blocked_user_ids(
+                current_user.id, db_users, user_service
+            ),
         },
     )
 
@@ -208,7 +209,7 @@ def block_user(
         return RedirectResponse("/users/login")
 
     user_service.block_user(current_user.id, blocked_id)
-    user_logger.info(f"User {current_user.id} blocked user {blocked_id}")
+    user_logger.info("User %s blocked user %s", current_user.id, blocked_id)
 
     # Получаем параметр redirect_to из запроса
     redirect_to = request.query_params.get("redirect_to", "/users/")
@@ -227,7 +228,7 @@ def unblock_user(
         return RedirectResponse("/users/login")
 
     user_service.unblock_user(current_user.id, blocked_id)
-    user_logger.info(f"User {current_user.id} unblocked user {blocked_id}")
+    user_logger.info("User %s unblocked user %s", current_user.id, blocked_id)
 
     # Получаем параметр redirect_to из запроса
     redirect_to = request.query_params.get("redirect_to", "/users/")
@@ -249,35 +250,36 @@ def get_block_status(
     if not current_user:
         return {"error": "Not authenticated"}
 
-    is_blocked = user_service.is_blocked(current_user.id, user_id)
-
-    # Check who blocked whom
-    block_info = user_service.who_blocked_whom(current_user.id, user_id)
-    is_blocker = False
-    is_blocked_user = False
-
-    if block_info:
-        blocker_id, blocked_id = block_info
-        is_blocker = blocker_id == current_user.id
-        is_blocked_user = blocked_id == current_user.id
+    relation = user_service.get_block_relation(current_user.id, user_id)
 
     user_logger.info(
-        f"Block status check: user {current_user.id} -> user {user_id}: {is_blocked}"
+        "Block status check: user %s -> user %s: %s",
+        current_user.id,
+        user_id,
+        relation.is_blocked,
     )
 
     return {
-        "is_blocked": is_blocked,
-        "is_blocker": is_blocker,
-        "is_blocked_user": is_blocked_user,
+        "is_blocked": relation.is_blocked,
+        "is_blocker": relation.blocks_other,
+        "is_blocked_user": relation.blocked_by_other,
     }
 
 
 @router.get("/users/current")
-def get_current_user_info(current_user: UserRead = Depends(get_current_user)):
-    """Get current user information."""
+def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: UserRead = Depends(get_current_user),
+):
+    """Get current user information, answering 304 if it has not changed."""
     if not current_user:
         return {"error": "Not authenticated"}
 
+    etag = make_etag("user", current_user.id, current_user.username, current_user.email)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    set_validators(response, etag)
     return {
         "id": current_user.id,
         "username": current_user.username,
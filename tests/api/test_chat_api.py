@@ -1,9 +1,14 @@
 """Tests for chat API endpoints."""
 
+import gzip
+import json
+
 import pytest
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
 
-from tests.conftest import create_and_login_user
+from src.config import settings
+from tests.conftest import create_and_login_user, session_cookie
 
 
 class TestChatAPI:
@@ -83,3 +88,160 @@ class TestChatAPI:
         response = client.get("/ws/")
         # WebSocket endpoints typically return 426 or similar for HTTP requests
         assert response.status_code in [426, 400, 404]  # Depends on implementation
+
+    @pytest.mark.api
+    @pytest.mark.parametrize(
+        ("cookies", "query", "code"),
+        [
+            ({}, "user_id=1", 4001),
+            ({settings.session_cookie_name: "1"}, "user_id=1", 4001),
+            (session_cookie(1), "user_id=2", 4002),
+        ],
+    )
+    def test_chat_websocket_requires_signed_session(
+        self, client: TestClient, cookies, query, code
+    ):
+        """Test that the handshake trusts only the signed session cookie."""
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            with client.websocket_connect(
+                f"/ws/chat?{query}&other_user=3", cookies=cookies
+            ) as websocket:
+                websocket.receive_json()
+
+        assert exc_info.value.code == code
+
+    @pytest.mark.api
+    def test_chat_websocket_rejects_long_message(self, client: TestClient):
+        """Test that oversized messages get a typed error frame."""
+        url = "/ws/chat?user_id=1&other_user=2"
+        with client.websocket_connect(url, cookies=session_cookie(1)) as websocket:
+            websocket.send_text("x" * 5000)
+            data = websocket.receive_json()
+
+        assert data["type"] == "error"
+        assert data["error"] == "message_too_long"
+
+    @pytest.mark.api
+    def test_chat_websocket_ack_and_receipt(self, client: TestClient):
+        """Test that a persisted message is acked and receipts reach the sender."""
+        with client.websocket_connect(
+            "/ws/chat?user_id=1&other_user=2", cookies=session_cookie(1)
+        ) as sender, client.websocket_connect(
+            "/ws/chat?user_id=2&other_user=1", cookies=session_cookie(2)
+        ) as recipient:
+            sender.send_json({"type": "message", "message": "hi", "client_id": "c1"})
+
+            ack = sender.receive_json()
+            assert ack["type"] == "ack"
+            assert ack["client_id"] == "c1"
+
+            delivered = recipient.receive_json()
+            assert delivered["id"] == ack["id"]
+            assert delivered["client_id"] == "c1"
+            assert delivered["message"] == "hi"
+
+            echo = sender.receive_json()
+            assert echo["id"] == ack["id"]
+
+            recipient.send_json({"type": "receipt", "ids": [ack["id"]]})
+            receipt = sender.receive_json()
+
+        assert receipt == {"type": "receipt", "ids": [ack["id"]], "by": 2}
+
+    @pytest.mark.api
+    def test_chat_websocket_resume_from_last_seq(self, client: TestClient):
+        """Test that reconnecting with last_seq replays only missed messages."""
+        client.cookies.update(session_cookie(1))
+        with client.websocket_connect("/ws/chat?user_id=1&other_user=2") as ws:
+            for text in ("one", "two", "three"):
+                ws.send_json({"message": text, "client_id": text})
+                ws.receive_json()  # ack
+                ws.receive_json()  # echo
+
+        with client.websocket_connect(
+            "/ws/chat?user_id=1&other_user=2&last_seq=1"
+        ) as ws:
+            replay = ws.receive_json()
+
+        assert replay["type"] == "replay"
+        assert [m["message"] for m in replay["messages"]] == ["two", "three"]
+        assert replay["latest_seq"] == 3
+        assert replay["gap"] is False
+
+    @pytest.mark.api
+    def test_chat_history_conditional_get(self, client: TestClient):
+        """Test that history answers 304 until a new message arrives."""
+        client.cookies.update(session_cookie(1))
+        with client.websocket_connect("/ws/chat?user_id=1&other_user=2") as ws:
+            ws.send_text("first")
+            ws.receive_json()
+
+            response = client.get("/chat/history?user=2")
+            etag = response.headers["etag"]
+            assert response.status_code == 200
+            assert response.headers["cache-control"] == "private, no-cache"
+
+            cached = client.get("/chat/history?user=2", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+
+            ws.send_text("second")
+            ws.receive_json()
+
+        changed = client.get("/chat/history?user=2", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert [m["message"] for m in changed.json()] == ["first", "second"]
+
+    @pytest.mark.api
+    @pytest.mark.parametrize(
+        "query", ["", "?user=x", "?user=2&before=0", "?user=2&limit=abc"]
+    )
+    def test_chat_history_rejects_invalid_parameters(self, client: TestClient, query):
+        """Test that invalid history parameters are answered with 400."""
+        client.cookies.update(session_cookie(1))
+
+        response = client.get(f"/chat/history{query}")
+
+        assert response.status_code == 400
+        assert "detail" in response.json()
+
+    @pytest.mark.api
+    def test_chat_history_unauthenticated(self, client: TestClient):
+        """Test that history requires a logged in user."""
+        assert client.get("/chat/history?user=2").status_code == 401
+
+    @pytest.mark.api
+    @pytest.mark.parametrize("compressed", [False, True])
+    def test_chat_export_streams_ndjson(
+        self, client: TestClient, monkeypatch, compressed
+    ):
+        """Test that the export walks messages sent over the WebSocket in chunks."""
+        monkeypatch.setattr(settings, "chat_export_chunk_size", 2)
+        client.cookies.update(session_cookie(1))
+        with client.websocket_connect("/ws/chat?user_id=1&other_user=2") as ws:
+            for text in ("один", "two", "three"):
+                ws.send_text(text)
+                ws.receive_json()
+        client.cookies.update(session_cookie(2))
+
+        response = client.get(f"/chat/export?user=1&gzip={str(compressed).lower()}")
+
+        assert response.status_code == 200
+        body = response.content
+        if compressed:
+            assert response.headers["content-type"] == "application/gzip"
+            body = gzip.decompress(body)
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        assert [(m["seq"], m["from"], m["message"]) for m in lines] == [
+            (1, 1, "один"),
+            (2, 1, "two"),
+            (3, 1, "three"),
+        ]
+        assert all(m["id"] and m["type"] == "message" for m in lines)
+
+    @pytest.mark.api
+    def test_chat_export_unauthenticated(self, client: TestClient):
+        """Test that the export requires a logged in user."""
+        response = client.get("/chat/export?user=1")
+        assert response.status_code == 401
@@ -0,0 +1,72 @@
+"""Tests for the metrics endpoint and metric types."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.chat.inmem_redis import InMemoryRedis
+from src.metrics import Histogram, TimedRedis
+from tests.conftest import session_cookie
+
+
+class TestMetricsAPI:
+    """Test metrics collection and exposition."""
+
+    @pytest.mark.api
+    def test_metrics_endpoint_exposes_chat_and_http_metrics(self, client: TestClient):
+        """Test that chat traffic and HTTP requests show up in /metrics."""
+        client.cookies.update(session_cookie(1))
+        with client.websocket_connect("/ws/chat?user_id=1&other_user=2") as ws:
+            ws.send_text("hello")
+            ws.receive_json()
+        client.get("/ping")
+
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert "# TYPE chat_ws_message_duration_seconds histogram" in body
+        assert "chat_ws_fanout_sessions_count" in body
+        assert 'chat_redis_command_duration_seconds_count{command="pipeline"}' in body
+        assert 'route="/ping",status="200"' in body
+        assert "chat_ws_compression_frames_total" in body
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test that bucket counts are cumulative and include +Inf."""
+        histogram = Histogram("test_seconds", "Test.", buckets=(0.1, 1), registry=[])
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value)
+
+        assert histogram.render()[2:] == [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            "test_seconds_sum 4.05",
+            "test_seconds_count 4",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_timed_redis_observes_commands(self):
+        """Test that the Redis proxy times commands and passes results through."""
+        histogram = Histogram("redis_seconds", "Test.", ("command",), registry=[])
+        client = TimedRedis(InMemoryRedis(), histogram)
+
+        assert await client.rpush("key", "a") == 1
+        assert await client.llen("key") == 1
+
+        assert sum(histogram.labels("rpush").counts) == 1
+        assert sum(histogram.labels("llen").counts) == 1
+
+    @pytest.mark.asyncio
+    async def test_timed_redis_observes_pipeline_as_one_command(self):
+        """Test that a pipeline round trip is timed once, not per command."""
+        histogram = Histogram("redis_seconds", "Test.", ("command",), registry=[])
+        client = TimedRedis(InMemoryRedis(), histogram)
+
+        pipe = client.pipeline(transaction=True)
+        pipe.rpush("key", "a")
+        pipe.incr("counter")
+
+        assert await pipe.execute() == [1, 1]
+        assert sum(histogram.labels("pipeline").counts) == 1
+        assert sum(histogram.labels("rpush").counts) == 0
@@ -96,3 +96,56 @@ class TestPagesAPI:
         """Test 404 page for non-existent routes."""
         response = client.get("/nonexistent-page")
         assert response.status_code == 404
+
+    @pytest.mark.api
+    def test_cache_header_policies(self, client: TestClient):
+        """Test that cache headers follow the route pattern policies."""
+        page = client.get("/users/login")
+        assert page.headers["cache-control"] == "no-cache, no-store, must-revalidate"
+        assert page.headers["pragma"] == "no-cache"
+        assert "app;dur=" in page.headers["server-timing"]
+
+        static = client.get("/static/css/main.css")
+        assert static.headers["cache-control"] == "no-cache"
+        assert "pragma" not in static.headers
+        revalidated = client.get(
+            "/static/css/main.css", headers={"If-None-Match": static.headers["etag"]}
+        )
+        assert revalidated.status_code == 304
+
+        ping = client.get("/ping")
+        assert "cache-control" not in ping.headers
+
+    @pytest.mark.api
+    def test_users_list_fragment_cache(self, client: TestClient):
+        """Test that the cached user list follows registrations and blocks."""
+        from src.metrics import TEMPLATE_FRAGMENT_CACHE
+
+        cookies = create_and_login_user(
+            client, "fragowner", "fragowner@example.com", "password123"
+        )
+        client.cookies.update(cookies)
+        hits = TEMPLATE_FRAGMENT_CACHE.labels("users_list", "hit")
+
+        first = client.get("/users/")
+        before = hits.value
+        second = client.get("/users/")
+        assert hits.value == before + 1
+        assert second.text == first.text
+
+        other = client.post(
+            "/api/v1/users/register",
+            json={
+                "username": "fragother",
+                "email": "fragother@example.com",
+                "password": "password123",
+            },
+        ).json()
+        client.cookies.update(cookies)
+        page = client.get("/users/")
+        assert "fragother" in page.text
+        assert "Заблокирован" not in page.text
+
+        assert client.post(f"/api/v1/users/block/{other['id']}").status_code == 200
+        page = client.get("/users/")
+        assert "Заблокирован" in page.text
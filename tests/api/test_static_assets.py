@@ -0,0 +1,134 @@
+"""Tests for fingerprinted, precompressed static assets."""
+
+import gzip
+import shutil
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import src.assets
+from src.assets import (
+    IMMUTABLE_CACHE_CONTROL,
+    PrecompressedStaticFiles,
+    accepted_encodings,
+    asset_url,
+    build_assets,
+)
+from src.main import HEADER_POLICIES
+from src.middleware import HeaderPolicyMiddleware
+
+
+@pytest.fixture
+def built_static(tmp_path):
+    """Copy of the static directory with assets built into it."""
+    static_dir = tmp_path / "static"
+    shutil.copytree(
+        src.assets.STATIC_DIR, static_dir, ignore=shutil.ignore_patterns("dist")
+    )
+    manifest = build_assets(static_dir)
+    return static_dir, manifest
+
+
+@pytest.fixture
+def static_client(built_static) -> TestClient:
+    """Client serving the built static directory."""
+    static_dir, _ = built_static
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)))
+    with TestClient(app) as client:
+        yield client
+
+
+class TestStaticAssets:
+    """Test the asset pipeline and the static handler."""
+
+    def test_build_fingerprints_and_compresses(self, built_static):
+        """Test that assets get content hashes and gzip variants."""
+        static_dir, manifest = built_static
+
+        fingerprinted = manifest["js/chat.js"]
+        assert fingerprinted.startswith("dist/js/chat.")
+        assert (static_dir / fingerprinted).read_bytes() == (
+            static_dir / "js/chat.js"
+        ).read_bytes()
+        assert (
+            gzip.decompress((static_dir / (fingerprinted + ".gz")).read_bytes())
+            == (static_dir / "js/chat.js").read_bytes()
+        )
+
+    def test_serves_precompressed_variant_as_immutable(
+        self, built_static, static_client: TestClient
+    ):
+        """Test that gzip clients get the precompressed file."""
+        static_dir, manifest = built_static
+        url = "/static/" + manifest["css/main.css"]
+
+        response = static_client.get(url, headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/css")
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.content == (static_dir / "css/main.css").read_bytes()
+
+    def test_refused_encoding_gets_plain_file(
+        self, built_static, static_client: TestClient
+    ):
+        """Test that an encoding with q=0 is not served."""
+        static_dir, manifest = built_static
+        url = "/static/" + manifest["css/main.css"]
+
+        response = static_client.get(url, headers={"Accept-Encoding": "gzip;q=0"})
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.content == (static_dir / "css/main.css").read_bytes()
+
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ("", set()),
+            ("gzip, deflate, br", {"br", "gzip"}),
+            ("br;q=0, gzip;q=0.5", {"gzip"}),
+            ("GZIP; Q=0.0", set()),
+            ("*", {"br", "gzip"}),
+            ("*;q=0.1, br;q=0", {"gzip"}),
+            ("gzip;q=oops", set()),
+            ("gzipped, xbr", set()),
+        ],
+    )
+    def test_accepted_encodings(self, header, expected):
+        """Test that Accept-Encoding is parsed into tokens with weights."""
+        assert accepted_encodings(header) == expected
+
+    def test_header_policies_keep_immutable_for_fingerprints(self, built_static):
+        """Test that only fingerprinted files escape the no-cache policy."""
+        static_dir, manifest = built_static
+        app = FastAPI()
+        app.add_middleware(HeaderPolicyMiddleware, policies=HEADER_POLICIES)
+        app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)))
+
+        with TestClient(app) as client:
+            hashed = client.get("/static/" + manifest["js/chat.js"])
+            plain = client.get("/static/js/chat.js")
+
+        assert hashed.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert plain.headers["cache-control"] == "no-cache"
+
+    def test_plain_path_is_not_immutable(self, static_client: TestClient):
+        """Test that unversioned URLs keep the default caching."""
+        response = static_client.get("/static/css/main.css")
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert "cache-control" not in response.headers
+
+    def test_asset_url_uses_manifest(self, monkeypatch):
+        """Test that templates get fingerprinted URLs when assets are built."""
+        monkeypatch.setattr(
+            src.assets, "_manifest", {"js/chat.js": "dist/js/chat.0123456789.js"}
+        )
+
+        assert asset_url("js/chat.js") == "/static/dist/js/chat.0123456789.js"
+        assert asset_url("img/logo.png") == "/static/img/logo.png"
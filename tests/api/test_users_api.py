@@ -122,6 +122,27 @@ class TestUsersAPI:
         data = response.json()
         assert isinstance(data, list)
 
+    @pytest.mark.api
+    def test_list_users_conditional_get(self, client: TestClient):
+        """Test that the user list answers 304 until a user registers."""
+        response = client.get("/api/v1/users/")
+        etag = response.headers["etag"]
+
+        cached = client.get("/api/v1/users/", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+
+        client.post(
+            "/api/v1/users/register",
+            json={
+                "username": "etaguser",
+                "email": "etag@example.com",
+                "password": "password123",
+            },
+        )
+        changed = client.get("/api/v1/users/", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
     @pytest.mark.api
     def test_block_user_success(self, client: TestClient):
         """Test successful user blocking via API."""
@@ -0,0 +1,122 @@
+"""
+Conformance tests every chat repository backend must pass.
+
+Backends run against the in-memory Redis substitute by default. Set
+``TEST_REDIS_URL`` (a disposable database, it is flushed) to also run the
+Redis backend against a real server.
+"""
+
+import os
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+
+from src.chat.inmem_redis import InMemoryRedis
+from src.chat.repositories.abs.chat import AbstractChatRepository
+from src.chat.repositories.db.chat import ChatRepositoryDB
+from src.chat.repositories.inmem.chat import ChatRepositoryInMemory
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+
+@pytest_asyncio.fixture(
+    params=[
+        "inmem",
+        "redis-inmem",
+        pytest.param(
+            "redis",
+            marks=pytest.mark.skipif(
+                not TEST_REDIS_URL, reason="TEST_REDIS_URL is not set"
+            ),
+        ),
+    ]
+)
+async def repo(request) -> AbstractChatRepository:
+    """Chat repository of every backend, empty."""
+    if request.param == "inmem":
+        yield ChatRepositoryInMemory()
+    elif request.param == "redis-inmem":
+        yield ChatRepositoryDB("redis://unused", redis_client=InMemoryRedis())
+    else:
+        client = redis.from_url(TEST_REDIS_URL, decode_responses=True)
+        await client.flushdb()
+        repository = ChatRepositoryDB(TEST_REDIS_URL, redis_client=client)
+        yield repository
+        await client.flushdb()
+        await repository.close()
+
+
+async def save_messages(repo, count: int, from_user=1, to_user=2) -> None:
+    """Save numbered messages between two users."""
+    for index in range(1, count + 1):
+        await repo.save_message(from_user, to_user, f"m{index}")
+
+
+class TestChatRepositoryConformance:
+    """Behavior shared by all chat repository backends."""
+
+    @pytest.mark.asyncio
+    async def test_message_shape(self, repo):
+        """Test that messages have the same fields in every backend."""
+        await repo.save_message(1, 2, "hello")
+
+        [message] = await repo.get_history(1, 2)
+
+        assert set(message) == {"from", "to", "message", "timestamp", "seq"}
+        assert [message[key] for key in ("from", "to", "message")] == [1, 2, "hello"]
+        assert message["seq"] == 1
+        datetime.fromisoformat(message["timestamp"])
+
+    @pytest.mark.asyncio
+    async def test_conversation_is_symmetric_and_isolated(self, repo):
+        """Test that both users see one conversation, others see nothing."""
+        await repo.save_message(1, 2, "a")
+        await repo.save_message(2, 1, "b")
+        await repo.save_message(1, 3, "c")
+
+        assert [m["message"] for m in await repo.get_history(2, 1)] == ["a", "b"]
+        assert [m["message"] for m in await repo.get_history(3, 1)] == ["c"]
+        assert await repo.get_history(2, 3) == []
+
+    @pytest.mark.asyncio
+    async def test_limit_returns_latest_messages(self, repo):
+        """Test that a limited page holds the newest messages, oldest first."""
+        await save_messages(repo, 5)
+
+        page = await repo.get_history(1, 2, limit=2)
+
+        assert [(m["seq"], m["message"]) for m in page] == [(4, "m4"), (5, "m5")]
+
+    @pytest.mark.asyncio
+    async def test_before_cursor_pages_backwards(self, repo):
+        """Test that the before cursor walks the history without overlap."""
+        await save_messages(repo, 5)
+
+        seen = []
+        before = None
+        while page := await repo.get_history(1, 2, limit=2, before=before):
+            seen = [m["seq"] for m in page] + seen
+            before = page[0]["seq"]
+
+        assert seen == [1, 2, 3, 4, 5]
+        assert await repo.get_history(1, 2, before=100) == await repo.get_history(1, 2)
+
+    @pytest.mark.asyncio
+    async def test_iter_history_yields_all_chunks(self, repo):
+        """Test that chunks cover the conversation in order."""
+        await save_messages(repo, 7)
+
+        chunks = [chunk async for chunk in repo.iter_history(2, 1, chunk_size=3)]
+
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        messages = [m for chunk in chunks for m in chunk]
+        assert [m["seq"] for m in messages] == list(range(1, 8))
+        assert messages == await repo.get_history(1, 2, limit=100)
+
+    @pytest.mark.asyncio
+    async def test_empty_conversation(self, repo):
+        """Test that an unknown conversation is empty everywhere."""
+        assert await repo.get_history(1, 2) == []
+        assert [chunk async for chunk in repo.iter_history(1, 2)] == []
@@ -0,0 +1,57 @@
+"""Tests for thresholded per-message deflate."""
+
+import zlib
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import Frame, Opcode
+
+from src.chat.compression import CompressionStats, ThresholdPerMessageDeflate
+
+
+def make_extension(stats: CompressionStats) -> ThresholdPerMessageDeflate:
+    """Wrap a negotiated deflate extension with a 64-byte threshold."""
+    deflate = PerMessageDeflate(
+        remote_no_context_takeover=False,
+        local_no_context_takeover=False,
+        remote_max_window_bits=15,
+        local_max_window_bits=15,
+    )
+    return ThresholdPerMessageDeflate(deflate, min_size=64, stats=stats)
+
+
+class TestThresholdPerMessageDeflate:
+    """Test compression threshold and counters."""
+
+    def test_small_frame_sent_uncompressed(self):
+        """Test that frames below the threshold keep RSV1 unset."""
+        stats = CompressionStats()
+        frame = Frame(Opcode.TEXT, b'{"message": "hi"}')
+
+        encoded = make_extension(stats).encode(frame)
+
+        assert encoded is frame
+        assert stats.frames_skipped == 1
+        assert stats.bytes_skipped == len(frame.data)
+
+    def test_large_frame_compressed(self):
+        """Test that frames above the threshold are deflated and counted."""
+        stats = CompressionStats()
+        data = b'{"from": 1, "from_username": "alice", "message": "hi"}' * 20
+
+        encoded = make_extension(stats).encode(Frame(Opcode.TEXT, data))
+
+        assert encoded.rsv1
+        decoder = zlib.decompressobj(wbits=-15)
+        assert decoder.decompress(encoded.data + b"\x00\x00\xff\xff") == data
+        snapshot = stats.snapshot()
+        assert snapshot["frames_compressed"] == 1
+        assert snapshot["bytes_before_compression"] == len(data)
+        assert snapshot["compression_ratio"] < 0.2
+
+    def test_control_frames_untouched(self):
+        """Test that control frames bypass the extension and counters."""
+        stats = CompressionStats()
+        frame = Frame(Opcode.PING, b"x" * 100)
+
+        assert make_extension(stats).encode(frame) is frame
+        assert stats.frames_skipped == 0
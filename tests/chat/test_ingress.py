@@ -0,0 +1,159 @@
+"""Tests for the WebSocket ingress guard."""
+
+import json
+
+import pytest
+
+from src.chat.ingress import IngressGuard, IngressRejected
+
+SERVER_ID_A = "0123456789abcdef0123456789abcdef"
+SERVER_ID_B = "fedcba9876543210fedcba9876543210"
+
+
+@pytest.fixture
+def guard() -> IngressGuard:
+    """Guard with small limits."""
+    return IngressGuard(
+        max_frame_bytes=64,
+        max_message_length=20,
+        max_batch_size=5,
+        rate_per_second=1,
+        burst=2,
+    )
+
+
+def text_frame(text: str) -> dict:
+    """Build an ASGI text frame."""
+    return {"type": "websocket.receive", "text": text}
+
+
+def texts(events: list[dict]) -> list[str]:
+    """Extract message texts from admitted events."""
+    return [event["message"] for event in events]
+
+
+class TestIngressGuard:
+    """Test frame size, rate and schema checks."""
+
+    @pytest.mark.asyncio
+    async def test_plain_and_json_frames(self, guard):
+        """Test that legacy plain text and typed JSON frames are accepted."""
+        assert texts(await guard.admit(1, text_frame(" hello "))) == ["hello"]
+        payload = json.dumps({"type": "message", "message": "hi"})
+        assert texts(await guard.admit(2, text_frame(payload))) == ["hi"]
+
+    @pytest.mark.asyncio
+    async def test_blank_frame_ignored(self, guard):
+        """Test that whitespace-only frames are skipped without using tokens."""
+        for _ in range(5):
+            assert await guard.admit(1, text_frame("   ")) == []
+        assert texts(await guard.admit(1, text_frame("still allowed"))) == [
+            "still allowed"
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "frame, error_type",
+        [
+            ({"type": "websocket.receive", "bytes": b"x"}, "unsupported_frame"),
+            (text_frame("я" * 40), "frame_too_large"),
+            (text_frame("x" * 21), "message_too_long"),
+            (text_frame("{not json"), "invalid_message"),
+            (text_frame('{"type": "typing"}'), "invalid_message"),
+            (text_frame('{"message": 5}'), "invalid_message"),
+            (text_frame('{"type": "batch", "messages": []}'), "invalid_message"),
+            (text_frame('{"type": "batch", "messages": [1]}'), "invalid_message"),
+            (
+                text_frame(json.dumps({"type": "batch", "messages": ["a"] * 6})),
+                "batch_too_large",
+            ),
+            (text_frame('{"message": "a", "client_id": 7}'), "invalid_message"),
+            (text_frame('{"type": "receipt", "ids": []}'), "invalid_message"),
+            (text_frame('{"type": "receipt", "ids": ["a\\"]"]}'), "invalid_message"),
+        ],
+    )
+    async def test_rejections(self, guard, frame, error_type):
+        """Test typed rejections for invalid frames."""
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, frame)
+        assert exc_info.value.error_type == error_type
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_per_user(self, guard):
+        """Test that the burst is enforced per user."""
+        await guard.admit(1, text_frame("a"))
+        await guard.admit(1, text_frame("b"))
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, text_frame("c"))
+        assert exc_info.value.error_type == "rate_limited"
+
+        assert texts(await guard.admit(2, text_frame("d"))) == ["d"]
+
+    @pytest.mark.asyncio
+    async def test_reconnect_does_not_restore_burst(self, guard):
+        """Test that a bucket survives the last session until it refills."""
+        await guard.admit(1, text_frame("a"))
+        await guard.admit(1, text_frame("b"))
+
+        guard.forget(1)
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, text_frame("c"))
+        assert exc_info.value.error_type == "rate_limited"
+
+        # Simulate the time needed to refill the whole burst
+        guard._buckets[1].updated_at -= guard.burst / guard.rate_per_second
+        guard.forget(1)
+        assert 1 not in guard._buckets
+        assert texts(await guard.admit(1, text_frame("d"))) == ["d"]
+
+    @pytest.mark.asyncio
+    async def test_idle_buckets_are_swept(self, guard):
+        """Test that refilled buckets of gone users are dropped eventually."""
+        await guard.admit(1, text_frame("a"))
+        await guard.admit(2, text_frame("b"))
+        guard._buckets[1].updated_at -= guard.burst / guard.rate_per_second
+        guard._next_prune_at = 0
+
+        await guard.admit(2, text_frame("c"))
+
+        assert list(guard._buckets) == [2]
+
+    @pytest.mark.asyncio
+    async def test_batch_frame(self, guard):
+        """Test that batch items may be strings or message objects."""
+        payload = '{"type": "batch", "messages": ["a", {"message": "b"}]}'
+        assert texts(await guard.admit(1, text_frame(payload))) == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_batch_costs_token_per_message(self, guard):
+        """Test that a batch larger than the remaining budget is rejected whole."""
+        await guard.admit(1, text_frame("a"))
+        payload = json.dumps({"type": "batch", "messages": ["b", "c"]})
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, text_frame(payload))
+        assert exc_info.value.error_type == "rate_limited"
+        assert texts(await guard.admit(1, text_frame("d"))) == ["d"]
+
+    @pytest.mark.asyncio
+    async def test_envelope_and_receipts(self, guard):
+        """Test that client ids are kept and receipts are rate limited too."""
+        payload = '{"message": "a", "client_id": "c1"}'
+        events = await guard.admit(1, text_frame(payload))
+        assert events == [{"type": "message", "message": "a", "client_id": "c1"}]
+
+        guard.max_frame_bytes = 1024
+        receipt = json.dumps({"type": "receipt", "ids": [SERVER_ID_A, SERVER_ID_B]})
+        events = await guard.admit(1, text_frame(receipt))
+        assert events == [{"type": "receipt", "ids": [SERVER_ID_A, SERVER_ID_B]}]
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, text_frame(receipt))
+        assert exc_info.value.error_type == "rate_limited"
+
+    @pytest.mark.asyncio
+    async def test_receipt_id_count_is_capped(self, guard):
+        """Test that one receipt may not acknowledge more than a batch."""
+        guard.max_frame_bytes = 1024
+        receipt = json.dumps({"type": "receipt", "ids": [SERVER_ID_A] * 6})
+        with pytest.raises(IngressRejected) as exc_info:
+            await guard.admit(1, text_frame(receipt))
+        assert exc_info.value.error_type == "invalid_message"
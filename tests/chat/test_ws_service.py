@@ -0,0 +1,454 @@
+"""Tests for ChatWebSocketService connection management."""
+
+import asyncio
+import json
+
+import pytest
+
+from src.chat import history
+from src.chat.inmem_redis import InMemoryRedis
+from src.chat.outbox import Outbox
+from src.chat.repositories.db.chat import ChatRepositoryDB
+from src.chat.repositories.inmem.chat import ChatRepositoryInMemory
+from src.chat.ws_service import (
+    CLOSE_CODE_NODE_FULL,
+    CLOSE_CODE_SERVICE_RESTART,
+    CLOSE_CODE_SESSION_EVICTED,
+    ChatWebSocketService,
+)
+from src.config import settings
+
+
+class FakeWebSocket:
+    """Minimal WebSocket stand-in recording sent frames and close calls."""
+
+    def __init__(self):
+        self.sent: list[str] = []
+        self.closed_with: tuple[int, str] | None = None
+
+    async def send_text(self, data: str) -> None:
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str | None = None) -> None:
+        self.closed_with = (code, reason)
+
+
+@pytest.fixture
+def service() -> ChatWebSocketService:
+    """Service with small connection limits."""
+    service = ChatWebSocketService(redis_url="redis://localhost:6379/0")
+    service.max_connections_per_user = 2
+    service.max_connections_per_node = 3
+    return service
+
+
+class TestConnectionLimits:
+    """Test per-user and per-node connection caps."""
+
+    @pytest.mark.asyncio
+    async def test_oldest_session_evicted_at_user_limit(self, service):
+        """Test that the oldest session is closed when the user limit is hit."""
+        first, second, third = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+
+        for ws in (first, second, third):
+            assert await service.connect(1, ws)
+
+        assert first.closed_with[0] == CLOSE_CODE_SESSION_EVICTED
+        assert list(service.active_connections[1]) == [second, third]
+        assert service.get_connection_count() == 2
+
+    @pytest.mark.asyncio
+    async def test_node_limit_rejects_new_user(self, service):
+        """Test that a new user is rejected when the node is full."""
+        for user_id in (1, 2, 3):
+            assert await service.connect(user_id, FakeWebSocket())
+
+        rejected = FakeWebSocket()
+        assert not await service.connect(4, rejected)
+        assert rejected.closed_with[0] == CLOSE_CODE_NODE_FULL
+        assert 4 not in service.get_online_users()
+
+    @pytest.mark.asyncio
+    async def test_node_limit_evicts_own_session(self, service):
+        """Test that a connected user can replace their own session on a full node."""
+        old = FakeWebSocket()
+        await service.connect(1, old)
+        await service.connect(2, FakeWebSocket())
+        await service.connect(3, FakeWebSocket())
+
+        new = FakeWebSocket()
+        assert await service.connect(1, new)
+        assert old.closed_with[0] == CLOSE_CODE_SESSION_EVICTED
+        assert list(service.active_connections[1]) == [new]
+        assert service.get_connection_count() == 3
+
+    @pytest.mark.asyncio
+    async def test_disconnect_updates_count(self, service):
+        """Test that disconnect is idempotent and keeps the counter accurate."""
+        ws = FakeWebSocket()
+        await service.connect(1, ws)
+
+        service.disconnect(1, ws)
+        service.disconnect(1, ws)
+
+        assert service.get_connection_count() == 0
+        assert service.get_online_users() == set()
+
+
+class FailingWebSocket(FakeWebSocket):
+    """WebSocket whose writes always fail."""
+
+    async def send_text(self, data: str) -> None:
+        raise RuntimeError("connection lost")
+
+
+class TestOutbox:
+    """Test coalescing of outbound events."""
+
+    @pytest.mark.asyncio
+    async def test_events_within_window_are_batched(self):
+        """Test that events sent within the window share one frame."""
+        ws = FakeWebSocket()
+        outbox = Outbox(ws, flush_window_ms=5)
+
+        await outbox.send('{"message": "a"}')
+        await outbox.send('{"message": "b"}')
+        assert ws.sent == []
+
+        await asyncio.sleep(0.02)
+        assert len(ws.sent) == 1
+        frame = json.loads(ws.sent[0])
+        assert frame["type"] == "batch"
+        assert [e["message"] for e in frame["events"]] == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_single_event_sent_unwrapped(self):
+        """Test that a lone event keeps the plain format."""
+        ws = FakeWebSocket()
+        outbox = Outbox(ws, flush_window_ms=1)
+
+        await outbox.send('{"message": "a"}')
+        await asyncio.sleep(0.01)
+
+        assert ws.sent == ['{"message": "a"}']
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_flushes_immediately(self):
+        """Test that a full buffer is flushed without waiting for the window."""
+        ws = FakeWebSocket()
+        outbox = Outbox(ws, flush_window_ms=1000, max_batch_size=2)
+
+        await outbox.send("{}")
+        await outbox.send("{}")
+
+        assert len(ws.sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_zero_window_sends_directly(self):
+        """Test that coalescing can be disabled."""
+        ws = FakeWebSocket()
+        outbox = Outbox(ws, flush_window_ms=0)
+
+        await outbox.send("{}")
+
+        assert ws.sent == ["{}"]
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_drops_session(self, service):
+        """Test that a failed background flush removes the connection."""
+        await service.connect(1, FailingWebSocket())
+
+        await service._send_to_user_sessions("{}", 1, "recipient")
+        await asyncio.sleep(0.05)
+
+        assert service.get_connection_count() == 0
+
+
+class TestResume:
+    """Test sequence numbers and replay of missed messages."""
+
+    @pytest.fixture
+    def redis_service(self) -> ChatWebSocketService:
+        """Service backed by the in-memory Redis substitute."""
+        return ChatWebSocketService(redis_client=InMemoryRedis())
+
+    @pytest.mark.asyncio
+    async def test_messages_get_sequence_numbers(self, redis_service):
+        """Test that sequence numbers are per conversation and gap-free."""
+        first = await redis_service.send_personal_message("a", 2, 1)
+        second = await redis_service.send_personal_message("b", 1, 2)
+        other = await redis_service.send_personal_message("c", 3, 1)
+
+        assert (first["seq"], second["seq"], other["seq"]) == (1, 2, 1)
+        messages = await redis_service.get_history(1, 2)
+        assert [m["seq"] for m in messages] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_replay_returns_only_delta(self, redis_service):
+        """Test that only messages after the client's seq are replayed."""
+        for text in ("a", "b", "c"):
+            await redis_service.send_personal_message(text, 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=1)
+
+        assert [m["message"] for m in replay["messages"]] == ["b", "c"]
+        assert replay["latest_seq"] == 3
+        assert not replay["gap"] and not replay["reset"]
+
+    @pytest.mark.asyncio
+    async def test_replay_reports_gap_beyond_limit(self, redis_service):
+        """Test that a delta larger than the limit is flagged as a gap."""
+        for text in ("a", "b", "c", "d"):
+            await redis_service.send_personal_message(text, 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=1, limit=2)
+
+        assert [m["seq"] for m in replay["messages"]] == [3, 4]
+        assert replay["gap"]
+
+    @pytest.mark.asyncio
+    async def test_replay_reports_reset_after_clear(self, redis_service):
+        """Test that a cleared conversation tells the client to start over."""
+        await redis_service.send_personal_message("a", 2, 1)
+        await redis_service.send_personal_message("b", 2, 1)
+        await redis_service.clear_chat_history(1, 2)
+        await redis_service.send_personal_message("c", 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=2)
+
+        assert replay["reset"]
+        assert [m["message"] for m in replay["messages"]] == ["c"]
+
+    @pytest.mark.asyncio
+    async def test_replay_continues_numbering_after_expiry(self, redis_service):
+        """Test that messages written after the history expired are replayed."""
+        for text in "abcde":
+            await redis_service.send_personal_message(text, 2, 1)
+        await redis_service.redis.expire("chat:1:2", 0)
+        for text in "fghijklm":
+            await redis_service.send_personal_message(text, 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=5)
+
+        assert [m["seq"] for m in replay["messages"]] == list(range(6, 14))
+        assert [m["message"] for m in replay["messages"]] == list("fghijklm")
+        assert replay["latest_seq"] == 13
+        assert not replay["gap"] and not replay["reset"]
+
+    @pytest.mark.asyncio
+    async def test_replay_reports_reset_after_clear_and_more_writes(
+        self, redis_service
+    ):
+        """Test that a clear is detected even when new seqs pass the cursor."""
+        for text in "abcde":
+            await redis_service.send_personal_message(text, 2, 1)
+        await redis_service.clear_chat_history(1, 2)
+        for text in "fghijklm":
+            await redis_service.send_personal_message(text, 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=5)
+
+        assert replay["reset"]
+        assert [m["seq"] for m in replay["messages"]] == list(range(6, 14))
+        resumed = await redis_service.get_messages_after(1, 2, after_seq=13)
+        assert resumed["messages"] == [] and not resumed["reset"]
+
+    @pytest.mark.asyncio
+    async def test_history_pages_after_expiry(self, redis_service):
+        """Test that before cursors map to the right messages after expiry."""
+        for text in "abc":
+            await redis_service.send_personal_message(text, 2, 1)
+        await redis_service.redis.expire("chat:1:2", 0)
+        for text in "defg":
+            await redis_service.send_personal_message(text, 2, 1)
+
+        latest = await redis_service.get_history(1, 2, limit=2)
+        older = await redis_service.get_history(1, 2, limit=2, before=latest[0]["seq"])
+
+        assert [(m["seq"], m["message"]) for m in latest] == [(6, "f"), (7, "g")]
+        assert [(m["seq"], m["message"]) for m in older] == [(4, "d"), (5, "e")]
+        assert await redis_service.get_history(1, 2, before=4) == []
+
+    @pytest.mark.asyncio
+    async def test_iter_history_walks_stored_messages_in_chunks(self, redis_service):
+        """Test that the export walk starts at the oldest stored message."""
+        await redis_service.send_personal_message("expired", 2, 1)
+        await redis_service.redis.expire("chat:1:2", 0)
+        for text in "abcde":
+            await redis_service.send_personal_message(text, 2, 1)
+
+        chunks = [
+            chunk async for chunk in redis_service.iter_history(2, 1, chunk_size=2)
+        ]
+
+        assert [[m["message"] for m in chunk] for chunk in chunks] == [
+            ["a", "b"],
+            ["c", "d"],
+            ["e"],
+        ]
+        assert chunks[0][0]["seq"] == 2
+        assert "from_username" in chunks[0][0]
+
+    @pytest.mark.asyncio
+    async def test_replay_after_all_keys_expired(self, redis_service, monkeypatch):
+        """Test that a new history numbers above cursors of the expired one."""
+        for text in "abc":
+            await redis_service.send_personal_message(text, 2, 1)
+        for key in ("chat:1:2", "chat:1:2:seq", "chat:1:2:version"):
+            await redis_service.redis.expire(key, 0)
+        monkeypatch.setattr(history, "generation_base", lambda: 1000)
+        for text in "de":
+            await redis_service.send_personal_message(text, 2, 1)
+
+        replay = await redis_service.get_messages_after(1, 2, after_seq=3)
+
+        assert [(m["seq"], m["message"]) for m in replay["messages"]] == [
+            (1001, "d"),
+            (1002, "e"),
+        ]
+        assert replay["gap"] and not replay["reset"]
+
+    @pytest.mark.asyncio
+    async def test_history_keys_share_retention(self, redis_service):
+        """Test that the counter and clear marker expire with the messages."""
+        await redis_service.send_personal_message("a", 2, 1)
+        await redis_service.clear_chat_history(1, 2)
+        await redis_service.send_personal_message("b", 2, 1)
+
+        expires_at = redis_service.redis._expires_at
+        keys = ("chat:1:2", "chat:1:2:seq", "chat:1:2:cleared", "chat:1:2:version")
+        assert all(key in expires_at for key in keys)
+        assert len({round(expires_at[key]) for key in keys}) == 1
+
+    @pytest.mark.asyncio
+    async def test_repository_reads_service_seq(self, redis_service):
+        """Test that the repository numbers messages like the service."""
+        repo = ChatRepositoryDB("redis://unused", redis_client=redis_service.redis)
+        for text in "abc":
+            await redis_service.send_personal_message(text, 2, 1)
+        await redis_service.clear_chat_history(1, 2)
+        await redis_service.send_personal_message("d", 2, 1)
+        await repo.save_message(2, 1, "e")
+
+        page = await repo.get_history(1, 2, limit=1)
+        older = await repo.get_history(1, 2, before=page[0]["seq"])
+
+        assert [(m["seq"], m["message"]) for m in page] == [(5, "e")]
+        assert [(m["seq"], m["message"]) for m in older] == [(4, "d")]
+        assert [m["seq"] for m in await redis_service.get_history(1, 2)] == [4, 5]
+
+    @pytest.mark.asyncio
+    async def test_live_events_held_until_replay_sent(self, redis_service):
+        """Test that the replay frame precedes events queued during it."""
+        ws = FakeWebSocket()
+        await redis_service.connect(1, ws)
+        outbox = redis_service.active_connections[1][ws]
+
+        outbox.pause()
+        await outbox.send('{"type": "message"}')
+        await asyncio.sleep(0.02)
+        assert ws.sent == []
+
+        await redis_service.replay_missed_messages(1, 2, ws, 0)
+
+        assert json.loads(ws.sent[0])["type"] == "replay"
+        assert ws.sent[1] == '{"type": "message"}'
+
+    @pytest.mark.asyncio
+    async def test_history_pages_backwards_with_before_cursor(self, redis_service):
+        """Test that the before cursor returns the previous page."""
+        for text in ("a", "b", "c", "d", "e"):
+            await redis_service.send_personal_message(text, 2, 1)
+
+        latest = await redis_service.get_history(1, 2, limit=2)
+        older = await redis_service.get_history(1, 2, limit=2, before=latest[0]["seq"])
+        oldest = await redis_service.get_history(1, 2, limit=2, before=older[0]["seq"])
+
+        assert [m["message"] for m in latest] == ["d", "e"]
+        assert [m["message"] for m in older] == ["b", "c"]
+        assert [m["message"] for m in oldest] == ["a"]
+        assert await redis_service.get_history(1, 2, before=1) == []
+
+
+class SlowRedis(InMemoryRedis):
+    """In-memory Redis whose writes take a while."""
+
+    async def rpush(self, key: str, *values: str) -> int:
+        await asyncio.sleep(0.05)
+        return await super().rpush(key, *values)
+
+
+class HangingWebSocket(FakeWebSocket):
+    """WebSocket whose writes never complete."""
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.Event().wait()
+
+
+class TestDrain:
+    """Test moving sessions off a node before shutdown."""
+
+    @pytest.mark.asyncio
+    async def test_drain_flushes_hints_and_closes(self):
+        """Test that buffered events precede the reconnect hint and close."""
+        service = ChatWebSocketService(redis_client=InMemoryRedis())
+        ws = FakeWebSocket()
+        await service.connect(1, ws)
+        await service.active_connections[1][ws].send('{"type": "message"}')
+
+        await service.drain(timeout=1)
+
+        frame = json.loads(ws.sent[0])
+        assert frame["type"] == "batch"
+        assert frame["events"][0] == {"type": "message"}
+        hint = frame["events"][1]
+        assert hint["type"] == "reconnect"
+        assert 0 <= hint["retry_after_ms"] <= settings.ws_reconnect_jitter_ms
+        assert ws.closed_with[0] == CLOSE_CODE_SERVICE_RESTART
+        assert service.get_connection_count() == 0
+
+        late = FakeWebSocket()
+        assert not await service.connect(2, late)
+        assert late.closed_with[0] == CLOSE_CODE_SERVICE_RESTART
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_for_message_writes(self):
+        """Test that a message being saved is stored and delivered first."""
+        service = ChatWebSocketService(redis_client=SlowRedis())
+        ws = FakeWebSocket()
+        await service.connect(2, ws)
+
+        sending = asyncio.create_task(service.send_personal_message("hi", 2, 1))
+        await asyncio.sleep(0)
+        await service.drain(timeout=1)
+
+        assert (await sending)["seq"] == 1
+        events = json.loads(ws.sent[0])["events"]
+        assert [event["type"] for event in events] == ["message", "reconnect"]
+
+    @pytest.mark.asyncio
+    async def test_drain_respects_deadline(self):
+        """Test that stuck sessions are dropped once the deadline passes."""
+        service = ChatWebSocketService(redis_client=InMemoryRedis())
+        await service.connect(1, HangingWebSocket())
+
+        await asyncio.wait_for(service.drain(timeout=0.05), 1)
+
+        assert service.get_connection_count() == 0
+
+
+class TestChatRepositoryInMemory:
+    """Test keyset pagination of the in-memory chat repository."""
+
+    @pytest.mark.asyncio
+    async def test_get_history_before_cursor(self):
+        """Test that pages are numbered by seq and walk backwards."""
+        repo = ChatRepositoryInMemory()
+        for text in ("a", "b", "c"):
+            await repo.save_message(1, 2, text)
+
+        latest = await repo.get_history(2, 1, limit=2)
+        older = await repo.get_history(1, 2, limit=2, before=latest[0]["seq"])
+
+        assert [(m["seq"], m["message"]) for m in latest] == [(2, "b"), (3, "c")]
+        assert [(m["seq"], m["message"]) for m in older] == [(1, "a")]
@@ -4,10 +4,15 @@ import os
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock
 
+from src.config import settings
 from src.main import app
 from src.di.container import Container
 from src.users.services import UserService
+from src.chat import history
 from src.chat.ws_service import ChatWebSocketService
+from src.templates_engine import fragment_cache
+from src.users.auth import create_session_token
+from src.users.schemas import UserRead
 
 
 def create_and_login_user(client: TestClient, username: str, email: str, password: str):
@@ -26,6 +31,14 @@ def create_and_login_user(client: TestClient, username: str, email: str, passwor
     return login_response.cookies
 
 
+def session_cookie(user_id: int) -> dict[str, str]:
+    """Session cookie of a user, for tests that do not log in."""
+    user = UserRead.model_construct(
+        id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com"
+    )
+    return {settings.session_cookie_name: create_session_token(user)}
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     """Create an instance of the default event loop for the test session."""
@@ -47,6 +60,25 @@ def setup_test_environment():
         del os.environ["ENV"]
 
 
+@pytest.fixture(autouse=True)
+def plain_http_session_cookie(monkeypatch):
+    """The test client talks plain HTTP, so secure cookies would not be sent."""
+    monkeypatch.setattr(settings, "session_cookie_secure", False)
+
+
+@pytest.fixture(autouse=True)
+def clear_fragment_cache():
+    """Drop cached HTML fragments, data versions restart with every container."""
+    fragment_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def chat_seq_from_one(monkeypatch):
+    """Number new chat histories from 1 instead of the current time."""
+    monkeypatch.setattr(history, "generation_base", lambda: 0)
+
+
 @pytest.fixture
 def container() -> Container:
     """Create a test container with automatic InMem repositories."""
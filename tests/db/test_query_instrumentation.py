@@ -0,0 +1,70 @@
+"""Tests for SQL query instrumentation."""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from src.db.session import (
+    QueryBudgetExceeded,
+    QueryTimingMiddleware,
+    query_budget,
+    track_queries,
+)
+
+
+@pytest.fixture
+def sqlite_engine():
+    """In-memory SQLite engine, instrumented like every other engine."""
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def query_client(sqlite_engine) -> TestClient:
+    """Client for an app whose route issues one query per requested item."""
+    app = FastAPI()
+    app.add_middleware(QueryTimingMiddleware)
+
+    @app.get("/items")
+    def items(count: int = 1):
+        with sqlite_engine.connect() as conn:
+            return [conn.execute(text("SELECT 1")).scalar() for _ in range(count)]
+
+    with TestClient(app) as client:
+        yield client
+
+
+class TestQueryInstrumentation:
+    """Test query counting, Server-Timing and query budgets."""
+
+    def test_track_queries_counts_and_detects_repeats(self, sqlite_engine):
+        """Test that repeated statements are reported as possible N+1."""
+        with track_queries() as stats, sqlite_engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+
+        assert stats.count == 3
+        assert stats.duration > 0
+        assert stats.repeated(threshold=3) == [("SELECT 1", 3)]
+        assert stats.repeated(threshold=4) == []
+
+    def test_server_timing_header(self, query_client: TestClient):
+        """Test that responses report query count and database time."""
+        response = query_client.get("/items?count=2")
+
+        assert response.status_code == 200
+        assert response.headers["server-timing"].startswith("db;dur=")
+        assert 'desc="2 queries"' in response.headers["server-timing"]
+
+    def test_query_budget_passes_within_budget(self, query_client: TestClient):
+        """Test that a route within its budget does not fail."""
+        with query_budget(2):
+            query_client.get("/items?count=2")
+
+    def test_query_budget_fails_when_route_exceeds_it(self, query_client: TestClient):
+        """Test that a route over its budget fails with the statements listed."""
+        with pytest.raises(QueryBudgetExceeded, match="GET /items: 3 queries"):
+            with query_budget(2):
+                query_client.get("/items?count=3")
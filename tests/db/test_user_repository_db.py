@@ -0,0 +1,76 @@
+"""Tests for the SQLAlchemy user repository on SQLite."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.db.base import Base
+from src.db.session import track_queries
+from src.users.models import User
+from src.users.repositories.user_repo_db import UserRepositoryDB
+
+
+@pytest.fixture
+def repo():
+    """Repository over an in-memory SQLite database with three users."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for user_id in (1, 2, 3):
+        session.add(
+            User(
+                id=user_id,
+                username=f"user{user_id}",
+                email=f"user{user_id}@example.com",
+                password_hash="hash",
+            )
+        )
+    session.commit()
+    yield UserRepositoryDB(session)
+    session.close()
+    engine.dispose()
+
+
+class TestUserRepositoryDB:
+    """Queries issued by the database user repository."""
+
+    def test_block_relation_in_one_query(self, repo):
+        """Test that both directions of a block are read with one query."""
+        repo.block_user(1, 2)
+
+        with track_queries() as stats:
+            relation = repo.get_block_relation(2, 1)
+
+        assert stats.count == 1
+        assert (relation.blocks_other, relation.blocked_by_other) == (False, True)
+        assert relation.is_blocked
+        assert repo.who_blocked_whom(2, 1) == (1, 2)
+        assert not repo.is_blocked(1, 3)
+
+    def test_mutual_block(self, repo):
+        """Test that a block in both directions is reported as such."""
+        repo.block_user(1, 2)
+        repo.block_user(2, 1)
+
+        relation = repo.get_block_relation(1, 2)
+
+        assert relation.blocks_other and relation.blocked_by_other
+        assert repo.who_blocked_whom(1, 2) == (1, 2)
+
+    def test_users_by_ids_in_one_query(self, repo):
+        """Test that several users are loaded with a single IN query."""
+        with track_queries() as stats:
+            users = repo.get_users_by_ids([1, 3, 9])
+
+        assert stats.count == 1
+        assert sorted(user.id for user in users) == [1, 3]
+        assert repo.get_users_by_ids([]) == []
+
+    def test_users_version_reads_only_max_id(self, repo):
+        """Test that the ETag validator probes MAX(id) without counting rows."""
+        with track_queries() as stats:
+            version = repo.get_users_version()
+
+        assert version == "3"
+        [statement] = stats.statements
+        assert "max(" in statement.lower() and "count(" not in statement.lower()
@@ -0,0 +1,65 @@
+"""Tests for the queue based logging pipeline."""
+
+import json
+import logging
+import queue
+
+from src.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+from src.metrics import LOG_RECORDS_DROPPED
+
+
+def make_record(msg: str, *args, level: int = logging.INFO, **extra):
+    """Create a log record of the test logger."""
+    record = logging.LogRecord("felchat.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestLogging:
+    """Test JSON output, sampling and the non-blocking queue handler."""
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Test that records become one JSON object with extra fields."""
+        record = make_record("User %s connected", 7, user_id=7)
+
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry["message"] == "User 7 connected"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "felchat.test"
+        assert entry["user_id"] == 7
+
+    def test_rate_limit_per_template(self):
+        """Test that each template is limited separately and warnings pass."""
+        log_filter = SamplingFilter(per_second=2)
+        dropped = LOG_RECORDS_DROPPED.labels("felchat.test", "rate_limited")
+        before = dropped.value
+
+        kept = [log_filter.filter(make_record("Message sent %s", i)) for i in range(5)]
+        assert kept == [True, True, False, False, False]
+        assert dropped.value == before + 3
+
+        assert log_filter.filter(make_record("Other event"))
+        assert log_filter.filter(make_record("Message sent", level=logging.WARNING))
+
+    def test_sampling(self):
+        """Test that a zero sample rate drops INFO but keeps errors."""
+        log_filter = SamplingFilter(sample_rate=0.0)
+
+        assert not log_filter.filter(make_record("Message sent"))
+        assert log_filter.filter(make_record("Failed", level=logging.ERROR))
+
+    def test_queue_handler_drops_when_full(self):
+        """Test that a full queue drops records instead of blocking."""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        dropped = LOG_RECORDS_DROPPED.labels("felchat.test", "queue_full")
+        before = dropped.value
+        args = ["a"]
+
+        handler.handle(make_record("Value %s", args))
+        handler.handle(make_record("Value %s", args))
+        args.append("b")
+
+        assert dropped.value == before + 1
+        record = handler.queue.get_nowait()
+        assert record.getMessage() == "Value ['a']"
@@ -0,0 +1,69 @@
+"""Tests for startup waiting and the readiness probe."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.readiness import ReadinessProbe, wait_for
+
+
+class FlakyCheck:
+    """Check failing a given number of times before succeeding."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self) -> None:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("not yet")
+
+
+class TestReadiness:
+    """Test backoff on startup, cached probes and the /ready endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_wait_for_retries_until_available(self):
+        """Test that a failing check is retried until it succeeds."""
+        check = FlakyCheck(failures=3)
+
+        await wait_for("flaky", check, timeout=5, initial_delay=0.001)
+
+        assert check.calls == 4
+
+    @pytest.mark.asyncio
+    async def test_wait_for_gives_up_after_timeout(self):
+        """Test that the last error is raised once the timeout is exceeded."""
+        check = FlakyCheck(failures=1000)
+
+        with pytest.raises(ConnectionError):
+            await wait_for("down", check, timeout=0.05, initial_delay=0.01)
+
+    @pytest.mark.asyncio
+    async def test_probe_caches_result(self):
+        """Test that checks run once per cache period."""
+        check = FlakyCheck(failures=1)
+        probe = ReadinessProbe({"db": check}, cache_seconds=60)
+
+        assert await probe.check() == {"db": False}
+        assert await probe.check() == {"db": False}
+        assert check.calls == 1
+
+        probe.cache_seconds = 0
+        assert await probe.check() == {"db": True}
+
+    def test_ready_endpoint(self, client: TestClient):
+        """Test that /ready reports dependencies checked on startup."""
+        response = client.get("/ready")
+
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready", "checks": {"redis": True}}
+
+    def test_ready_endpoint_unavailable(self, client: TestClient):
+        """Test that /ready answers 503 when a dependency is down."""
+        client.app.state.readiness = ReadinessProbe({"redis": FlakyCheck(1)})
+
+        response = client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["checks"] == {"redis": False}
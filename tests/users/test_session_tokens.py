@@ -0,0 +1,39 @@
+"""Tests for signed session tokens."""
+
+from src.users.auth import create_session_token, read_session_token
+from src.users.schemas import UserRead
+
+ALICE = UserRead(id=7, username="alice", email="alice@example.com")
+
+
+class TestSessionTokens:
+    """Signing and verification of session tokens."""
+
+    def test_token_round_trip(self):
+        """Test that a token carries the identity it was issued for."""
+        token = create_session_token(ALICE, secret="key")
+
+        assert read_session_token(token, secret="key") == ALICE
+
+    def test_tampered_token_is_rejected(self):
+        """Test that changing the payload invalidates the signature."""
+        token = create_session_token(ALICE, secret="key")
+        forged = create_session_token(
+            UserRead(id=1, username="admin", email="admin@example.com"), secret="other"
+        )
+
+        assert read_session_token(token, secret="other") is None
+        assert read_session_token(forged, secret="key") is None
+        signature = token.split(".")[1]
+        assert read_session_token(f"{forged.split('.')[0]}.{signature}", "key") is None
+
+    def test_expired_token_is_rejected(self):
+        """Test that a token stops working after its lifetime."""
+        token = create_session_token(ALICE, max_age=-1, secret="key")
+
+        assert read_session_token(token, secret="key") is None
+
+    def test_malformed_tokens_are_rejected(self):
+        """Test that cookies of the old format or garbage are not accepted."""
+        for token in (None, "", "7", "a.b", "ключ.подпись", "..."):
+            assert read_session_token(token, secret="key") is None
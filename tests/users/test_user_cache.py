@@ -0,0 +1,120 @@
+"""Tests for the read-through user cache."""
+
+import asyncio
+
+import pytest
+
+from src.chat.inmem_redis import InMemoryRedis
+from src.users.repositories.cached.user import UserCache, UserRepositoryCached
+from src.users.repositories.inmem.user import UserRepositoryInMemory
+from src.users.schemas import UserCreate
+
+
+class CountingRepository(UserRepositoryInMemory):
+    """In-memory repository counting ``get_user_by_id`` calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.lookups = 0
+
+    def get_user_by_id(self, user_id: int):
+        self.lookups += 1
+        return super().get_user_by_id(user_id)
+
+
+def register(repo, name: str):
+    """Create a user with an email derived from the name."""
+    return repo.create_user(
+        UserCreate(username=name, email=f"{name}@example.com", password="secret")
+    )
+
+
+class TestUserRepositoryCached:
+    """Read-through behavior of the caching repository."""
+
+    def test_repeated_lookups_hit_the_cache(self):
+        """Test that a user is loaded once and served as a detached copy."""
+        inner = CountingRepository()
+        alice = register(inner, "alice")
+        repo = UserRepositoryCached(inner, UserCache(max_entries=10))
+
+        first = repo.get_user_by_id(alice.id)
+        second = repo.get_user_by_id(alice.id)
+
+        assert inner.lookups == 1
+        assert first is second and first is not alice
+        assert (first.id, first.username, first.email) == (1, "alice", alice.email)
+
+    def test_missing_user_is_cached_until_created(self):
+        """Test negative caching and its invalidation by registration."""
+        inner = CountingRepository()
+        repo = UserRepositoryCached(inner, UserCache(max_entries=10))
+
+        assert repo.get_user_by_id(1) is None
+        assert repo.get_user_by_id(1) is None
+        assert inner.lookups == 1
+
+        register(repo, "alice")
+
+        assert repo.get_user_by_id(1).username == "alice"
+        assert inner.lookups == 2
+
+    def test_entries_expire(self):
+        """Test that entries are reloaded after their TTL."""
+        inner = CountingRepository()
+        register(inner, "alice")
+        repo = UserRepositoryCached(
+            inner, UserCache(max_entries=10, ttl_seconds=0, negative_ttl_seconds=0)
+        )
+
+        repo.get_user_by_id(1)
+        repo.get_user_by_id(1)
+        repo.get_user_by_id(2)
+        repo.get_user_by_id(2)
+
+        assert inner.lookups == 4
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the cache keeps at most max_entries users."""
+        inner = CountingRepository()
+        for name in ("alice", "bob", "carol"):
+            register(inner, name)
+        repo = UserRepositoryCached(inner, UserCache(max_entries=2))
+
+        repo.get_user_by_id(1)
+        repo.get_user_by_id(2)
+        repo.get_user_by_id(1)  # 2 is now least recently used
+        repo.get_user_by_id(3)
+        lookups = inner.lookups
+        repo.get_user_by_id(1)
+        repo.get_user_by_id(3)
+
+        assert inner.lookups == lookups
+        repo.get_user_by_id(2)
+        assert inner.lookups == lookups + 1
+
+
+class TestUserCacheInvalidation:
+    """Invalidation across processes sharing one Redis."""
+
+    @pytest.mark.asyncio
+    async def test_invalidation_reaches_other_caches(self):
+        """Test that a user dropped in one process is dropped in the other."""
+        redis_client = InMemoryRedis()
+        here = UserCache(max_entries=10, redis_client=redis_client)
+        there = UserCache(max_entries=10, redis_client=redis_client)
+        await here.start()
+        await there.start()
+        await asyncio.sleep(0)
+        there.put(1, None)
+
+        try:
+            # Sync endpoints invalidate from worker threads
+            await asyncio.to_thread(here.invalidate, 1)
+            for _ in range(10):
+                await asyncio.sleep(0)
+        finally:
+            await here.close()
+            await there.close()
+
+        assert there.get(1) == (False, None)
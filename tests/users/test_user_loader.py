@@ -0,0 +1,70 @@
+"""Tests for request-scoped batched user lookups."""
+
+from src.users.loader import UserLoader
+from src.users.repositories.cached.user import UserCache, UserRepositoryCached
+from src.users.repositories.inmem.user import UserRepositoryInMemory
+from src.users.schemas import UserCreate
+
+
+class BatchCountingRepository(UserRepositoryInMemory):
+    """In-memory repository recording every ``get_users_by_ids`` call."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches: list[set[int]] = []
+
+    def get_users_by_ids(self, user_ids):
+        self.batches.append(set(user_ids))
+        return super().get_users_by_ids(user_ids)
+
+
+def repository_with_users(*names: str) -> BatchCountingRepository:
+    """Create a repository holding users with the given names."""
+    repo = BatchCountingRepository()
+    for name in names:
+        repo.create_user(
+            UserCreate(username=name, email=f"{name}@example.com", password="secret")
+        )
+    return repo
+
+
+class TestUserLoader:
+    """Batching and memoization of the user loader."""
+
+    def test_primed_ids_load_in_one_call(self):
+        """Test that all primed IDs are fetched together on the first load."""
+        repo = repository_with_users("alice", "bob")
+        users = UserLoader(repo)
+
+        users.prime(1, 2, 3)
+        alice = users.load(1)
+        bob = users.load(2)
+
+        assert (alice.username, bob.username) == ("alice", "bob")
+        assert users.load(3) is None
+        assert repo.batches == [{1, 2, 3}]
+
+    def test_results_are_memoized(self):
+        """Test that known IDs, found or not, are not loaded again."""
+        repo = repository_with_users("alice", "bob")
+        users = UserLoader(repo)
+
+        users.load(1)
+        users.load(9)
+        loaded = users.load_many([1, 2, 9])
+
+        assert [u and u.username for u in loaded.values()] == ["alice", "bob", None]
+        assert repo.batches == [{1}, {9}, {2}]
+
+    def test_cached_repository_loads_only_misses(self):
+        """Test that the cache decorator sends only uncached IDs in the batch."""
+        inner = repository_with_users("alice", "bob", "carol")
+        repo = UserRepositoryCached(inner, UserCache(max_entries=10))
+        repo.get_user_by_id(1)
+
+        found = repo.get_users_by_ids([1, 2, 4])
+        again = repo.get_users_by_ids([2, 4])
+
+        assert sorted(u.username for u in found) == ["alice", "bob"]
+        assert [u.username for u in again] == ["bob"]
+        assert inner.batches == [{2, 4}]
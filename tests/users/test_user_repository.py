@@ -0,0 +1,70 @@
+"""Tests for the indexed in-memory user repository."""
+
+from src.users.repositories.inmem.user import UserRepositoryInMemory
+from src.users.schemas import UserCreate
+
+
+def register(repo: UserRepositoryInMemory, name: str):
+    """Create a user with an email derived from the name."""
+    return repo.create_user(
+        UserCreate(username=name, email=f"{name}@example.com", password="secret")
+    )
+
+
+class TestUserRepositoryInMemory:
+    """Lookups and blocks of the in-memory user repository."""
+
+    def test_lookups_by_username_and_email(self):
+        """Test that indexed lookups find the registered user."""
+        repo = UserRepositoryInMemory()
+        alice = register(repo, "alice")
+        register(repo, "bob")
+
+        assert repo.get_user_by_username("alice") is alice
+        assert repo.get_user_by_email("alice@example.com") is alice
+        assert repo.get_user_by_username("carol") is None
+        assert repo.get_user_by_email("carol@example.com") is None
+
+    def test_duplicate_username_or_email_is_rejected(self):
+        """Test that the indexes enforce unique usernames and emails."""
+        repo = UserRepositoryInMemory()
+        register(repo, "alice")
+
+        assert register(repo, "alice") is None
+        assert (
+            repo.create_user(
+                UserCreate(
+                    username="other", email="alice@example.com", password="secret"
+                )
+            )
+            is None
+        )
+        assert [user.username for user in repo.list_users()] == ["alice"]
+
+    def test_block_direction_and_unblock(self):
+        """Test that blocks are directional and removed on unblock."""
+        repo = UserRepositoryInMemory()
+        repo.block_user(1, 2)
+        repo.block_user(3, 1)
+
+        assert repo.who_blocked_whom(1, 2) == (1, 2)
+        assert repo.who_blocked_whom(2, 1) == (1, 2)
+        assert repo.who_blocked_whom(1, 3) == (3, 1)
+        assert repo.is_blocked(2, 1) and repo.is_blocked(1, 3)
+        assert not repo.is_blocked(2, 3)
+
+        repo.unblock_user(1, 2)
+        repo.unblock_user(2, 1)  # not a block, nothing changes
+
+        assert not repo.is_blocked(1, 2)
+        assert repo.who_blocked_whom(1, 3) == (3, 1)
+
+    def test_block_ids_stay_unique_after_unblock(self):
+        """Test that a new block never reuses the id of a live one."""
+        repo = UserRepositoryInMemory()
+        repo.block_user(1, 2)
+        repo.block_user(1, 3)
+        repo.unblock_user(1, 2)
+        repo.block_user(1, 4)
+
+        assert len({block.id for block in repo.blocks.values()}) == 2